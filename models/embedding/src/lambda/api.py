@@ -1,9 +1,10 @@
-from pydantic import BaseModel
-from typing import List,Optional,Any
+from pydantic import BaseModel,Field
+from typing import List,Optional,Any,Union,Literal
 
 class Request(BaseModel):
     crid: Optional[Any] = None
     extra_stats: Optional[bool] = None
+    encoding_format: Literal["float","base64"] = "float"
     sentences: List[str]
 
 class Response(BaseModel):
@@ -11,7 +12,32 @@ class Response(BaseModel):
     n_tokens: Optional[int] = None
     tokenization_latency: Optional[float] = None
     model_latency: Optional[float] = None
-    sentence_embeddings: List[List[float]]
+    # base64 of little-endian float32 per sentence when encoding_format="base64"
+    sentence_embeddings: Union[List[List[float]],List[str]]
+
+class OpenAIEmbeddingRequest(BaseModel):
+    # /v1/embeddings on the server, so it can stand in for EMBEDDING_API_ENDPOINT
+    input: Union[str,List[str]]
+    model: Optional[str] = None
+    encoding_format: Literal["float","base64"] = "float"
+    # keep the leading dims and re-normalize (Matryoshka models)
+    dimensions: Optional[int] = Field(default=None,gt=0)
+
+class RerankRequest(BaseModel):
+    crid: Optional[Any] = None
+    extra_stats: Optional[bool] = None
+    query: str
+    passages: List[str]
+    # stop scoring batches once this much time has passed, unscored passages get null
+    budget_ms: Optional[float] = None
+
+class RerankResponse(BaseModel):
+    crid: Optional[Any] = None
+    n_tokens: Optional[int] = None
+    tokenization_latency: Optional[float] = None
+    model_latency: Optional[float] = None
+    # cross-encoder relevance per passage (higher is better), in request order
+    scores: List[Optional[float]]
 
 class ErrorResponse(BaseModel):
     crid: Optional[Any] = None
@@ -1,41 +1,126 @@
+import orjson
+import numpy as np
 from os import environ as env
 from time import time
+from base64 import b64encode
 from typing import Dict,Union,Any
 from pydantic import ValidationError
 
-from api import Request,Response,ErrorResponse
-from service import EncoderService
+from api import Request,RerankRequest,ErrorResponse
+from service import EncoderService,RerankerService
 
 LAMBDA_TASK_ROOT=env.get("LAMBDA_TASK_ROOT")
 MODEL_NAME=env.get("MODEL_NAME")
 MODEL_PATH=f"{LAMBDA_TASK_ROOT}/models/{MODEL_NAME}"
+MAX_BATCH_SIZE=int(env.get("MAX_BATCH_SIZE","32"))
+MAX_BATCH_TOKENS=int(env.get("MAX_BATCH_TOKENS","8192"))
+ENCODER_BACKEND=env.get("ENCODER_BACKEND","torch")
+ONNX_QUANTIZE=env.get("ONNX_QUANTIZE","false").lower() == "true"
+ENCODER_THREADS=int(env["ENCODER_THREADS"]) if env.get("ENCODER_THREADS") else None
+# Optional cross-encoder served on /rerank, models/{RERANK_MODEL_NAME}
+RERANK_MODEL_NAME=env.get("RERANK_MODEL_NAME") or None
+RERANK_MODEL_PATH=f"{LAMBDA_TASK_ROOT}/models/{RERANK_MODEL_NAME}"
+
+def validation_error_response(e: ValidationError) -> str:
+    errs = e.errors()
+    for err in errs:
+        err["loc"] = ".".join(str(loc) for loc in err["loc"])
+    return ErrorResponse(errors=errs).model_dump_json()
+
+def response_body(res_data: Dict[str,Any]) -> str:
+    """
+    Response/RerankResponse JSON built from data this module assembled itself, so
+    no model re-validation. Embeddings go to orjson as one float32 array.
+    """
+    return orjson.dumps(
+        {key:value for key,value in res_data.items() if value is not None},
+        option=orjson.OPT_SERIALIZE_NUMPY
+    ).decode()
+
+def encoder_service() -> EncoderService:
+    return EncoderService(
+        MODEL_PATH,
+        max_batch_size=MAX_BATCH_SIZE,
+        max_batch_tokens=MAX_BATCH_TOKENS,
+        backend=ENCODER_BACKEND,
+        quantize=ONNX_QUANTIZE,
+        num_threads=ENCODER_THREADS
+    )
+
+def embedding_body(req: Request,vecs: np.ndarray,n_tokens: int,tokenization_latency: float,model_latency: float) -> str:
+    if req.encoding_format == "base64":
+        sentence_embeddings = [b64encode(vec.astype("<f4").tobytes()).decode() for vec in vecs]
+    else:
+        sentence_embeddings = np.ascontiguousarray(vecs,dtype=np.float32)
+    res_data = {
+        "crid":req.crid,
+        "sentence_embeddings":sentence_embeddings
+    }
+    if req.extra_stats:
+        res_data["n_tokens"] = n_tokens
+        res_data["tokenization_latency"] = tokenization_latency
+        res_data["model_latency"] = model_latency
+    return response_body(res_data)
+
+def server_timing(tokenization_latency: float,model_latency: float) -> str:
+    # Server-Timing durations are milliseconds, callers fold them into their own timings
+    return f"tokenize;dur={tokenization_latency*1000:.1f},model;dur={model_latency*1000:.1f}"
+
+def rerank(http_body: str) -> (int,str,Dict[str,str]):
+    headers = {"Content-type":"application/json"}
+    if RERANK_MODEL_NAME is None:
+        return 400,ErrorResponse(errors=["no reranking model configured (RERANK_MODEL_NAME)"]).model_dump_json(),headers
+    try:
+        req: RerankRequest = RerankRequest.model_validate_json(http_body)
+    except ValidationError as e:
+        return 400,validation_error_response(e),headers
+    service: RerankerService = RerankerService(
+        RERANK_MODEL_PATH,
+        max_batch_size=MAX_BATCH_SIZE,
+        max_batch_tokens=MAX_BATCH_TOKENS,
+        num_threads=ENCODER_THREADS
+    )
+    try:
+        budget = req.budget_ms/1000 if req.budget_ms is not None else None
+        scores,n_tokens,tokenization_latency,model_latency = service.score(req.query,req.passages,budget)
+        res_data = {
+            "crid":req.crid,
+            "scores":[None if score != score else float(score) for score in scores]
+        }
+        if req.extra_stats:
+            res_data["n_tokens"] = n_tokens
+            res_data["tokenization_latency"] = tokenization_latency
+            res_data["model_latency"] = model_latency
+        headers["Server-Timing"] = server_timing(tokenization_latency,model_latency)
+        return 200,response_body(res_data),headers
+    except Exception as e:
+        service.logger.info("Model Error!",exc_info=True)
+        return 500,ErrorResponse(errors=["model error, view service logs"]).model_dump_json(),headers
 
 def handler(event: Dict[str,Any],context: Any) -> Dict[str,Union[str,int]]:
-    service: EncoderService = EncoderService(MODEL_PATH)
+    if (event.get("path") or "").endswith("/rerank") and event.get("body") is not None:
+        response_status,response_json,headers = rerank(event["body"])
+        return {
+            "headers":headers,
+            "statusCode":response_status,
+            "body":response_json
+        }
+    service: EncoderService = encoder_service()
+    headers = {"Content-type":"application/json"}
     http_body: str = event.get("body")
     if http_body is not None:
         try: 
             req: Request = Request.model_validate_json(http_body)
         except ValidationError as e:
             response_status = 400
-            errs = e.errors()
-            for err in errs:
-                err["loc"] = ".".join(err["loc"])
-            response_json = ErrorResponse(errors=errs).model_dump_json()
+            response_json = validation_error_response(e)
             req = None
         if req is not None:
             try:
-                sentence_embeddings,n_tokens,tokenization_latency,model_latency = service.encode(req.sentences)
-                res_data = {
-                    "crid":req.crid,
-                    "sentence_embeddings":sentence_embeddings
-                }
-                if req.extra_stats:
-                    res_data["n_tokens"] = n_tokens
-                    res_data["tokenization_latency"] = tokenization_latency
-                    res_data["model_latency"] = model_latency
+                vecs,n_tokens,tokenization_latency,model_latency = service.encode(req.sentences)
+                headers["Server-Timing"] = server_timing(tokenization_latency,model_latency)
                 response_status = 200
-                response_json = Response.model_validate(res_data).model_dump_json(exclude_none=True)
+                response_json = embedding_body(req,vecs,n_tokens,tokenization_latency,model_latency)
             except Exception as e:
                 response_status = 500
                 response_json = ErrorResponse(errors=["model error, view service logs"]).model_dump_json()
@@ -45,7 +130,7 @@ def handler(event: Dict[str,Any],context: Any) -> Dict[str,Union[str,int]]:
         response_json = ErrorResponse(errors=["http POST body required"]).model_dump_json()
 
     return {
-        "headers":{"Content-type":"application/json"},
+        "headers":headers,
         "statusCode":response_status,
         "body":response_json
     }
\ No newline at end of file
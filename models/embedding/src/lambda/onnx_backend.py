@@ -0,0 +1,174 @@
+from argparse import ArgumentParser
+from pathlib import Path
+from time import time
+from typing import Dict,List,Optional
+from os import cpu_count,sched_getaffinity
+from inspect import signature
+import json
+import numpy as np
+import onnxruntime as ort
+
+ONNX_DIR = "onnx"
+ONNX_MODEL = "model.onnx"
+ONNX_INT8_MODEL = "model_int8.onnx"
+
+def onnx_model_path(model_path: str,quantize: bool = False) -> Path:
+    return Path(model_path)/ONNX_DIR/(ONNX_INT8_MODEL if quantize else ONNX_MODEL)
+
+def available_cpus() -> int:
+    # Lambda exposes the vCPU allotment for the configured memory size as the affinity mask
+    try:
+        return len(sched_getaffinity(0))
+    except AttributeError:
+        return cpu_count() or 1
+
+def read_max_seq_length(model_path: str,default: int = 512) -> int:
+    config_path = Path(model_path)/"sentence_bert_config.json"
+    if config_path.exists():
+        with open(config_path) as config_file:
+            return json.load(config_file).get("max_seq_length") or default
+    return default
+
+class OnnxEncoder:
+    """Runs an exported sentence-embedding graph (tokens in, pooled embeddings out) on ONNX Runtime."""
+    def __init__(self,onnx_path: Path,num_threads: Optional[int] = None) -> None:
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or available_cpus()
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(onnx_path),options,providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def __call__(self,features: Dict[str,np.ndarray]) -> np.ndarray:
+        inputs = {name:np.asarray(features[name],dtype=np.int64) for name in self.input_names}
+        return self.session.run(None,inputs)[0].astype(np.float32,copy=False)
+
+def export_onnx(model_path: str,quantize: bool = False,opset: int = 17) -> Path:
+    """Exports models/{MODEL_NAME} (transformer + pooling + normalize) to ONNX, optionally int8 quantized."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    encoder = SentenceTransformer(model_path,trust_remote_code=True,device="cpu")
+    input_names: List[str] = list(encoder.tokenizer.model_input_names)
+
+    class SentenceEmbeddingGraph(torch.nn.Module):
+        def __init__(self) -> None:
+            super().__init__()
+            self.encoder = encoder
+
+        def forward(self,*inputs):
+            return self.encoder(dict(zip(input_names,inputs)))["sentence_embedding"]
+
+    onnx_path = onnx_model_path(model_path)
+    onnx_path.parent.mkdir(parents=True,exist_ok=True)
+    sample = encoder.tokenizer(["export sample sentence"],return_tensors="pt")
+    dynamic_axes = {name:{0:"batch",1:"sequence"} for name in input_names}
+    dynamic_axes["sentence_embedding"] = {0:"batch"}
+    # newer torch defaults to the dynamo exporter, keep the TorchScript one used by the pinned version
+    export_kwargs = {"dynamo":False} if "dynamo" in signature(torch.onnx.export).parameters else {}
+    with torch.inference_mode():
+        torch.onnx.export(
+            SentenceEmbeddingGraph().eval(),
+            tuple(sample[name] for name in input_names),
+            str(onnx_path),
+            input_names=input_names,
+            output_names=["sentence_embedding"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            **export_kwargs
+        )
+    if not quantize:
+        return onnx_path
+    from onnxruntime.quantization import quantize_dynamic,QuantType
+    int8_path = onnx_model_path(model_path,quantize=True)
+    quantize_dynamic(str(onnx_path),str(int8_path),weight_type=QuantType.QInt8)
+    return int8_path
+
+def compare(model_path: str,quantize: bool,n_sentences: int,batch_size: int) -> Dict[str,float]:
+    """Parity (cosine vs. torch) and throughput of the ONNX backend on synthetic sentences."""
+    from sentence_transformers import SentenceTransformer
+    rng = np.random.default_rng(0)
+    encoder = SentenceTransformer(model_path,trust_remote_code=True,device="cpu")
+    vocab = [token for token in encoder.tokenizer.get_vocab() if token.isalpha()]
+    sentences = [" ".join(rng.choice(vocab,size=int(rng.integers(4,64)))) for _ in range(n_sentences)]
+
+    torch_start = time()
+    torch_vecs = encoder.encode(sentences,batch_size=batch_size,convert_to_numpy=True)
+    torch_seconds = time()-torch_start
+
+    onnx_encoder = OnnxEncoder(onnx_model_path(model_path,quantize))
+    max_length = read_max_seq_length(model_path)
+    onnx_start = time()
+    onnx_vecs = np.concatenate([
+        onnx_encoder(encoder.tokenizer(
+            sentences[i:i+batch_size],
+            padding=True,
+            truncation=True,
+            max_length=max_length,
+            return_tensors="np"
+        ))
+        for i in range(0,n_sentences,batch_size)
+    ])
+    onnx_seconds = time()-onnx_start
+
+    cosine = np.sum(torch_vecs*onnx_vecs,axis=1)/(
+        np.linalg.norm(torch_vecs,axis=1)*np.linalg.norm(onnx_vecs,axis=1)
+    )
+    return {
+        "min_cosine":float(cosine.min()),
+        "mean_cosine":float(cosine.mean()),
+        "torch_sentences_per_sec":n_sentences/torch_seconds,
+        "onnx_sentences_per_sec":n_sentences/onnx_seconds,
+        "speedup":torch_seconds/onnx_seconds
+    }
+
+def parse_args() -> Dict[str,str]:
+    parser = ArgumentParser(
+            prog="OnnxBackend",
+            description="Export the embedding model to ONNX and check it against the torch model"
+        )
+    parser.add_argument(
+        "command",
+        choices=["export","compare"],
+        help="export: write models/{MODEL_NAME}/onnx, compare: parity and throughput vs torch"
+    )
+    parser.add_argument(
+        "-m","--model-path",
+        type=str,
+        required=True,
+        help="The sentence-transformers model directory"
+    )
+    parser.add_argument(
+        "-q","--quantize",
+        action="store_true",
+        help="Use dynamic int8 quantization"
+    )
+    parser.add_argument(
+        "-n","--n-sentences",
+        type=int,
+        default=512,
+        help="Number of synthetic sentences for compare"
+    )
+    parser.add_argument(
+        "-b","--batch-size",
+        type=int,
+        default=32,
+        help="Batch size for compare"
+    )
+    parser.add_argument(
+        "--min-cosine",
+        type=float,
+        default=0.99,
+        help="compare fails below this cosine similarity"
+    )
+    return parser.parse_args().__dict__
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args["command"] == "export":
+        print(export_onnx(args["model_path"],args["quantize"]))
+    else:
+        report = compare(args["model_path"],args["quantize"],args["n_sentences"],args["batch_size"])
+        print(json.dumps(report,indent=2))
+        if report["min_cosine"] < args["min_cosine"]:
+            raise SystemExit(f"Parity check failed: min cosine {report['min_cosine']:.4f} < {args['min_cosine']}")
@@ -0,0 +1,272 @@
+import asyncio
+import logging
+import numpy as np
+from argparse import ArgumentParser
+from base64 import b64encode
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from os import environ as env
+from typing import Any,Callable,Deque,Dict,List,NamedTuple,Optional,Tuple
+from pydantic import ValidationError
+
+from api import Request,OpenAIEmbeddingRequest,ErrorResponse
+from service import truncate_embeddings
+from lambda_function import MODEL_NAME,encoder_service,embedding_body,rerank,response_body,server_timing,validation_error_response
+
+# Concurrent requests are coalesced into one forward pass of up to BATCH_MAX_SENTENCES sentences,
+# the first queued request waits at most BATCH_MAX_WAIT_MS for others to join it
+BATCH_MAX_SENTENCES=int(env.get("BATCH_MAX_SENTENCES","256"))
+BATCH_MAX_WAIT_MS=float(env.get("BATCH_MAX_WAIT_MS","5"))
+
+LOGGER = logging.getLogger("service")
+
+class Encoded(NamedTuple):
+    vecs: np.ndarray
+    n_tokens: int
+    tokenization_latency: float
+    model_latency: float
+    queue_latency: float
+
+class Queued(NamedTuple):
+    sentences: List[str]
+    future: asyncio.Future
+    queued: float
+
+class MicroBatcher:
+    """
+    Queues encode calls from concurrent requests and runs them as one batched
+    encode on a single model thread, then slices the vectors back per caller.
+    A request is never split, one over max_sentences runs on its own.
+    """
+    def __init__(
+        self,
+        encode: Callable[[List[str]],Tuple[np.ndarray,List[int],float,float]],
+        max_sentences: int = BATCH_MAX_SENTENCES,
+        max_wait: float = BATCH_MAX_WAIT_MS/1000
+    ) -> None:
+        self.encode_fn = encode
+        self.max_sentences = max_sentences
+        self.max_wait = max_wait
+        # one thread: batches queue up behind the model instead of competing for cores
+        self.executor = ThreadPoolExecutor(1,thread_name_prefix="encoder")
+        self.batches = 0
+        self.requests = 0
+        self.sentences = 0
+        self._pending: Deque[Queued] = deque()
+        self._queued_sentences = 0
+        self._ready = asyncio.Event()
+        self._full = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+
+    async def encode(self,sentences: List[str]) -> Encoded:
+        if len(sentences) == 0:
+            return Encoded(np.empty((0,0),dtype=np.float32),0,0.0,0.0,0.0)
+        loop = asyncio.get_running_loop()
+        if self._worker is None:
+            self._worker = loop.create_task(self._run())
+        future = loop.create_future()
+        self._pending.append(Queued(sentences,future,loop.time()))
+        self._queued_sentences += len(sentences)
+        self._ready.set()
+        if self._queued_sentences >= self.max_sentences:
+            self._full.set()
+        return await future
+
+    def run(self,fn: Callable,*args) -> asyncio.Future:
+        """Runs other model work (e.g. /rerank) on the model thread, in turn with the batches."""
+        return asyncio.get_running_loop().run_in_executor(self.executor,fn,*args)
+
+    def _take(self) -> List[Queued]:
+        batch = []
+        size = 0
+        while len(self._pending) > 0:
+            item = self._pending[0]
+            if len(batch) > 0 and size+len(item.sentences) > self.max_sentences:
+                break
+            self._pending.popleft()
+            self._queued_sentences -= len(item.sentences)
+            # callers that went away (cancelled/disconnected) are dropped before the model sees them
+            if not item.future.done():
+                batch.append(item)
+                size += len(item.sentences)
+        if len(self._pending) == 0:
+            self._ready.clear()
+        if self._queued_sentences < self.max_sentences:
+            self._full.clear()
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._ready.wait()
+            # waiting counts from the oldest request, ones queued during the last pass go straight away
+            wait = self._pending[0].queued+self.max_wait-loop.time()
+            if wait > 0 and not self._full.is_set():
+                try:
+                    await asyncio.wait_for(self._full.wait(),wait)
+                except asyncio.TimeoutError:
+                    pass
+            batch = self._take()
+            if len(batch) > 0:
+                await self._encode(batch)
+
+    async def _encode(self,batch: List[Queued]) -> None:
+        loop = asyncio.get_running_loop()
+        sentences = [sentence for item in batch for sentence in item.sentences]
+        start = loop.time()
+        try:
+            vecs,lengths,tokenization_latency,model_latency = await self.run(self.encode_fn,sentences)
+        except Exception as e:
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+        self.batches += 1
+        self.requests += len(batch)
+        self.sentences += len(sentences)
+        offset = 0
+        for item in batch:
+            end = offset+len(item.sentences)
+            if not item.future.done():
+                item.future.set_result(Encoded(
+                    vecs[offset:end],
+                    sum(lengths[offset:end]),
+                    tokenization_latency,
+                    model_latency,
+                    start-item.queued
+                ))
+            offset = end
+
+    def stats(self) -> Dict[str,Any]:
+        return {
+            "batches":self.batches,
+            "requests":self.requests,
+            "sentences":self.sentences,
+            "queued":len(self._pending),
+            "mean_batch_sentences":self.sentences/self.batches if self.batches > 0 else 0.0
+        }
+
+_BATCHER: Optional[MicroBatcher] = None
+
+def batcher() -> MicroBatcher:
+    global _BATCHER
+    if _BATCHER is None:
+        _BATCHER = MicroBatcher(lambda sentences: encoder_service().encode_lengths(sentences))
+    return _BATCHER
+
+def batch_server_timing(res: Encoded) -> str:
+    return f"queue;dur={res.queue_latency*1000:.1f},{server_timing(res.tokenization_latency,res.model_latency)}"
+
+async def encode(http_body: bytes) -> (int,str,Dict[str,str]):
+    headers = {"Content-type":"application/json"}
+    try:
+        req: Request = Request.model_validate_json(http_body)
+    except ValidationError as e:
+        return 400,validation_error_response(e),headers
+    try:
+        res = await batcher().encode(req.sentences)
+    except Exception as e:
+        LOGGER.info("Model Error!",exc_info=True)
+        return 500,ErrorResponse(errors=["model error, view service logs"]).model_dump_json(),headers
+    headers["Server-Timing"] = batch_server_timing(res)
+    return 200,embedding_body(req,res.vecs,res.n_tokens,res.tokenization_latency,res.model_latency),headers
+
+async def openai_embeddings(http_body: bytes) -> (int,str,Dict[str,str]):
+    """OpenAI /v1/embeddings, so the server can be the search service's EMBEDDING_API_ENDPOINT."""
+    headers = {"Content-type":"application/json"}
+    try:
+        req: OpenAIEmbeddingRequest = OpenAIEmbeddingRequest.model_validate_json(http_body)
+    except ValidationError as e:
+        return 400,validation_error_response(e),headers
+    texts = [req.input] if isinstance(req.input,str) else req.input
+    try:
+        res = await batcher().encode(texts)
+    except Exception as e:
+        LOGGER.info("Model Error!",exc_info=True)
+        return 500,ErrorResponse(errors=["model error, view service logs"]).model_dump_json(),headers
+    vecs = np.ascontiguousarray(truncate_embeddings(res.vecs,req.dimensions),dtype=np.float32)
+    data = [
+        {
+            "object":"embedding",
+            "index":i,
+            "embedding":b64encode(vec.astype("<f4").tobytes()).decode() if req.encoding_format == "base64" else vec
+        }
+        for i,vec in enumerate(vecs)
+    ]
+    headers["Server-Timing"] = batch_server_timing(res)
+    return 200,response_body({
+        "object":"list",
+        "data":data,
+        "model":req.model or MODEL_NAME,
+        "usage":{"prompt_tokens":res.n_tokens,"total_tokens":res.n_tokens}
+    }),headers
+
+async def read_body(receive: Callable) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body",b""))
+        if not message.get("more_body",False):
+            return b"".join(chunks)
+
+async def send_response(send: Callable,status: int,body: str,headers: Dict[str,str]) -> None:
+    payload = body.encode()
+    await send({
+        "type":"http.response.start",
+        "status":status,
+        "headers":[
+            *((key.lower().encode(),value.encode()) for key,value in headers.items()),
+            (b"content-length",str(len(payload)).encode())
+        ]
+    })
+    await send({"type":"http.response.body","body":payload})
+
+async def lifespan(receive: Callable,send: Callable) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # load the model before taking traffic, not on the first request
+            await batcher().run(encoder_service)
+            await send({"type":"lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            batcher().executor.shutdown(wait=False)
+            await send({"type":"lifespan.shutdown.complete"})
+            return
+
+async def app(scope: Dict[str,Any],receive: Callable,send: Callable) -> None:
+    """
+    Plain ASGI app, long running counterpart of lambda_function.handler:
+    POST /rerank, POST /v1/embeddings (OpenAI format), GET /health, and any
+    other POST path is the Request/Response encode API.
+    """
+    if scope["type"] == "lifespan":
+        return await lifespan(receive,send)
+    path = scope["path"].rstrip("/")
+    headers = {"Content-type":"application/json"}
+    if scope["method"] == "GET" and path == "/health":
+        return await send_response(send,200,response_body({"status":"ok",**batcher().stats()}),headers)
+    if scope["method"] != "POST":
+        return await send_response(send,405,ErrorResponse(errors=["http POST body required"]).model_dump_json(),headers)
+    http_body = await read_body(receive)
+    if path.endswith("/rerank"):
+        status,body,headers = await batcher().run(rerank,http_body)
+    elif path.endswith("/v1/embeddings"):
+        status,body,headers = await openai_embeddings(http_body)
+    else:
+        status,body,headers = await encode(http_body)
+    await send_response(send,status,body,headers)
+
+def parse_args() -> Dict[str,Any]:
+    parser = ArgumentParser(
+            prog="EmbeddingServer",
+            description="Micro-batching HTTP server around the same EncoderService as the Lambda handler"
+        )
+    parser.add_argument("--host",type=str,default="0.0.0.0",help="Interface to bind")
+    parser.add_argument("-p","--port",type=int,default=8080,help="Port to listen on")
+    return parser.parse_args().__dict__
+
+if __name__ == "__main__":
+    import uvicorn
+    args = parse_args()
+    # one process per model copy, the batcher is what uses the cores (ENCODER_THREADS)
+    uvicorn.run(app,host=args["host"],port=args["port"],workers=1,log_level="warning")
@@ -1,8 +1,7 @@
-from sentence_transformers import SentenceTransformer
-from transformers import AutoTokenizer
 from pydantic import BaseModel,ValidationError
-from typing import List
+from typing import List,Dict,Optional
 from time import time
+import numpy as np
 import logging
 
 class Singleton(type):
@@ -12,21 +11,158 @@ class Singleton(type):
             cls._instance = super(Singleton,cls).__call__(*args,**kwargs)
         return cls._instance
 
+def length_buckets(lengths: List[int],max_batch_size: int,max_batch_tokens: int) -> List[List[int]]:
+    """
+    Groups indices of similar token length (longest first) so each padded batch stays
+    under max_batch_size rows and max_batch_tokens padded tokens.
+    """
+    order = sorted(range(len(lengths)),key=lambda i: lengths[i],reverse=True)
+    buckets = []
+    bucket = []
+    for i in order:
+        # sorted longest first, so the bucket's first entry sets its padded width
+        padded_width = lengths[bucket[0]] if len(bucket) > 0 else lengths[i]
+        if len(bucket) > 0 and (len(bucket) >= max_batch_size or (len(bucket)+1)*padded_width > max_batch_tokens):
+            buckets.append(bucket)
+            bucket = []
+        bucket.append(i)
+    if len(bucket) > 0:
+        buckets.append(bucket)
+    return buckets
+
+def truncate_embeddings(vecs: np.ndarray,dims: Optional[int]) -> np.ndarray:
+    """Matryoshka truncation like text-embedding-3 `dimensions`: keeps the leading dims and re-normalizes."""
+    if dims is None or vecs.shape[1] <= dims:
+        return vecs
+    vecs = vecs[:,:dims]
+    norms = np.linalg.norm(vecs,axis=1,keepdims=True)
+    return vecs/np.where(norms > 0,norms,1)
+
 class EncoderService(metaclass=Singleton):
-    def __init__(self,model_path: str, log_level: str = 'INFO') -> None:
-        self.encoder = SentenceTransformer(model_path,trust_remote_code=True)
-        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+    def __init__(
+        self,
+        model_path: str,
+        log_level: str = 'INFO',
+        max_batch_size: int = 32,
+        max_batch_tokens: int = 8192,
+        backend: str = "torch",
+        quantize: bool = False,
+        num_threads: Optional[int] = None
+    ) -> None:
+        # Each backend imports only its own runtime and loads the model artifacts once
+        # onnx: run an exported (optionally int8) graph on ONNX Runtime, see onnx_backend.py
+        if backend == "onnx":
+            from transformers import AutoTokenizer
+            from onnx_backend import OnnxEncoder,onnx_model_path,read_max_seq_length
+            self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+            self.encoder = None
+            self.onnx_encoder = OnnxEncoder(onnx_model_path(model_path,quantize),num_threads)
+            self.max_seq_length = read_max_seq_length(model_path,self.tokenizer.model_max_length)
+        else:
+            import torch
+            from sentence_transformers import SentenceTransformer
+            self.encoder = SentenceTransformer(model_path,trust_remote_code=True)
+            # the encoder already loaded this tokenizer, don't read it from disk twice
+            self.tokenizer = self.encoder.tokenizer
+            self.onnx_encoder = None
+            self.max_seq_length = self.encoder.max_seq_length
+            if num_threads is not None:
+                torch.set_num_threads(num_threads)
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
         logger = logging.getLogger('service')
         logger.setLevel(log_level)
         self.logger = logger
 
+    def _forward(self,encoded: Dict[str,List[List[int]]],bucket: List[int]) -> np.ndarray:
+        batch = {key:[values[i] for i in bucket] for key,values in encoded.items()}
+        if self.onnx_encoder is not None:
+            return self.onnx_encoder(self.tokenizer.pad(batch,return_tensors="np"))
+        import torch
+        features = self.tokenizer.pad(batch,return_tensors="pt")
+        features = {key:tensor.to(self.encoder.device) for key,tensor in features.items()}
+        with torch.inference_mode():
+            return self.encoder.forward(features)["sentence_embedding"].float().cpu().numpy()
+
     #Get embedding vectors for list of sentences
-    def encode(self,sentences:List[str]) -> (List[float],int):
+    def encode(self,sentences:List[str]) -> (np.ndarray,int):
+        vecs,lengths,tok_latency,model_latency = self.encode_lengths(sentences)
+        return vecs,sum(lengths),tok_latency,model_latency
+
+    #Tokenizes once (unpadded), then pads and runs each length bucket separately
+    #Token count per sentence, so a coalesced batch can be split back per request
+    def encode_lengths(self,sentences:List[str]) -> (np.ndarray,List[int],float,float):
+        if len(sentences) == 0:
+            return np.empty((0,0),dtype=np.float32),[],0.0,0.0
         tok_start = time()
-        encoded_input = self.tokenizer(sentences,padding=True,truncation=True,return_tensors="pt")
-        tok_latency = time()-tok_start        
-        num_tokens = encoded_input.attention_mask.sum()
+        encoded_input = self.tokenizer(
+            sentences,
+            padding=False,
+            truncation=True,
+            max_length=self.max_seq_length
+        )
+        tok_latency = time()-tok_start
+        lengths = [len(ids) for ids in encoded_input["input_ids"]]
+        infer_start = time()
+        vecs = None
+        for bucket in length_buckets(lengths,self.max_batch_size,self.max_batch_tokens):
+            embeddings = self._forward(encoded_input,bucket)
+            if vecs is None:
+                vecs = np.empty((len(sentences),embeddings.shape[1]),dtype=np.float32)
+            vecs[bucket] = embeddings
+        model_latency = time()-infer_start
+        return vecs,lengths,tok_latency,model_latency
+
+class RerankerService(metaclass=Singleton):
+    """Cross-encoder (query, passage) relevance scoring, batched the same way as EncoderService."""
+    def __init__(
+        self,
+        model_path: str,
+        log_level: str = 'INFO',
+        max_batch_size: int = 32,
+        max_batch_tokens: int = 8192,
+        num_threads: Optional[int] = None
+    ) -> None:
+        import torch
+        from transformers import AutoTokenizer,AutoModelForSequenceClassification
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_path).eval()
+        if num_threads is not None:
+            torch.set_num_threads(num_threads)
+        self.max_seq_length = min(self.tokenizer.model_max_length,512)
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        logger = logging.getLogger('service')
+        logger.setLevel(log_level)
+        self.logger = logger
+
+    def _forward(self,encoded: Dict[str,List[List[int]]],bucket: List[int]) -> np.ndarray:
+        import torch
+        batch = {key:[values[i] for i in bucket] for key,values in encoded.items()}
+        features = self.tokenizer.pad(batch,return_tensors="pt")
+        with torch.inference_mode():
+            logits = self.model(**features).logits.float()
+        # single-logit (ms-marco style) models score directly, classifiers by their "relevant" logit
+        return logits[:,0].numpy() if logits.shape[1] == 1 else logits[:,-1].numpy()
+
+    #Scores (query, passage) pairs, NaN for passages left unscored when the budget ran out
+    def score(self,query: str,passages: List[str],budget: Optional[float] = None) -> (np.ndarray,int,float,float):
+        start = time()
+        encoded_input = self.tokenizer(
+            [query]*len(passages),
+            passages,
+            padding=False,
+            truncation="only_second",
+            max_length=self.max_seq_length
+        )
+        tok_latency = time()-start
+        lengths = [len(ids) for ids in encoded_input["input_ids"]]
+        scores = np.full(len(passages),np.nan,dtype=np.float32)
         infer_start = time()
-        vecs = self.encoder.encode(sentences,convert_to_tensor=True).tolist()
+        for bucket in length_buckets(lengths,self.max_batch_size,self.max_batch_tokens):
+            if budget is not None and time()-start > budget:
+                self.logger.warning(f"Rerank budget exceeded, {int(np.isnan(scores).sum())} passages unscored")
+                break
+            scores[bucket] = self._forward(encoded_input,bucket)
         model_latency = time()-infer_start
-        return vecs,num_tokens,tok_latency,model_latency
\ No newline at end of file
+        return scores,sum(lengths),tok_latency,model_latency
@@ -0,0 +1,7 @@
+from pathlib import Path
+
+path_parts = list(Path(__file__).parent.absolute().parts)
+path_parts.pop(-3)
+path_parts.pop(-3)
+
+SRC_DIR = Path(*path_parts)
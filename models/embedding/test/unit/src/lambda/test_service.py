@@ -0,0 +1,80 @@
+from sys import path as PYTHONPATH
+from os import environ as env
+import json
+import pytest
+
+from test_constants import SRC_DIR
+PYTHONPATH.append(str(SRC_DIR))
+
+WORDS = ["hello","world","search","index"]
+
+@pytest.fixture(scope="module")
+def task_root(tmp_path_factory):
+    # a tiny random BERT, just enough to run the real encode path
+    from transformers import BertConfig,BertModel,BertTokenizerFast
+    from sentence_transformers import SentenceTransformer,models
+    root = tmp_path_factory.mktemp("task_root")
+    raw = root/"raw"
+    raw.mkdir()
+    (raw/"vocab.txt").write_text("\n".join(["[PAD]","[UNK]","[CLS]","[SEP]","[MASK]"]+WORDS))
+    tokenizer = BertTokenizerFast(vocab_file=str(raw/"vocab.txt"))
+    BertModel(BertConfig(
+        vocab_size=tokenizer.vocab_size,
+        hidden_size=16,
+        num_hidden_layers=1,
+        num_attention_heads=2,
+        intermediate_size=32,
+        max_position_embeddings=64
+    )).save_pretrained(str(raw))
+    tokenizer.save_pretrained(str(raw))
+    transformer = models.Transformer(str(raw),max_seq_length=32)
+    SentenceTransformer(modules=[transformer,models.Pooling(16),models.Normalize()]).save(str(root/"models"/"tiny"))
+    return root
+
+@pytest.fixture(scope="module")
+def lambda_function(task_root):
+    env["LAMBDA_TASK_ROOT"] = str(task_root)
+    env["MODEL_NAME"] = "tiny"
+    import lambda_function
+    return lambda_function
+
+def test_encode(lambda_function):
+    res = lambda_function.handler({"body":json.dumps({"sentences":["hello world","search"],"extra_stats":True})},None)
+    assert res["statusCode"] == 200
+    body = json.loads(res["body"])
+    assert [len(vec) for vec in body["sentence_embeddings"]] == [16,16]
+    assert body["n_tokens"] == 7
+
+def test_encode_empty_batch(lambda_function):
+    for encoding_format in ("float","base64"):
+        res = lambda_function.handler({"body":json.dumps({"sentences":[],"encoding_format":encoding_format})},None)
+        assert res["statusCode"] == 200
+        assert json.loads(res["body"]) == {"sentence_embeddings":[]}
+
+def test_truncate_embeddings():
+    import numpy as np
+    from service import truncate_embeddings
+    vecs = np.array([[3.0,4.0,12.0],[0.0,0.0,1.0]],dtype=np.float32)
+    assert truncate_embeddings(vecs,None) is vecs
+    np.testing.assert_allclose(truncate_embeddings(vecs,2),[[0.6,0.8],[0.0,0.0]])
+
+def test_invalid_batch_element_is_a_client_error(lambda_function):
+    res = lambda_function.handler({"body":json.dumps({"sentences":["hello",1]})},None)
+    assert res["statusCode"] == 400
+    assert [err["loc"] for err in json.loads(res["body"])["errors"]] == ["sentences.1"]
+
+def test_onnx_backend(task_root,lambda_function,monkeypatch):
+    import numpy as np
+    from onnx_backend import export_onnx,compare,onnx_model_path
+    from service import EncoderService
+    model_path = str(task_root/"models"/"tiny")
+    sentences = ["hello world","search index hello","world"]
+    torch_vecs,_,_,_ = lambda_function.encoder_service().encode(sentences)
+    for quantize in (False,True):
+        assert export_onnx(model_path,quantize) == onnx_model_path(model_path,quantize)
+        assert compare(model_path,quantize,n_sentences=16,batch_size=8)["min_cosine"] > 0.999
+        # a fresh EncoderService, the module's singleton is the torch one
+        monkeypatch.setattr(EncoderService,"_instance",None)
+        onnx_vecs,lengths,_,_ = EncoderService(model_path,backend="onnx",quantize=quantize).encode_lengths(sentences)
+        assert lengths == [4,5,3]
+        np.testing.assert_allclose(onnx_vecs,torch_vecs,atol=1e-5 if not quantize else 1e-2)
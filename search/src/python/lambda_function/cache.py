@@ -0,0 +1,117 @@
+from collections import OrderedDict
+from threading import Lock,RLock
+from time import monotonic
+from typing import Any,Callable,Dict,Hashable,List,Optional,Tuple
+
+class LRUCache:
+    """
+    Small thread-safe LRU map with an optional per-entry TTL (seconds) and an
+    optional total size bound (maxbytes, sizes from `sizeof`).
+    Lives at module level so entries survive across warm Lambda invocations.
+    """
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: Optional[float] = None,
+        maxbytes: Optional[int] = None,
+        sizeof: Callable[[Any],int] = lambda value: 0
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable,Tuple[float,Any,int]]" = OrderedDict()
+        self._lock = RLock()
+        # per-key [lock,waiters] of in-flight get_or_create factories
+        self._creating: Dict[Hashable,List] = {}
+
+    def _expired(self,created: float) -> bool:
+        return self.ttl is not None and monotonic()-created > self.ttl
+
+    def get(self,key: Hashable,default: Any = None) -> Any:
+        return self._get(key,default,count=True)
+
+    def _get(self,key: Hashable,default: Any,count: bool) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or self._expired(entry[0]):
+                if entry is not None:
+                    del self._data[key]
+                    self.bytes -= entry[2]
+                self.misses += count
+                return default
+            self._data.move_to_end(key)
+            self.hits += count
+            return entry[1]
+
+    def put(self,key: Hashable,value: Any) -> None:
+        with self._lock:
+            old = self._data.get(key)
+            if old is not None:
+                self.bytes -= old[2]
+            size = self.sizeof(value)
+            self._data[key] = (monotonic(),value,size)
+            self._data.move_to_end(key)
+            self.bytes += size
+            while len(self._data) > self.maxsize or (self.maxbytes is not None and self.bytes > self.maxbytes):
+                _,(_,_,evicted) = self._data.popitem(last=False)
+                self.bytes -= evicted
+
+    def get_or_create(self,key: Hashable,factory: Callable[[],Any]) -> Any:
+        """
+        Factories (e.g. opening a table on S3) run outside the cache lock, only
+        callers of the same key wait for each other, the rest keep hitting.
+        """
+        sentinel = object()
+        value = self.get(key,sentinel)
+        if value is not sentinel:
+            return value
+        with self._lock:
+            creating = self._creating.setdefault(key,[Lock(),0])
+            creating[1] += 1
+        try:
+            with creating[0]:
+                # another caller may have created it while this one waited
+                value = self._get(key,sentinel,count=False)
+                if value is sentinel:
+                    value = factory()
+                    self.put(key,value)
+                return value
+        finally:
+            with self._lock:
+                creating[1] -= 1
+                if creating[1] == 0:
+                    del self._creating[key]
+
+    def pop(self,key: Hashable,default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key,None)
+            if entry is None:
+                return default
+            self.bytes -= entry[2]
+            return entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._data)
+
+    def stats(self) -> Dict[str,int]:
+        return {"size":len(self),"hits":self.hits,"misses":self.misses}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self,key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and not self._expired(entry[0])
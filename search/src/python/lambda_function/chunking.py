@@ -0,0 +1,88 @@
+import re
+from collections import deque
+from typing import Deque,Iterable,Iterator,List,Tuple
+from .ingest import estimate_tokens,document_id
+from .models.db import Document,DocumentFormat,Text
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+# "Speaker: text", optionally behind a timestamp: "[00:01:02] Speaker: text"
+SPEAKER_TURN = re.compile(r"^\s*(?:\[?\d{1,2}(?::\d{2}){1,2}(?:[.,]\d+)?\]?\s*)?([A-Za-z][\w .'-]{0,40}?):\s+(.*)$")
+
+def split_words(text: str,max_tokens: int,prefix: str = "") -> Iterator[str]:
+    """Fallback for a single sentence longer than a chunk."""
+    words: List[str] = []
+    tokens = estimate_tokens(prefix)
+    # a run of text without spaces (urls, base64...) is cut every max_tokens*4 chars
+    pieces = (word[i:i+max_tokens*4] for word in text.split() for i in range(0,len(word),max_tokens*4))
+    for word in pieces:
+        word_tokens = estimate_tokens(word)
+        if len(words) > 0 and tokens+word_tokens > max_tokens:
+            yield prefix+" ".join(words)
+            words,tokens = [],estimate_tokens(prefix)
+        words.append(word)
+        tokens += word_tokens
+    if len(words) > 0:
+        yield prefix+" ".join(words)
+
+def sentences(text: str,max_tokens: int,prefix: str = "") -> Iterator[str]:
+    for sentence in SENTENCE_END.split(text.strip()):
+        if len(sentence) == 0:
+            continue
+        if estimate_tokens(prefix+sentence) > max_tokens:
+            yield from split_words(sentence,max_tokens,prefix)
+        else:
+            yield prefix+sentence
+
+def speaker_turns(text: str) -> Iterator[Tuple[str,str]]:
+    """Yields (speaker prefix, turn text), lines without a speaker continue the current turn."""
+    prefix,lines = "",[]
+    for line in text.splitlines():
+        match = SPEAKER_TURN.match(line)
+        if match is not None:
+            if len(lines) > 0:
+                yield prefix," ".join(lines)
+            prefix,lines = f"{match.group(1).strip()}: ",[match.group(2).strip()]
+        elif len(line.strip()) > 0:
+            lines.append(line.strip())
+    if len(lines) > 0:
+        yield prefix," ".join(lines)
+
+def transcript_units(text: str,max_tokens: int) -> Iterator[str]:
+    # whole turns where they fit, long turns split on sentences with the speaker kept on each piece
+    for prefix,turn in speaker_turns(text):
+        if estimate_tokens(prefix+turn) <= max_tokens:
+            yield prefix+turn
+        else:
+            yield from sentences(turn,max_tokens,prefix)
+
+def windows(units: Iterable[str],chunk_tokens: int,overlap_tokens: int,separator: str) -> Iterator[str]:
+    """
+    Packs units (sentences/turns) into chunks of up to chunk_tokens, carrying
+    the trailing units worth up to overlap_tokens into the next chunk.
+    """
+    window: Deque[str] = deque()
+    tokens = 0
+    for unit in units:
+        unit_tokens = estimate_tokens(unit)
+        if len(window) > 0 and tokens+unit_tokens > chunk_tokens:
+            yield separator.join(window)
+            while len(window) > 0 and (tokens > overlap_tokens or tokens+unit_tokens > chunk_tokens):
+                tokens -= estimate_tokens(window.popleft())
+        window.append(unit)
+        tokens += unit_tokens
+    if len(window) > 0:
+        yield separator.join(window)
+
+def chunk_document(doc: Document,chunk_tokens: int,overlap_tokens: int) -> Iterator[Text]:
+    if doc.format == DocumentFormat.TRANSCRIPT:
+        chunks = windows(transcript_units(doc.text,chunk_tokens),chunk_tokens,overlap_tokens,"\n")
+    else:
+        chunks = windows(sentences(doc.text,chunk_tokens),chunk_tokens,overlap_tokens," ")
+    doc_id = doc.id or document_id(doc.text)
+    for i,chunk in enumerate(chunks):
+        yield Text(id=f"{doc_id}:{i}",text=chunk,metadata=doc.metadata)
+
+def chunk_documents(docs: Iterable[Document],chunk_tokens: int,overlap_tokens: int) -> Iterator[Text]:
+    """Lazily chunks documents one at a time, so chunks stream straight into embedding and writes."""
+    for doc in docs:
+        yield from chunk_document(doc,chunk_tokens,overlap_tokens)
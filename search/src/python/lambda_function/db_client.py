@@ -1,64 +1,626 @@
+import logging
+import re
 from functools import cached_property
-from typing import List,Dict,Union,Any, Optional
+from typing import List,Dict,Iterable,Union,Any, Optional,Callable
+from datetime import datetime,timedelta
+from os import environ as env
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
+from pydantic import create_model
+import pyarrow as pa
+import pyarrow.fs as pafs
 import lancedb
 from lancedb.embeddings import EmbeddingFunctionConfig
+from lancedb.pydantic import LanceModel,Vector
 from .models.db import (
     TextEmbeddingSchema,
     InitIndexFromData,
     InitIndexFromTranscript,
+    InitOptions,
+    Text,
+    MetadataType,
     SearchIndexRequest,
+    SearchBatchRequest,
+    UpsertRequest,
+    UpsertStats,
+    MaintenanceRequest,
+    MaintenanceStats,
+    TableStorageStats,
+    IngestStats,
+    SearchType,
+    FusionType,
+    VectorIndexType,
+    VectorType,
+    VectorIndexConfig,
     TableNotSetException,
     TableNotFoundException,
+    InvalidFilterException,
+    FullTextIndexMissingException,
     BM25_INDEX
 )
-from .embedding_client import text_embedding_udf
+from .embedding_client import text_embedding_udf,embedding_function
+from .cache import LRUCache
+from .ingest import ingest,unique_ids,metadata_fields,metadata_rows,to_record_batch
+from .chunking import chunk_documents
+from .mirror import MIRROR,is_remote
+from .rerank import rerank,RERANK_SCORE
+from .result_cache import RESULT_CACHE,result_key,table_state
+from .timing import span,bind
+from .fusion import reciprocal_rank_fusion,weighted_score_fusion,ROW_ID,RELEVANCE_SCORE
+
+LOGGER = logging.getLogger("rag-search.service")
+
+# Warm-invocation registry of connections and opened tables
+TABLE_CACHE_SIZE = int(env.get("TABLE_CACHE_SIZE","16"))
+TABLE_CACHE_TTL = float(env.get("TABLE_CACHE_TTL","900"))
+# How stale (seconds) a cached table may be before lance checks for a newer version
+TABLE_VERSION_CHECK_INTERVAL = float(env.get("TABLE_VERSION_CHECK_INTERVAL","5"))
+
+_CONNECTIONS = LRUCache(TABLE_CACHE_SIZE,TABLE_CACHE_TTL)
+_TABLES = LRUCache(TABLE_CACHE_SIZE,TABLE_CACHE_TTL)
+
+# Hybrid search runs its ANN and FTS legs side by side on this pool
+SEARCH_THREADS = int(env.get("SEARCH_THREADS","4"))
+_SEARCH_POOL = ThreadPoolExecutor(max_workers=SEARCH_THREADS,thread_name_prefix="search")
+# /search_batch queries run here, separate from the leg pool so hybrid queries can't starve it
+_BATCH_POOL = ThreadPoolExecutor(max_workers=SEARCH_THREADS,thread_name_prefix="search-batch")
+
+# The full-text leg falls back to post-filtering top_n*FTS_POSTFILTER_OVERFETCH hits when a prefilter fails
+FTS_POSTFILTER_OVERFETCH = int(env.get("FTS_POSTFILTER_OVERFETCH","10"))
+
+# lance errors end with the rust source location they were raised at
+LANCE_SOURCE_LOCATION = re.compile(r", /\S+:\d+:\d+$")
+
+# Below this many rows a flat scan is as fast as an ANN index, so none is built
+VECTOR_INDEX_MIN_ROWS = int(env.get("VECTOR_INDEX_MIN_ROWS","10000"))
+
+def auto_num_partitions(n_rows: int) -> int:
+    return max(1,int(n_rows**0.5))
+
+def auto_num_sub_vectors(dims: int) -> int:
+    # aim for 16 dims per PQ code, the sub-vector count must divide dims
+    for dims_per_code in (16,8,4,2,1):
+        if dims % dims_per_code == 0:
+            return dims//dims_per_code
+
+# Versions younger than this survive cleanup, in-flight readers may still be on them
+MAINTENANCE_RETENTION_HOURS = float(env.get("MAINTENANCE_RETENTION_HOURS","24"))
+
+# lance's metadata columns, renamed for the API
+RESULT_COLUMNS = {
+    "_distance":"distance",
+    "_score":"score",
+    RELEVANCE_SCORE:"relevance_score"
+}
+
+METADATA_TYPES = {
+    MetadataType.STRING:str,
+    MetadataType.INT:int,
+    MetadataType.FLOAT:float,
+    MetadataType.BOOL:bool,
+    MetadataType.TIMESTAMP:datetime
+}
+
+VECTOR_TYPES = {
+    VectorType.FLOAT32:pa.float32(),
+    VectorType.FLOAT16:pa.float16()
+}
+
+def table_schema(req: InitOptions):
+    metadata = {field.name:(Optional[METADATA_TYPES[field.type]],None) for field in req.metadata_fields}
+    func = embedding_function(req.dimensions)
+    if func is not text_embedding_udf or req.vector_type != VectorType.FLOAT32:
+        # the table's own embedding function (with its dimensions) is saved in the schema metadata
+        return create_model(
+            "CompactTextEmbeddingSchema",
+            __base__=LanceModel,
+            id=(str,...),
+            vector=(Vector(func.ndims(),VECTOR_TYPES[req.vector_type]),func.VectorField()),
+            text=(str,func.SourceField()),
+            **metadata
+        )
+    if len(metadata) == 0:
+        return TextEmbeddingSchema
+    return create_model(
+        "TextEmbeddingMetadataSchema",
+        __base__=TextEmbeddingSchema,
+        **metadata
+    )
+
+# schema metadata key of the VectorIndexConfig, the index may only be built once the table grows
+VECTOR_INDEX_CONFIG = b"vector_index_config"
+
+def table_arrow_schema(req: InitOptions) -> pa.Schema:
+    schema = table_schema(req).to_arrow_schema()
+    config = VectorIndexConfig(**req.model_dump(include=set(VectorIndexConfig.model_fields)))
+    return schema.with_metadata({**(schema.metadata or {}),VECTOR_INDEX_CONFIG:config.model_dump_json().encode()})
+
+def vector_index_config(table) -> VectorIndexConfig:
+    config = (table.schema.metadata or {}).get(VECTOR_INDEX_CONFIG)
+    if config is None:
+        # tables created before the config was stored: L2, no deferred index
+        return VectorIndexConfig()
+    return VectorIndexConfig.model_validate_json(config)
+
+def table_embedding_function(table) -> Any:
+    return table.embedding_functions["vector"].function
+
+def get_connection(data_loc: str) -> lancedb.DBConnection:
+    # spans only cover cache misses, a warm request has no connect/open_table timing
+    def connect() -> lancedb.DBConnection:
+        with span("connect"):
+            return lancedb.connect(
+                data_loc,
+                read_consistency_interval=timedelta(seconds=TABLE_VERSION_CHECK_INTERVAL)
+            )
+    return _CONNECTIONS.get_or_create(data_loc,connect)
+
+def get_table(data_loc: str,table_name: str) -> lancedb.table.Table:
+    def open_table() -> lancedb.table.Table:
+        db = get_connection(data_loc)
+        with span("open_table"):
+            return db.open_table(table_name)
+    return _TABLES.get_or_create((data_loc,table_name),open_table)
+
+def evict_table(data_loc: str,table_name: str) -> None:
+    _TABLES.pop((data_loc,table_name))
+
+def evict_connection(data_loc: str) -> None:
+    _CONNECTIONS.pop(data_loc)
+
+def storage_bytes(uri: str) -> int:
+    filesystem,path = pafs.FileSystem.from_uri(uri)
+    infos = filesystem.get_file_info(pafs.FileSelector(path,recursive=True))
+    return sum(info.size for info in infos if info.type == pafs.FileType.File)
+
+def storage_stats(table) -> TableStorageStats:
+    dataset = table.to_lance()
+    stats = dataset.stats.dataset_stats()
+    return TableStorageStats(
+        version=dataset.version,
+        versions=len(dataset.versions()),
+        fragments=stats["num_fragments"],
+        rows=dataset.count_rows(),
+        deleted_rows=stats["num_deleted_rows"],
+        bytes=storage_bytes(dataset.uri)
+    )
+
+def sql_in(column: str,values: List[str]) -> str:
+    quoted = ",".join("'"+value.replace("'","''")+"'" for value in values)
+    return f"{column} IN ({quoted})"
+
+# ids per lookup/delete predicate, keeps the SQL filter a reasonable size
+ID_FILTER_CHUNK = 1000
 
 class LanceDB:
-    def __init__(self,data_loc,table_name) -> None:
-        self._data_loc: str
-        self._table_name: Optional[str] = None
+    def __init__(self,data_loc: str,table_name: Optional[str] = None) -> None:
+        self._data_loc: str = data_loc
+        self._table_name: Optional[str] = table_name
+
+    def init_from_data(self,req: InitIndexFromData) -> IngestStats:
+        return self._init_table(req,req.data)
 
-    def init_from_data(self,req: InitIndexFromData) -> None:
+    def init_from_transcript(self,req: InitIndexFromTranscript) -> IngestStats:
+        return self._init_table(req,chunk_documents(req.documents,req.chunk_tokens,req.overlap_tokens))
+
+    def _init_table(self,req: InitOptions,docs: Iterable[Text]) -> IngestStats:
+        schema = table_arrow_schema(req)
         tbl = self._db.create_table(
             req.table_name,
-            schema=TextEmbeddingSchema
+            schema=schema
         )
-        tbl.add(
-            req.model_dump()['data'],
-            on_bad_vectors="fill"
+        stats = ingest(
+            unique_ids(docs),
+            table_embedding_function(tbl).embed,
+            schema,
+            lambda batch: tbl.add(batch,on_bad_vectors="fill")
+        )
+        with span("index"):
+            if req.bm25_index:
+                self._create_fts_index(tbl)
+            for field in req.metadata_fields:
+                if field.index is not None:
+                    tbl.create_scalar_index(field.name,index_type=field.index.value)
+            self._create_vector_index(tbl)
+        _TABLES.put((self._data_loc,req.table_name),tbl)
+        RESULT_CACHE.invalidate(self._data_loc,req.table_name)
+        self._table_name = req.table_name
+        return stats
+
+    @staticmethod
+    def _create_fts_index(tbl) -> None:
+        tbl.create_fts_index(
+            BM25_INDEX,
+            use_tantivy=False,
+            language="English",
+            stem=True,
+            ascii_folding=True,
+            replace=True
+        )
+
+    @staticmethod
+    def _create_vector_index(tbl) -> None:
+        config = vector_index_config(tbl)
+        if config.vector_index is None:
+            return
+        n_rows = tbl.count_rows()
+        if n_rows < VECTOR_INDEX_MIN_ROWS:
+            return
+        tbl.create_index(
+            metric=config.metric.value,
+            num_partitions=config.num_partitions or auto_num_partitions(n_rows),
+            num_sub_vectors=config.num_sub_vectors or auto_num_sub_vectors(table_embedding_function(tbl).ndims()),
+            index_type=config.vector_index.value
         )
-        if req.bm25_index:
-            tbl.create_fts_index(
-                BM25_INDEX,
-                use_tantivy=False,
-                language="English",
-                stem=True,
-                ascii_folding=True
-            )
-        self._table_name = tbl
 
     @cached_property
     def _db(self):
-        return lancedb.connect(self._data_loc)
+        return get_connection(self._data_loc)
 
     @cached_property
     def _table(self):
         try:
-            return self._db.open_table(self._table_name)
+            return get_table(self._data_loc,self._table_name)
         except FileNotFoundError:
             raise TableNotFoundException(self._table_name)
 
+    def _search_location(self) -> str:
+        # searches read a local mirror of remote tables when they fit in ephemeral storage
+        if MIRROR.enabled and is_remote(self._data_loc):
+            with span("mirror"):
+                mirrored = MIRROR.mirror(self._data_loc,self._table_name)
+            if mirrored is not None:
+                local_loc,changed = mirrored
+                if changed:
+                    evict_table(local_loc,self._table_name)
+                return local_loc
+        return self._data_loc
+
+    def _open_search_table(self,data_loc: str):
+        return self._table if data_loc == self._data_loc else get_table(data_loc,self._table_name)
+
+    def _with_search_table(self,search: Callable[[Any],Any]) -> Any:
+        """
+        Runs search on the cached table handle, and once more on a freshly opened
+        one if the handle turns out to be stale. A table dropped and recreated by
+        another instance can sit at the same version number, so the cached handle
+        never reloads and keeps reading index and data files that are gone.
+        """
+        data_loc = self._search_location()
+        table = self._open_search_table(data_loc)
+        try:
+            return search(table)
+        except (OSError,ValueError) as e:
+            # missing files surface as OSError, a missing index as invalid input (ValueError),
+            # which is otherwise a query error and not worth a retry
+            if not isinstance(e,OSError) and not self._is_stale(data_loc,table):
+                raise
+            LOGGER.warning(f"Search on cached table {self._table_name} failed, reopening it: {e}")
+            evict_table(data_loc,self._table_name)
+            evict_connection(data_loc)
+            self.__dict__.pop("_table",None)
+            self.__dict__.pop("_db",None)
+            return search(self._open_search_table(data_loc))
+
+    def _is_stale(self,data_loc: str,table) -> bool:
+        try:
+            current = lancedb.connect(data_loc).open_table(self._table_name)
+        except FileNotFoundError:
+            return True
+        return table_state(current) != table_state(table)
+
     def attach_table(self,table_name) -> None:
         self._table_name = table_name
 
-    def search(self,req: SearchIndexRequest) -> List[TextEmbeddingSchema]:
+    def search(self,req: SearchIndexRequest) -> pa.Table:
+        if self._table_name is None:
+            raise TableNotSetException
+        return self._with_search_table(lambda table: self._search_one(table,req))
+
+    def _check_search_type(self,table,req: SearchIndexRequest) -> None:
+        # lance rejects full-text queries on tables without an inverted index as invalid input
+        if req.search_type != SearchType.VECTOR and not any(index["type"] == "Inverted" for index in table.to_lance().list_indices()):
+            raise FullTextIndexMissingException(self._table_name,req.search_type.value)
+
+    def _search_one(self,table,req: SearchIndexRequest) -> pa.Table:
+        self._check_search_type(table,req)
+        key = self._result_key(table,req)
+        cached = self._cached_result(key)
+        if cached is not None:
+            return cached
+        vector = None
+        if req.search_type != SearchType.FTS:
+            # embedded up front rather than inside the query, so it gets its own span
+            with span("embed"):
+                vector = table_embedding_function(table).generate_embeddings([req.query])[0]
+        return self._cache_result(key,req,self._search(table,req,vector))
+
+    def search_batch(self,req: SearchBatchRequest) -> List[pa.Table]:
+        """
+        Embeds every query needing a vector in one call, then runs the searches
+        concurrently against one open table. Results are in request order.
+        """
         if self._table_name is None:
             raise TableNotSetException
-        return self._table.search(req.query)\
-                .limit(req.top_n)\
-                .to_pydantic(TextEmbeddingSchema)
+        return self._with_search_table(lambda table: self._search_many(table,req))
+
+    def _search_many(self,table,req: SearchBatchRequest) -> List[pa.Table]:
+        requests = req.requests()
+        for r in requests:
+            self._check_search_type(table,r)
+        keys = [self._result_key(table,r) for r in requests]
+        results: List[Optional[pa.Table]] = [self._cached_result(key) for key in keys]
+        misses = [i for i,result in enumerate(results) if result is None]
+        needs_vector = [i for i in misses if requests[i].search_type != SearchType.FTS]
+        vectors: List[Any] = [None]*len(requests)
+        if len(needs_vector) > 0:
+            func = table_embedding_function(table)
+            with span("embed"):
+                embedded = func.generate_embeddings([requests[i].query for i in needs_vector])
+            for i,vector in zip(needs_vector,embedded):
+                vectors[i] = vector
+        searched = _BATCH_POOL.map(bind(lambda i: self._search(table,requests[i],vectors[i])),misses)
+        for i,result in zip(misses,searched):
+            results[i] = self._cache_result(keys[i],requests[i],result)
+        return results
+
+    def _result_key(self,table,req: SearchIndexRequest) -> Optional[str]:
+        if not RESULT_CACHE.enabled:
+            return None
+        # lance re-reads the version at most every TABLE_VERSION_CHECK_INTERVAL, writes move it
+        return result_key(self._data_loc,self._table_name,table_state(table),req)
+
+    @staticmethod
+    def _cached_result(key: Optional[str]) -> Optional[pa.Table]:
+        if key is None:
+            return None
+        with span("result_cache"):
+            return RESULT_CACHE.get(key)
+
+    @staticmethod
+    def _cache_result(key: Optional[str],req: SearchIndexRequest,results: pa.Table) -> pa.Table:
+        # a rerank that fell back to first-stage order isn't worth repeating
+        if key is not None and (not req.rerank or RERANK_SCORE in results.column_names):
+            RESULT_CACHE.put(key,results)
+        return results
+
+    def _search(self,table,req: SearchIndexRequest,vector: Any = None) -> pa.Table:
+        columns = self._columns(table,req)
+        first_stage = req
+        if req.rerank:
+            first_stage = req.model_copy(update={"top_n":max(req.top_n,req.rerank_candidates)})
+        if req.search_type == SearchType.HYBRID:
+            results = self._hybrid_search(table,first_stage,columns,vector)
+        else:
+            results = self._execute(table,first_stage,req.search_type,columns,vector)
+        if req.rerank:
+            results = rerank(req,results)
+        return results.rename_columns([RESULT_COLUMNS.get(name,name) for name in results.column_names])
+
+    @staticmethod
+    def _columns(table,req: SearchIndexRequest) -> List[str]:
+        # vectors dominate the payload, only return them when asked
+        return [name for name in table.schema.names if name != "vector" or req.include_vector]
+
+    @staticmethod
+    def _query(table,req: SearchIndexRequest,search_type: SearchType,vector: Any = None,prefilter: bool = True):
+        # a precomputed query vector skips the table's embedding function
+        query_input = vector if vector is not None and search_type == SearchType.VECTOR else req.query
+        query = table.search(query_input,query_type=search_type.value)\
+                .limit(req.top_n if prefilter else req.top_n*FTS_POSTFILTER_OVERFETCH)
+        if req.where is not None:
+            # prefilter, so top_n hits all match instead of filtering the top_n nearest
+            query = query.where(req.where,prefilter=prefilter)
+        if search_type == SearchType.VECTOR:
+            query = query.metric((req.metric or vector_index_config(table).metric).value)
+            if req.nprobes is not None:
+                query = query.nprobes(req.nprobes)
+            if req.refine_factor is not None:
+                query = query.refine_factor(req.refine_factor)
+        return query
+
+    def _execute(
+        self,
+        table,
+        req: SearchIndexRequest,
+        search_type: SearchType,
+        columns: List[str],
+        vector: Any = None,
+        with_row_id: bool = False
+    ) -> pa.Table:
+        try:
+            with span(search_type.value):
+                return self._query(table,req,search_type,vector)\
+                        .select(columns)\
+                        .with_row_id(with_row_id)\
+                        .to_arrow()
+        except OSError:
+            if search_type != SearchType.FTS or req.where is None:
+                raise
+            # lance 0.19's BM25 search panics when a prefilter removes every posting of a query term,
+            # fall back to filtering an over-fetched result
+            LOGGER.warning("Prefiltered full-text search failed, retrying with a postfilter")
+            with span(f"{search_type.value}.postfilter"):
+                results = self._query(table,req,search_type,vector,prefilter=False)\
+                        .select(columns)\
+                        .with_row_id(with_row_id)\
+                        .to_arrow()
+            return results.slice(0,req.top_n)
+        except ValueError as e:
+            if req.where is None:
+                raise
+            error = self._filter_error(table,req.where)
+            if error is None:
+                raise
+            raise InvalidFilterException(req.where,error) from e
+
+    @staticmethod
+    def _filter_error(table,where: str) -> Optional[str]:
+        # planning a scan parses the filter and checks it against the schema without reading data,
+        # only done once a filtered query failed (~1ms)
+        try:
+            table.to_lance().scanner(filter=where,limit=0,columns=[],with_row_id=True).explain_plan()
+        except ValueError as e:
+            return LANCE_SOURCE_LOCATION.sub("",str(e))
+        return None
+
+    def _leg(self,table,req: SearchIndexRequest,search_type: SearchType,columns: List[str],vector: Any = None) -> pa.Table:
+        return self._execute(table,req,search_type,columns,vector,with_row_id=True)
+
+    def _hybrid_search(self,table,req: SearchIndexRequest,columns: List[str],vector: Any = None) -> pa.Table:
+        vector_leg = _SEARCH_POOL.submit(bind(self._leg),table,req,SearchType.VECTOR,columns,vector)
+        fts_leg = _SEARCH_POOL.submit(bind(self._leg),table,req,SearchType.FTS,columns)
+        vector_tbl,fts_tbl = vector_leg.result(),fts_leg.result()
+        with span("fusion"):
+            return self._fuse(req,columns,vector_tbl,fts_tbl)
+
+    @staticmethod
+    def _fuse(req: SearchIndexRequest,columns: List[str],vector_tbl: pa.Table,fts_tbl: pa.Table) -> pa.Table:
+        vector_rows = vector_tbl.select([ROW_ID,"_distance"]).to_pylist()
+        fts_rows = fts_tbl.select([ROW_ID,"_score"]).to_pylist()
+        if req.fusion == FusionType.WEIGHTED:
+            fused = weighted_score_fusion(vector_rows,fts_rows,req.vector_weight)
+        else:
+            fused = reciprocal_rank_fusion([vector_rows,fts_rows],req.rrf_k)
+        fused = fused[:req.top_n]
+        candidates = pa.concat_tables([
+            vector_tbl.select(columns+[ROW_ID]),
+            fts_tbl.select(columns+[ROW_ID])
+        ])
+        position: Dict[int,int] = {}
+        for i,row_id in enumerate(candidates[ROW_ID].to_pylist()):
+            position.setdefault(row_id,i)
+        return candidates\
+                .take([position[row[ROW_ID]] for row in fused])\
+                .drop_columns([ROW_ID])\
+                .append_column(RELEVANCE_SCORE,pa.array([row[RELEVANCE_SCORE] for row in fused],type=pa.float32()))
+
+    def _existing_rows(self,table,ids: List[str],columns: List[str]) -> Dict[str,Dict[str,Any]]:
+        existing: Dict[str,Dict[str,Any]] = {}
+        for i in range(0,len(ids),ID_FILTER_CHUNK):
+            chunk = ids[i:i+ID_FILTER_CHUNK]
+            rows = table.search()\
+                    .where(sql_in("id",chunk))\
+                    .select(["id"]+columns)\
+                    .limit(len(chunk))\
+                    .to_arrow()
+            existing.update((row["id"],row) for row in rows.to_pylist())
+        return existing
+
+    def upsert(self,req: UpsertRequest) -> UpsertStats:
+        """
+        Inserts new ids and replaces changed ones with merge_insert. Only new or
+        changed text is embedded, rows whose metadata alone changed are rewritten
+        with their stored vectors. The new rows are then folded into the existing
+        FTS/vector indexes (no retraining).
+        """
+        if self._table_name is None:
+            raise TableNotSetException
+        table = self._table
+        schema = table.schema
+        write = lambda batch: table.merge_insert("id")\
+                .when_matched_update_all()\
+                .when_not_matched_insert_all()\
+                .execute(batch)
+        docs = unique_ids(req.data)
+        metadata_names = [field.name for field in metadata_fields(schema)]
+        existing = self._existing_rows(table,[doc.id for doc in docs],["text"]+metadata_names)
+        changed = [doc for doc in docs if doc.id not in existing or existing[doc.id]["text"] != doc.text]
+        same_text = [doc for doc in docs if doc.id in existing and existing[doc.id]["text"] == doc.text]
+        retagged = [
+            doc for doc,metadata in zip(same_text,metadata_rows(same_text,schema))
+            if any(existing[doc.id][name] != metadata[name] for name in metadata_names)
+        ]
+        stats = ingest(changed,table_embedding_function(table).embed,schema,write)
+        for i in range(0,len(retagged),ID_FILTER_CHUNK):
+            chunk = retagged[i:i+ID_FILTER_CHUNK]
+            vectors = self._existing_rows(table,[doc.id for doc in chunk],["vector"])
+            with span("write"):
+                write(to_record_batch(chunk,[vectors[doc.id]["vector"] for doc in chunk],schema))
+        if len(changed)+len(retagged) > 0:
+            self.refresh_indices(table)
+        updated = sum(1 for doc in changed if doc.id in existing)
+        return UpsertStats(
+            inserted=len(changed)-updated,
+            updated=updated,
+            metadata_updated=len(retagged),
+            unchanged=len(same_text)-len(retagged),
+            ingest=stats
+        )
+
+    def refresh_indices(self,table) -> None:
+        """
+        Folds rows written since the indexes were built into them. The ANN index is
+        optimized in place (new rows assigned to existing partitions, no retraining),
+        or built once the table has grown past VECTOR_INDEX_MIN_ROWS.
+        lance's native inverted index can't be updated in place yet (optimizing it fails
+        and searching it after updates/deletes panics), so the FTS index is re-tokenized
+        instead, which costs no embedding calls.
+        """
+        dataset = table.to_lance()
+        indices = dataset.list_indices()
+        # ANN and scalar (BTREE/BITMAP) indexes
+        updatable = [index["name"] for index in indices if index["type"] != "Inverted"]
+        if len(updatable) > 0:
+            dataset.optimize.optimize_indices(index_names=updatable)
+        if not any(index["fields"] == ["vector"] for index in indices):
+            self._create_vector_index(table)
+        if any(index["type"] == "Inverted" for index in indices):
+            self._create_fts_index(table)
+        table.checkout_latest()
+
+    def delete(self,ids: List[str]) -> int:
+        if self._table_name is None:
+            raise TableNotSetException
+        table = self._table
+        before = table.count_rows()
+        for i in range(0,len(ids),ID_FILTER_CHUNK):
+            table.delete(sql_in("id",ids[i:i+ID_FILTER_CHUNK]))
+        deleted = before-table.count_rows()
+        if deleted > 0:
+            self.refresh_indices(table)
+        return deleted
+
+    def maintain(self,req: MaintenanceRequest) -> MaintenanceStats:
+        """
+        Compacts small fragments (materializing deletions), refreshes the indexes over
+        the rewritten data, then prunes versions older than the retention window so the
+        replaced files are actually removed.
+        """
+        if self._table_name is None:
+            raise TableNotSetException
+        table = self._table
+        start = perf_counter()
+        before = storage_stats(table)
+        compact_start = perf_counter()
+        compaction = table.to_lance().optimize.compact_files(
+            target_rows_per_fragment=req.target_rows_per_fragment
+        )
+        table.checkout_latest()
+        compacted = perf_counter()
+        if req.optimize_indices:
+            self.refresh_indices(table)
+        indexed = perf_counter()
+        retention_hours = req.retention_hours if req.retention_hours is not None else MAINTENANCE_RETENTION_HOURS
+        cleanup = table.cleanup_old_versions(timedelta(hours=retention_hours))
+        cleaned = perf_counter()
+        after = storage_stats(table)
+        return MaintenanceStats(
+            before=before,
+            after=after,
+            fragments_removed=compaction.fragments_removed,
+            fragments_added=compaction.fragments_added,
+            versions_removed=cleanup.old_versions,
+            bytes_removed=cleanup.bytes_removed,
+            compaction_seconds=compacted-compact_start,
+            index_seconds=indexed-compacted,
+            cleanup_seconds=cleaned-indexed,
+            seconds=perf_counter()-start
+        )
 
     def drop_table(self,table_name):
+        evict_table(self._data_loc,table_name)
+        RESULT_CACHE.invalidate(self._data_loc,table_name)
         try:
             self._db.drop_table(table_name)
         except FileNotFoundError:
@@ -0,0 +1,110 @@
+import hashlib
+import numpy as np
+from pathlib import Path
+from typing import List,Optional,Dict
+from .cache import LRUCache
+
+DIGEST_SIZE = 16
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+class MmapVectorStore:
+    """
+    Fixed-size, direct-mapped vector store backed by two memory-mapped files
+    (digests and float32 vectors). Colliding keys simply overwrite each other,
+    it's a cache. Files live in ephemeral storage so they outlive the in-memory
+    tier for as long as the execution environment does.
+    """
+    def __init__(self,path: Path,dims: int,slots: int) -> None:
+        path.parent.mkdir(parents=True,exist_ok=True)
+        self.dims = dims
+        self.slots = slots
+        self._keys = self._open(path.with_suffix(".keys"),np.uint8,(slots,DIGEST_SIZE))
+        self._vectors = self._open(path.with_suffix(".vecs"),np.float32,(slots,dims))
+
+    @staticmethod
+    def _open(path: Path,dtype,shape) -> np.memmap:
+        expected = int(np.prod(shape))*np.dtype(dtype).itemsize
+        mode = "r+" if path.exists() and path.stat().st_size == expected else "w+"
+        return np.memmap(path,dtype=dtype,mode=mode,shape=shape)
+
+    def _slot(self,digest: bytes) -> int:
+        return int.from_bytes(digest[:8],"little") % self.slots
+
+    def get(self,digest: bytes) -> Optional[np.ndarray]:
+        slot = self._slot(digest)
+        if self._keys[slot].tobytes() != digest:
+            return None
+        return np.array(self._vectors[slot])
+
+    def put(self,digest: bytes,vector) -> None:
+        slot = self._slot(digest)
+        self._vectors[slot] = vector
+        self._keys[slot] = np.frombuffer(digest,dtype=np.uint8)
+
+class EmbeddingCache:
+    """
+    Two tier query-embedding cache keyed by (model, dims, normalized text):
+    an in-memory LRU in front of an optional MmapVectorStore under /tmp.
+    """
+    def __init__(
+        self,
+        model: str,
+        dims: int,
+        maxsize: int,
+        cache_dir: Optional[str] = None,
+        disk_slots: int = 65536
+    ) -> None:
+        self.model = model
+        self.dims = dims
+        self._memory = LRUCache(maxsize)
+        self._disk: Optional[MmapVectorStore] = None
+        if cache_dir:
+            name = f"{model.replace('/','_')}-{dims}"
+            self._disk = MmapVectorStore(Path(cache_dir)/name,dims,disk_slots)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(self,text: str) -> bytes:
+        raw = f"{self.model}\x00{self.dims}\x00{normalize_text(text)}".encode()
+        return hashlib.blake2b(raw,digest_size=DIGEST_SIZE).digest()
+
+    def get(self,text: str) -> Optional[np.ndarray]:
+        digest = self.key(text)
+        vector = self._memory.get(digest)
+        if vector is not None:
+            self.memory_hits += 1
+            return vector
+        if self._disk is not None:
+            disk_vector = self._disk.get(digest)
+            if disk_vector is not None:
+                self.disk_hits += 1
+                self._memory.put(digest,disk_vector)
+                return disk_vector
+        self.misses += 1
+        return None
+
+    def put(self,text: str,vector: np.ndarray) -> None:
+        digest = self.key(text)
+        # copy so a cached row doesn't pin the whole response array
+        vector = np.array(vector,dtype=np.float32)
+        self._memory.put(digest,vector)
+        if self._disk is not None and len(vector) == self.dims:
+            self._disk.put(digest,vector)
+
+    def get_many(self,texts: List[str]) -> List[Optional[np.ndarray]]:
+        return [self.get(text) for text in texts]
+
+    def put_many(self,texts: List[str],vectors: np.ndarray) -> None:
+        for text,vector in zip(texts,vectors):
+            self.put(text,vector)
+
+    def stats(self) -> Dict[str,int]:
+        return {
+            "size":len(self._memory),
+            "memory_hits":self.memory_hits,
+            "disk_hits":self.disk_hits,
+            "misses":self.misses
+        }
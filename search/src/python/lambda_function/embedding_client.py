@@ -1,10 +1,14 @@
-import requests
 import json
+import base64
 import logging
+import numpy as np
 from pathlib import Path
-from functools import cached_property
+from functools import cached_property,lru_cache
 from os import environ as env
 from .utils import full_traceback_str
+from .embedding_cache import EmbeddingCache
+from .transport import AsyncHttpTransport,background_loop
+from .timing import span,record_upstream
 from .models.embedding import ( 
     Embeddings,
     OpenAIEmbeddingRequest,
@@ -23,10 +27,21 @@ LOGGER.setLevel(LOG_LEVEL)
 
 EMBEDDING_API_MODEL = env.get("EMBEDDING_API_MODEL","text-embedding-3-small")
 
-EMBEDDING_API_KEY = EMBEDDING_API_KEY = env.get("EMBEDDING_API_KEY")
-if EMBEDDING_API_KEY is None:
+# "rest": the "text-embedding" API client below, "local": encode in-process (see local_embedding.py),
+# the search image's `local` target sets it up with the onnx backend
+EMBEDDING_PROVIDER = env.get("EMBEDDING_PROVIDER","rest")
+LOCAL_MODEL_PATH = env.get("LOCAL_MODEL_PATH")
+LOCAL_MODEL_BACKEND = env.get("LOCAL_MODEL_BACKEND","torch")
+LOCAL_MODEL_QUANTIZE = env.get("LOCAL_MODEL_QUANTIZE","false").lower() == "true"
+
+EMBEDDING_API_KEY = env.get("EMBEDDING_API_KEY")
+
+def load_api_key() -> str:
+    # .env fallback is read when the first request needs it, not at import
+    if EMBEDDING_API_KEY is not None:
+        return EMBEDDING_API_KEY
     with open(Path(__file__).parent/".env") as envfile:
-        EMBEDDING_API_KEY = json.load(envfile)["openai_key"]
+        return json.load(envfile)["openai_key"]
 
 EMBEDDING_API_ENDPOINT = env.get("EMBEDDING_API_ENDPOINT","https://api.openai.com/v1/embeddings")
 
@@ -34,65 +49,184 @@ EMBEDDING_API_MODEL = env.get("EMBEDDING_API_MODEL","text-embedding-3-small")
 
 MODEL_DIM = int(env.get("MODEL_DIM","1536"))
 
+# "base64" avoids a python float per dimension, "float" for providers that don't support it
+EMBEDDING_ENCODING_FORMAT = env.get("EMBEDDING_ENCODING_FORMAT","base64")
+
+# Query embedding cache, size 0 disables it. Set a dir (e.g. /tmp/embedding_cache) to enable the mmap tier
+EMBEDDING_CACHE_SIZE = int(env.get("EMBEDDING_CACHE_SIZE","4096"))
+EMBEDDING_CACHE_DIR = env.get("EMBEDDING_CACHE_DIR")
+EMBEDDING_CACHE_DISK_SLOTS = int(env.get("EMBEDDING_CACHE_DISK_SLOTS","65536"))
+
+# HTTP transport tuning
+EMBEDDING_MAX_CONNECTIONS = int(env.get("EMBEDDING_MAX_CONNECTIONS","16"))
+EMBEDDING_TIMEOUT = float(env.get("EMBEDDING_TIMEOUT","30"))
+EMBEDDING_MAX_RETRIES = int(env.get("EMBEDDING_MAX_RETRIES","5"))
+EMBEDDING_BACKOFF_BASE = float(env.get("EMBEDDING_BACKOFF_BASE","0.5"))
+EMBEDDING_BACKOFF_CAP = float(env.get("EMBEDDING_BACKOFF_CAP","20"))
+
+def decode_embeddings(data: List[OpenAISentenceEmbedding]) -> np.ndarray:
+    """Decodes provider embeddings straight into one contiguous float32 array, in input order."""
+    if len(data) == 0:
+        return np.empty((0,0),dtype=np.float32)
+    first = data[0].embedding
+    dims = len(base64.b64decode(first))//4 if isinstance(first,str) else len(first)
+    vectors = np.empty((len(data),dims),dtype=np.float32)
+    for res in data:
+        if isinstance(res.embedding,str):
+            vectors[res.index] = np.frombuffer(base64.b64decode(res.embedding),dtype="<f4")
+        else:
+            vectors[res.index] = res.embedding
+    return vectors
+
+# Lance rebuilds a table's embedding function from its schema metadata on every open_table,
+# so the query cache and the transport (connection pool, rate limiter) are shared per model here
+
+@lru_cache(maxsize=None)
+def query_cache(model: str,dims: int) -> EmbeddingCache:
+    return EmbeddingCache(
+        model,
+        dims,
+        EMBEDDING_CACHE_SIZE,
+        cache_dir=EMBEDDING_CACHE_DIR,
+        disk_slots=EMBEDDING_CACHE_DISK_SLOTS
+    )
+
+@lru_cache(maxsize=None)
+def http_transport(api_endpoint: str,api_key: Optional[str],model: str) -> AsyncHttpTransport:
+    # provider rate limits are per key and model, whatever dimensions a table asks for
+    return AsyncHttpTransport(
+        {
+            "Authorization": f"Bearer {api_key or load_api_key()}",
+            "content-type": "application/json"
+        },
+        max_connections=EMBEDDING_MAX_CONNECTIONS,
+        timeout=EMBEDDING_TIMEOUT,
+        max_retries=EMBEDDING_MAX_RETRIES,
+        backoff_base=EMBEDDING_BACKOFF_BASE,
+        backoff_cap=EMBEDDING_BACKOFF_CAP
+    )
+
 @registry.register("text-embedding")
 class EmbeddingClient(TextEmbeddingFunction):
     api_endpoint: str
-    api_key: str
+    api_key: Optional[str] = None
     model: str
     dims: int
+    # reduced vector size of tables created with `dimensions`, None keeps the model's full dims
+    dimensions: Optional[int] = None
 
-    def encode_sentences_rest(self,texts:Union[str,List[str]]) -> (Union[Embeddings,ErrorResponse],int):
+    async def aencode_sentences_rest(self,texts:Union[str,List[str]]) -> (Union[Embeddings,ErrorResponse],int):
         model_req = OpenAIEmbeddingRequest(
             input=texts,
-            model=self.model
+            model=self.model,
+            encoding_format=EMBEDDING_ENCODING_FORMAT,
+            dimensions=self.dimensions
         )
-        model_res = None
         try:
-            model_res = self._client.post(
-                self.api_endpoint,
-                json=model_req.model_dump()
-            )
-            embedding_res: OpenAIEmbeddingResponse = OpenAIEmbeddingResponse.model_validate(model_res.json())
-        except ValidationError as ve:
-                err: str = model_res.reason
-                status_code: int = model_res.status_code
-                return ErrorResponse(error=err),status
+            with span("embed.request"):
+                model_res = await self._transport.post(
+                    self.api_endpoint,
+                    json=model_req.model_dump(exclude_none=True)
+                )
         except Exception as e:
             err: str = full_traceback_str(e)
-            return ErrorResponse(error=err),500
+            return ErrorResponse(errors=[err]),500
+        record_upstream("embed",model_res.headers)
+        if model_res.status_code >= 400:
+            return ErrorResponse(errors=[model_res.reason_phrase,model_res.text]),model_res.status_code
+        try:
+            embedding_res: OpenAIEmbeddingResponse = OpenAIEmbeddingResponse.model_validate_json(model_res.content)
+        except ValidationError as ve:
+            return ErrorResponse(errors=[f"Invalid embedding response: {ve}"]),502
         if type(texts) == str:
             texts = [texts]
-        vectors = [res.embedding for res in embedding_res.data]
+        vectors = decode_embeddings(embedding_res.data)
+        # the provider reduces to `dimensions` itself (OpenAI, the embedding model's server), vectors aren't re-truncated here
+        if len(vectors) > 0 and vectors.shape[1] != self.ndims():
+            return ErrorResponse(errors=[f"Embedding provider returned {vectors.shape[1]} dims, expected {self.ndims()}"]),502
         return Embeddings(vectors=vectors,texts=texts),200
 
-    def generate_embeddings(self,texts:Union[str,List[str]]):
-        result,status_code = self.encode_sentences_rest(texts)
+    def encode_sentences_rest(self,texts:Union[str,List[str]]) -> (Union[Embeddings,ErrorResponse],int):
+        return background_loop().run(self.aencode_sentences_rest(texts))
+
+    async def aembed(self,texts:Union[str,List[str]]) -> np.ndarray:
+        result,status_code = await self.aencode_sentences_rest(texts)
         if status_code >= 400:
             raise Exception(result.errors)
         return result.vectors
+
+    def embed(self,texts:Union[str,List[str]]) -> np.ndarray:
+        return background_loop().run(self.aembed(texts))
+
+    def generate_embeddings(self,texts:Union[str,List[str]]) -> List[np.ndarray]:
+        if EMBEDDING_CACHE_SIZE <= 0:
+            return list(self.embed(texts))
+        texts = self.sanitize_input(texts)
+        vectors = self._cache.get_many(texts)
+        missing = [i for i,vector in enumerate(vectors) if vector is None]
+        if len(missing) > 0:
+            missing_texts = [texts[i] for i in missing]
+            new_vectors = self.embed(missing_texts)
+            self._cache.put_many(missing_texts,new_vectors)
+            for i,vector in zip(missing,new_vectors):
+                vectors[i] = vector
+        LOGGER.debug(f"Embedding cache: {self._cache.stats()}")
+        return vectors
+
+    def compute_query_embeddings(self,query: str,*args,**kwargs):
+        return self.generate_embeddings([query])
+
+    # Corpus text rarely repeats, so ingestion bypasses the query cache
+    def compute_source_embeddings(self,texts,*args,**kwargs):
+        return list(self.embed(self.sanitize_input(texts)))
+
+    @property
+    def _cache(self) -> EmbeddingCache:
+        return query_cache(self.model,self.ndims())
+
     # Doesn't really matter in lambda but could matter elsewhere
     @cached_property
     def _ndims(self):
-        return self.dims
+        return self.dimensions or self.dims
 
     def ndims(self):
         return self._ndims
 
-    @cached_property
-    def _client(self):
-        client = requests.Session()
-        client.headers.update(
-            {
-                "Authorization": f"Bearer {self.api_key}",
-                "content-type": "application/json"
-            }
-        )
-        return client    
+    @property
+    def _transport(self) -> AsyncHttpTransport:
+        return http_transport(self.api_endpoint,self.api_key,self.model)
 
 model_registry = EmbeddingFunctionRegistry.get_instance()
-text_embedding_udf = model_registry.get("text-embedding").create(
-    api_endpoint=EMBEDDING_API_ENDPOINT,
-    api_key=EMBEDDING_API_KEY,
-    model=EMBEDDING_API_MODEL,
-    dims=MODEL_DIM
-)
\ No newline at end of file
+
+def create_embedding_function(dimensions: Optional[int] = None) -> TextEmbeddingFunction:
+    if EMBEDDING_PROVIDER == "local":
+        # registers "local-embedding", only imported when selected since it pulls in the model runtime
+        from . import local_embedding
+        local_embedding.check_local_provider(LOCAL_MODEL_PATH,LOCAL_MODEL_BACKEND)
+        return model_registry.get("local-embedding").create(
+            model_path=LOCAL_MODEL_PATH,
+            dims=MODEL_DIM,
+            dimensions=dimensions,
+            backend=LOCAL_MODEL_BACKEND,
+            quantize=LOCAL_MODEL_QUANTIZE
+        )
+    return model_registry.get("text-embedding").create(
+        api_endpoint=EMBEDDING_API_ENDPOINT,
+        api_key=EMBEDDING_API_KEY,
+        model=EMBEDDING_API_MODEL,
+        dims=MODEL_DIM,
+        dimensions=dimensions,
+        # retries happen in the transport, where rate-limit headers are visible
+        max_retries=0
+    )
+
+text_embedding_udf = create_embedding_function()
+
+@lru_cache(maxsize=None)
+def embedding_function(dimensions: Optional[int] = None) -> TextEmbeddingFunction:
+    """The embedding function of a new table, tables opened later rebuild theirs from the schema metadata."""
+    if dimensions is None or dimensions == MODEL_DIM:
+        return text_embedding_udf
+    if dimensions > MODEL_DIM:
+        raise ValueError(f"dimensions={dimensions} is larger than the model's {MODEL_DIM}")
+    return create_embedding_function(dimensions)
\ No newline at end of file
@@ -0,0 +1,46 @@
+from typing import Dict,List,Any
+
+ROW_ID = "_rowid"
+RELEVANCE_SCORE = "_relevance_score"
+
+Row = Dict[str,Any]
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Row]],k: int = 60) -> List[Row]:
+    scores: Dict[int,float] = {}
+    rows: Dict[int,Row] = {}
+    for ranked in ranked_lists:
+        for rank,row in enumerate(ranked):
+            row_id = row[ROW_ID]
+            scores[row_id] = scores.get(row_id,0.0)+1.0/(k+rank+1)
+            rows.setdefault(row_id,row)
+    return _ordered(rows,scores)
+
+def _min_max(values: List[float]) -> List[float]:
+    lo,hi = min(values),max(values)
+    if hi == lo:
+        return [1.0]*len(values)
+    return [(v-lo)/(hi-lo) for v in values]
+
+def weighted_score_fusion(vector_rows: List[Row],fts_rows: List[Row],vector_weight: float = 0.5) -> List[Row]:
+    scores: Dict[int,float] = {}
+    rows: Dict[int,Row] = {}
+    if len(vector_rows) > 0:
+        # distances: smaller is better, so normalize their negation (ties and a single hit get 1.0)
+        similarities = _min_max([-row["_distance"] for row in vector_rows])
+        for row,sim in zip(vector_rows,similarities):
+            scores[row[ROW_ID]] = vector_weight*sim
+            rows[row[ROW_ID]] = row
+    if len(fts_rows) > 0:
+        for row,score in zip(fts_rows,_min_max([row["_score"] for row in fts_rows])):
+            row_id = row[ROW_ID]
+            scores[row_id] = scores.get(row_id,0.0)+(1.0-vector_weight)*score
+            rows.setdefault(row_id,row)
+    return _ordered(rows,scores)
+
+def _ordered(rows: Dict[int,Row],scores: Dict[int,float]) -> List[Row]:
+    fused = []
+    for row_id in sorted(scores,key=scores.get,reverse=True):
+        row = dict(rows[row_id])
+        row[RELEVANCE_SCORE] = scores[row_id]
+        fused.append(row)
+    return fused
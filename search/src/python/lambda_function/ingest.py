@@ -0,0 +1,130 @@
+import hashlib
+import logging
+import numpy as np
+import pyarrow as pa
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from os import environ as env
+from time import perf_counter
+from typing import Any,Callable,Deque,Dict,Iterable,Iterator,List,Tuple,TypeVar
+from .models.db import IngestStats,Text
+from .timing import span,bind
+
+LOGGER = logging.getLogger("rag-search.service")
+
+# Embedding request sizing, token counts are estimated (~4 chars/token) to avoid a tokenizer dependency
+INGEST_BATCH_TOKENS = int(env.get("INGEST_BATCH_TOKENS","100000"))
+INGEST_BATCH_SIZE = int(env.get("INGEST_BATCH_SIZE","1024"))
+INGEST_CONCURRENCY = int(env.get("INGEST_CONCURRENCY","4"))
+
+Embedder = Callable[[List[str]],np.ndarray]
+Writer = Callable[[pa.RecordBatch],None]
+T = TypeVar("T")
+
+def estimate_tokens(text: str) -> int:
+    return len(text)//4+1
+
+def document_id(text: str) -> str:
+    # content hash, so re-sending the same text without an id is a no-op upsert
+    return hashlib.blake2b(text.encode(),digest_size=16).hexdigest()
+
+def with_ids(docs: Iterable[Text]) -> Iterator[Text]:
+    for doc in docs:
+        yield doc if doc.id is not None else doc.model_copy(update={"id":document_id(doc.text)})
+
+def unique_ids(docs: Iterable[Text]) -> List[Text]:
+    # last write wins for repeated ids (and repeated texts without one), ids stay unique in the table
+    return list({doc.id:doc for doc in with_ids(docs)}.values())
+
+def token_batches(
+    items: Iterable[T],
+    max_tokens: int = INGEST_BATCH_TOKENS,
+    max_items: int = INGEST_BATCH_SIZE,
+    text: Callable[[T],str] = lambda item: item
+) -> Iterator[List[T]]:
+    batch: List[T] = []
+    batch_tokens = 0
+    for item in items:
+        tokens = estimate_tokens(text(item))
+        if len(batch) > 0 and (batch_tokens+tokens > max_tokens or len(batch) >= max_items):
+            yield batch
+            batch,batch_tokens = [],0
+        batch.append(item)
+        batch_tokens += tokens
+    if len(batch) > 0:
+        yield batch
+
+def embed_batches(
+    batches: Iterable[List[str]],
+    embed: Embedder,
+    concurrency: int = INGEST_CONCURRENCY
+) -> Iterator[Tuple[List[str],np.ndarray]]:
+    """
+    Embeds up to `concurrency` batches at a time and yields them in input order.
+    Batches are pulled lazily so at most `concurrency` batches are held in memory.
+    """
+    embed = bind(embed)
+    with ThreadPoolExecutor(max_workers=concurrency,thread_name_prefix="ingest") as pool:
+        in_flight: Deque = deque()
+        for batch in batches:
+            in_flight.append((batch,pool.submit(embed,batch)))
+            if len(in_flight) >= concurrency:
+                texts,future = in_flight.popleft()
+                yield texts,future.result()
+        while len(in_flight) > 0:
+            texts,future = in_flight.popleft()
+            yield texts,future.result()
+
+def metadata_column(values: List,field: pa.Field) -> pa.Array:
+    if pa.types.is_timestamp(field.type) and any(isinstance(value,str) for value in values):
+        return pa.array(values,type=pa.string()).cast(field.type)
+    return pa.array(values,type=field.type)
+
+def metadata_fields(schema: pa.Schema) -> List[pa.Field]:
+    return [field for field in schema if field.name not in ("id","vector","text")]
+
+def metadata_rows(docs: List[Text],schema: pa.Schema) -> List[Dict[str,Any]]:
+    """Docs' metadata as the table stores it, comparable with rows read back from it."""
+    fields = metadata_fields(schema)
+    if len(fields) == 0:
+        return [{} for _ in docs]
+    return pa.table({
+        field.name:metadata_column([doc.metadata.get(field.name) for doc in docs],field) for field in fields
+    }).to_pylist()
+
+def to_record_batch(docs: List[Text],vectors: np.ndarray,schema: pa.Schema) -> pa.RecordBatch:
+    vector_type = schema.field("vector").type
+    # embeddings are float32, cast to the column's storage type (float16 tables)
+    flat = np.asarray(vectors,dtype=vector_type.value_type.to_pandas_dtype()).reshape(-1)
+    columns = {
+        "id":pa.array([doc.id for doc in docs],type=pa.string()),
+        "vector":pa.FixedSizeListArray.from_arrays(pa.array(flat),vector_type.list_size),
+        "text":pa.array([doc.text for doc in docs],type=pa.string())
+    }
+    for field in metadata_fields(schema):
+        columns[field.name] = metadata_column([doc.metadata.get(field.name) for doc in docs],field)
+    return pa.RecordBatch.from_arrays(
+        [columns[field.name] for field in schema],
+        schema=pa.schema([schema.field(name) for name in schema.names])
+    )
+
+def ingest(docs: Iterable[Text],embed: Embedder,schema: pa.Schema,write: Writer) -> IngestStats:
+    """Embeds docs (which must have ids) in token-bounded batches and hands each record batch to `write`."""
+    start = perf_counter()
+    rows = 0
+    batches = 0
+    batches_in = token_batches(docs,text=lambda doc: doc.text)
+    for batch_docs,vectors in embed_batches(batches_in,lambda batch: embed([doc.text for doc in batch])):
+        with span("write"):
+            write(to_record_batch(batch_docs,vectors,schema))
+        rows += len(batch_docs)
+        batches += 1
+        elapsed = perf_counter()-start
+        LOGGER.info(f"Ingested batch {batches}: {rows} rows in {elapsed:.1f}s ({rows/elapsed:.1f} rows/s)")
+    seconds = perf_counter()-start
+    return IngestStats(
+        rows=rows,
+        batches=batches,
+        seconds=seconds,
+        rows_per_second=rows/seconds if seconds > 0 else 0.0
+    )
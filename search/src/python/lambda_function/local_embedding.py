@@ -0,0 +1,87 @@
+import sys
+import importlib
+import importlib.util
+import numpy as np
+from pathlib import Path
+from functools import cached_property,lru_cache
+from os import environ as env
+from typing import List,Optional,Union
+from lancedb.embeddings import registry,TextEmbeddingFunction
+
+# The embedding model Lambda's service.py, shared so both encode/rerank the same way. The search
+# image's `local` target installs it (with onnx_backend.py) as the encoder_service module, a
+# checkout imports it from ENCODER_SRC_DIR
+ENCODER_MODULE = "encoder_service"
+ENCODER_SRC_DIR = env.get(
+    "ENCODER_SRC_DIR",
+    str(Path(__file__).parents[4]/"models"/"embedding"/"src"/"lambda")
+)
+
+# runtime each EncoderService backend imports
+BACKEND_PACKAGES = {
+    "torch":["torch","sentence_transformers"],
+    "onnx":["onnxruntime","transformers"]
+}
+
+def encoder_installed() -> bool:
+    return importlib.util.find_spec(ENCODER_MODULE) is not None
+
+def check_local_provider(model_path: Optional[str],backend: str) -> None:
+    """
+    Fails at startup with what is missing instead of on the first request. The search
+    image's `local` target ships the onnx backend, the torch one only runs from a checkout.
+    """
+    if model_path is None:
+        raise ValueError("EMBEDDING_PROVIDER=local needs LOCAL_MODEL_PATH (a sentence-transformers model directory)")
+    if not encoder_installed() and not (Path(ENCODER_SRC_DIR)/"service.py").is_file():
+        raise ValueError(f"EMBEDDING_PROVIDER=local needs the {ENCODER_MODULE} module or the embedding model source in ENCODER_SRC_DIR={ENCODER_SRC_DIR}")
+    missing = [package for package in BACKEND_PACKAGES.get(backend,[]) if importlib.util.find_spec(package) is None]
+    if len(missing) > 0:
+        raise ValueError(f"EMBEDDING_PROVIDER=local with the {backend} backend needs {', '.join(missing)} installed")
+
+@lru_cache(maxsize=None)
+def load_model_service():
+    if encoder_installed():
+        return importlib.import_module(ENCODER_MODULE)
+    # imported by path (once, so its singletons are shared), the search service has its own `service` module
+    if ENCODER_SRC_DIR not in sys.path:
+        sys.path.append(ENCODER_SRC_DIR)
+    spec = importlib.util.spec_from_file_location(ENCODER_MODULE,Path(ENCODER_SRC_DIR)/"service.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def load_encoder_service():
+    return load_model_service().EncoderService
+
+def load_reranker_service():
+    return load_model_service().RerankerService
+
+@registry.register("local-embedding")
+class LocalEmbedding(TextEmbeddingFunction):
+    """Encodes in-process with the embedding Lambda's EncoderService, no network hop."""
+    model_path: str
+    dims: int
+    # Matryoshka truncation, done by the encoder module's truncate_embeddings
+    dimensions: Optional[int] = None
+    backend: str = "torch"
+    quantize: bool = False
+
+    @cached_property
+    def _service(self):
+        # EncoderService is a singleton, tables reopened from metadata share the loaded model
+        return load_encoder_service()(
+            self.model_path,
+            backend=self.backend,
+            quantize=self.quantize
+        )
+
+    def embed(self,texts:Union[str,List[str]]) -> np.ndarray:
+        vecs,_,_,_ = self._service.encode(self.sanitize_input(texts))
+        return load_model_service().truncate_embeddings(vecs,self.dimensions)
+
+    def generate_embeddings(self,texts:Union[str,List[str]]) -> List[np.ndarray]:
+        return list(self.embed(texts))
+
+    def ndims(self):
+        return self.dimensions or self.dims
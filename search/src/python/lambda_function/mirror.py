@@ -0,0 +1,188 @@
+import hashlib
+import logging
+import shutil
+import pyarrow.fs as pafs
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass,field
+from os import environ as env
+from pathlib import Path
+from threading import Lock
+from time import monotonic,perf_counter
+from typing import Dict,Optional,Tuple
+
+LOGGER = logging.getLogger("rag-search.service")
+
+# Read-through mirror of remote (S3) tables in ephemeral storage, 0 bytes disables it
+TABLE_MIRROR_DIR = env.get("TABLE_MIRROR_DIR","/tmp/lance-mirror")
+TABLE_MIRROR_MAX_BYTES = int(env.get("TABLE_MIRROR_MAX_BYTES",str(400*1024**2)))
+TABLE_MIRROR_THREADS = int(env.get("TABLE_MIRROR_THREADS","16"))
+TABLE_MIRROR_CHECK_INTERVAL = float(env.get("TABLE_MIRROR_CHECK_INTERVAL",env.get("TABLE_VERSION_CHECK_INTERVAL","5")))
+
+VERSIONS_DIR = "_versions"
+# commit logs, never read by queries
+SKIP_DIRS = ("_transactions",)
+
+def is_remote(data_loc: str) -> bool:
+    return "://" in data_loc and not data_loc.startswith("file://")
+
+def latest_manifest(names) -> Optional[str]:
+    # V1 manifests are named {version}.manifest, V2 ones {u64::MAX-version:020}.manifest
+    manifests = [name for name in names if name.endswith(".manifest") and name[:-len(".manifest")].isdigit()]
+    if len(manifests) == 0:
+        return None
+    v2 = [name for name in manifests if len(name) == len("00000000000000000000.manifest")]
+    if len(v2) > 0:
+        return min(v2)
+    return max(manifests,key=lambda name: int(name[:-len(".manifest")]))
+
+@dataclass
+class MirroredTable:
+    local_loc: str
+    # the manifest mirrored locally, None while the table is served remotely
+    manifest: Optional[str] = None
+    remote_manifest: Optional[str] = None
+    bytes: int = 0
+    checked_at: float = float("-inf")
+    lock: Lock = field(default_factory=Lock)
+
+class TableMirror:
+    """
+    Mirrors the latest version of remote Lance tables under `root`. Lance files are
+    immutable, so a sync lists the table once, downloads the files not present
+    locally in parallel and drops the ones the remote no longer has. The remote is
+    only listed when its latest manifest changed (checked at most every
+    `check_interval` seconds). Tables are evicted least recently used first to stay
+    under `max_bytes`, a table bigger than that isn't mirrored at all.
+    """
+    def __init__(
+        self,
+        root: str = TABLE_MIRROR_DIR,
+        max_bytes: int = TABLE_MIRROR_MAX_BYTES,
+        threads: int = TABLE_MIRROR_THREADS,
+        check_interval: float = TABLE_MIRROR_CHECK_INTERVAL
+    ) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.threads = threads
+        self.check_interval = check_interval
+        # insertion order is recency order, oldest first
+        self._tables: Dict[Tuple[str,str],MirroredTable] = {}
+        self._lock = Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def local_loc(self,data_loc: str) -> str:
+        return str(self.root/hashlib.blake2b(data_loc.encode(),digest_size=8).hexdigest())
+
+    def _touch(self,key: Tuple[str,str]) -> MirroredTable:
+        with self._lock:
+            mirrored = self._tables.pop(key,None) or MirroredTable(self.local_loc(key[0]))
+            self._tables[key] = mirrored
+            return mirrored
+
+    def mirror(self,data_loc: str,table_name: str) -> Optional[Tuple[str,bool]]:
+        """
+        Syncs the table if its version changed. Returns (local data_loc, changed), or
+        None when the table can't be served locally (too big, sync failed).
+        """
+        key = (data_loc,table_name)
+        mirrored = self._touch(key)
+        with mirrored.lock:
+            if monotonic()-mirrored.checked_at < self.check_interval:
+                return (mirrored.local_loc,False) if mirrored.manifest is not None else None
+            try:
+                changed = self._sync(key,mirrored)
+            except Exception as e:
+                LOGGER.warning(f"Mirroring {table_name} failed, reading from {data_loc}: {e}")
+                self._drop(key)
+                return None
+            mirrored.checked_at = monotonic()
+            if mirrored.manifest is None:
+                return None
+            return mirrored.local_loc,changed
+
+    def _sync(self,key: Tuple[str,str],mirrored: MirroredTable) -> bool:
+        data_loc,table_name = key
+        filesystem,remote_root = pafs.FileSystem.from_uri(f"{data_loc.rstrip('/')}/{table_name}.lance")
+        versions = filesystem.get_file_info(pafs.FileSelector(f"{remote_root}/{VERSIONS_DIR}"))
+        manifest = latest_manifest(Path(info.path).name for info in versions)
+        if manifest is None:
+            raise FileNotFoundError(f"{data_loc}/{table_name}.lance")
+        if manifest == mirrored.remote_manifest:
+            return False
+        mirrored.remote_manifest = manifest
+
+        start = perf_counter()
+        remote = {}
+        for info in filesystem.get_file_info(pafs.FileSelector(remote_root,recursive=True)):
+            relative = info.path[len(remote_root)+1:]
+            if info.type != pafs.FileType.File or relative.startswith(SKIP_DIRS):
+                continue
+            # queries only need the latest manifest
+            if relative.startswith(VERSIONS_DIR) and Path(relative).name != manifest:
+                continue
+            remote[relative] = info.size
+        total = sum(remote.values())
+        if total > self.max_bytes:
+            LOGGER.info(f"Not mirroring {table_name}: {total} bytes > TABLE_MIRROR_MAX_BYTES")
+            self._remove_files(key,mirrored)
+            return False
+        self._evict(key,total)
+
+        local_root = Path(mirrored.local_loc)/f"{table_name}.lance"
+        missing = [
+            relative for relative,size in remote.items()
+            if not (local_root/relative).exists() or (local_root/relative).stat().st_size != size
+        ]
+        # the manifest goes last, so the local copy never points at files it doesn't have yet
+        files = [relative for relative in missing if not relative.startswith(VERSIONS_DIR)]
+        with ThreadPoolExecutor(max_workers=self.threads,thread_name_prefix="mirror") as pool:
+            list(pool.map(lambda relative: self._download(filesystem,f"{remote_root}/{relative}",local_root/relative),files))
+        for relative in missing:
+            if relative.startswith(VERSIONS_DIR):
+                self._download(filesystem,f"{remote_root}/{relative}",local_root/relative)
+        for path in local_root.rglob("*"):
+            if path.is_file() and str(path.relative_to(local_root)) not in remote:
+                path.unlink()
+        mirrored.manifest = manifest
+        mirrored.bytes = total
+        LOGGER.info(f"Mirrored {table_name} {manifest}: {len(missing)} files fetched, {total} bytes in {perf_counter()-start:.2f}s")
+        return True
+
+    @staticmethod
+    def _download(filesystem: pafs.FileSystem,remote_path: str,local_path: Path) -> None:
+        local_path.parent.mkdir(parents=True,exist_ok=True)
+        partial = local_path.with_name(local_path.name+".partial")
+        with filesystem.open_input_stream(remote_path) as source,open(partial,"wb") as target:
+            shutil.copyfileobj(source,target,length=1024*1024)
+        partial.replace(local_path)
+
+    def _evict(self,key: Tuple[str,str],needed: int) -> None:
+        victims = []
+        with self._lock:
+            used = sum(mirrored.bytes for other,mirrored in self._tables.items() if other != key)
+            for other,mirrored in self._tables.items():
+                if used+needed <= self.max_bytes:
+                    break
+                if other != key and mirrored.bytes > 0:
+                    used -= mirrored.bytes
+                    victims.append(other)
+        for other in victims:
+            LOGGER.info(f"Evicting mirrored table {other[1]} from {other[0]}")
+            self._drop(other)
+
+    def _drop(self,key: Tuple[str,str]) -> None:
+        with self._lock:
+            mirrored = self._tables.pop(key,None)
+        if mirrored is not None:
+            self._remove_files(key,mirrored)
+
+    @staticmethod
+    def _remove_files(key: Tuple[str,str],mirrored: MirroredTable) -> None:
+        mirrored.manifest = None
+        mirrored.bytes = 0
+        shutil.rmtree(Path(mirrored.local_loc)/f"{key[1]}.lance",ignore_errors=True)
+
+MIRROR = TableMirror()
@@ -1,13 +1,24 @@
-from pydantic import BaseModel,Field
-from lancedb.pydantic import LanceModel,Vector
-from lancedb.embeddings import get_registry
-from typing import List,Optional,Union,Any
+from pydantic import BaseModel,ConfigDict,Field,model_validator
+from typing import Dict,List,Optional,Union,Any
+from datetime import datetime
 from enum import Enum
 
-from ..embedding_client import text_embedding_udf as func
-class TextEmbeddingSchema(LanceModel):
-    vector: Vector(func.ndims()) = func.VectorField()
-    text: str = func.SourceField()
+# TextEmbeddingSchema needs lancedb and the embedding function, so it's only built
+# on first access. Importing the request models here stays cheap at cold start.
+def _text_embedding_schema():
+    from lancedb.pydantic import LanceModel,Vector
+    from ..embedding_client import text_embedding_udf as func
+    class TextEmbeddingSchema(LanceModel):
+        id: str
+        vector: Vector(func.ndims()) = func.VectorField()
+        text: str = func.SourceField()
+    return TextEmbeddingSchema
+
+def __getattr__(name: str) -> Any:
+    if name == "TextEmbeddingSchema":
+        schema = globals()["TextEmbeddingSchema"] = _text_embedding_schema()
+        return schema
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 BM25_INDEX = "text"
 
@@ -15,30 +26,217 @@ class TableInitStatus(str,Enum):
     SUCCESS="SUCCESS"
     FAIL="FAIL"
 
+class IngestStats(BaseModel):
+    rows: int = Field(...,description="Rows embedded and written")
+    batches: int = Field(...,description="Embedding batches (and table appends)")
+    seconds: float = Field(...,description="Wall time of the ingestion pipeline")
+    rows_per_second: float = Field(...,description="Ingestion throughput")
+
 class InitResponse(BaseModel):
     status: TableInitStatus
+    stats: Optional[IngestStats] = None
+
+class VectorIndexType(str,Enum):
+    IVF_PQ="IVF_PQ"
+    IVF_HNSW_PQ="IVF_HNSW_PQ"
+    IVF_HNSW_SQ="IVF_HNSW_SQ"
+
+class VectorType(str,Enum):
+    FLOAT32="float32"
+    FLOAT16="float16"
+
+class Metric(str,Enum):
+    L2="L2"
+    COSINE="cosine"
+    DOT="dot"
+
+class MetadataType(str,Enum):
+    STRING="string"
+    INT="int"
+    FLOAT="float"
+    BOOL="bool"
+    TIMESTAMP="timestamp"
+
+class ScalarIndexType(str,Enum):
+    BTREE="BTREE"
+    BITMAP="BITMAP"
+
+class MetadataField(BaseModel):
+    name: str = Field(...,pattern=r"^[A-Za-z_][A-Za-z0-9_]*$",description="Column name, usable in `where` filters")
+    type: MetadataType = MetadataType.STRING
+    index: Optional[ScalarIndexType] = Field(None,description="Scalar index for filtering: BTREE for high cardinality/ranges, BITMAP for few distinct values")
+
+MetadataValue = Union[bool,int,float,datetime,str,None]
 
 class Text(BaseModel):
     text: str = Field(...,description="The text data to be added to the index")
+    id: Optional[str] = Field(None,description="Stable document id for upserts/deletes, defaults to a hash of the text")
+    metadata: Dict[str,MetadataValue] = Field({},description="Values for the table's metadata fields, missing ones are null")
 
-class InitIndexFromData(BaseModel):
-    data: List[Text] = Field(...,description="The data as a list of Test object")
+class InitOptions(BaseModel):
     data_loc: str = Field(...,description="The data location to cconnect to")
     table_name: str = Field(...,description="The table containing the search indexes")
     bm25_index: Optional[bool] = Field(...,description="Whether or not to do a full-text-search (BM25) index")
+    vector_index: Optional[VectorIndexType] = Field(VectorIndexType.IVF_PQ,description="ANN index to build, null to always use flat search. Skipped below VECTOR_INDEX_MIN_ROWS rows")
+    metric: Metric = Field(Metric.L2,description="Distance metric of the vector index, also the default metric of searches")
+    num_partitions: Optional[int] = Field(None,description="IVF partitions, auto-sized from row count when omitted")
+    num_sub_vectors: Optional[int] = Field(None,description="PQ sub-vectors, auto-sized from vector dims when omitted")
+    dimensions: Optional[int] = Field(None,gt=0,description="Store (and query with) only the leading dims of each embedding, for Matryoshka models like text-embedding-3-*")
+    vector_type: VectorType = Field(VectorType.FLOAT32,description="Storage type of the vector column. For int8 scalar quantization use the IVF_HNSW_SQ index, lance can't search integer vector columns")
+    metadata_fields: List[MetadataField] = Field([],description="Metadata columns stored next to the text, filterable with `where`")
+
+    @model_validator(mode="after")
+    def check_vector_index(self):
+        # lance 0.19's HNSW indexes panic on float16 vectors
+        if self.vector_type == VectorType.FLOAT16 and self.vector_index not in (None,VectorIndexType.IVF_PQ):
+            raise ValueError(f"vector_type float16 only supports the IVF_PQ index, not {self.vector_index.value}")
+        return self
 
-class InitIndexFromTranscript(BaseModel):
-    bm25: bool = True
+class VectorIndexConfig(BaseModel):
+    """The table's vector index settings, kept in its schema metadata by init."""
+    vector_index: Optional[VectorIndexType] = None
+    metric: Metric = Metric.L2
+    num_partitions: Optional[int] = None
+    num_sub_vectors: Optional[int] = None
 
-class SearchIndexRequest(BaseModel):
+class InitIndexFromData(InitOptions):
+    data: List[Text] = Field(...,description="The data as a list of Test object")
+
+class UpsertRequest(BaseModel):
+    data: List[Text] = Field(...,description="Documents to insert or update, matched on id")
     data_loc: str = Field(...,description="The data location to cconnect to")
     table_name: str = Field(...,description="The table containing the search indexes")
+
+class UpsertStats(BaseModel):
+    inserted: int = Field(...,description="New ids")
+    updated: int = Field(...,description="Existing ids whose text changed (re-embedded)")
+    metadata_updated: int = Field(0,description="Existing ids with identical text but changed metadata (rewritten, not embedded)")
+    unchanged: int = Field(...,description="Existing ids with identical text and metadata (skipped, not embedded)")
+    ingest: IngestStats
+
+class UpsertResponse(BaseModel):
+    status: TableInitStatus
+    stats: Optional[UpsertStats] = None
+
+class DeleteRequest(BaseModel):
+    ids: List[str] = Field(...,description="Ids of the documents to delete")
+    data_loc: str = Field(...,description="The data location to cconnect to")
+    table_name: str = Field(...,description="The table containing the search indexes")
+
+class DeleteResponse(BaseModel):
+    status: TableInitStatus
+    deleted: int = 0
+
+class MaintenanceRequest(BaseModel):
+    data_loc: str = Field(...,description="The data location to cconnect to")
+    table_name: str = Field(...,description="The table to maintain")
+    retention_hours: Optional[float] = Field(None,description="Keep versions newer than this, defaults to MAINTENANCE_RETENTION_HOURS")
+    target_rows_per_fragment: int = Field(1024*1024,description="Compaction merges small fragments up to this many rows")
+    optimize_indices: bool = Field(True,description="Fold unindexed rows into the ANN/FTS indexes")
+
+class TableStorageStats(BaseModel):
+    version: int
+    versions: int = Field(...,description="Manifests (versions) still on storage")
+    fragments: int
+    rows: int
+    deleted_rows: int = Field(...,description="Soft-deleted rows still stored in fragments")
+    bytes: int = Field(...,description="Bytes under the table's location (data, indexes, manifests)")
+
+class MaintenanceStats(BaseModel):
+    before: TableStorageStats
+    after: TableStorageStats
+    fragments_removed: int
+    fragments_added: int
+    versions_removed: int
+    bytes_removed: int
+    compaction_seconds: float
+    index_seconds: float
+    cleanup_seconds: float
+    seconds: float
+
+class MaintenanceResponse(BaseModel):
+    status: TableInitStatus
+    stats: Optional[MaintenanceStats] = None
+
+class DocumentFormat(str,Enum):
+    TEXT="text"
+    TRANSCRIPT="transcript"
+
+class Document(BaseModel):
+    text: str = Field(...,description="The full document, chunked server side")
+    id: Optional[str] = Field(None,description="Chunk ids are {id}:{n}, defaults to a hash of the text")
+    format: DocumentFormat = Field(DocumentFormat.TEXT,description="text: sentence boundaries, transcript: \"Speaker: ...\" turns (optionally [hh:mm:ss] stamped)")
+    metadata: Dict[str,MetadataValue] = Field({},description="Copied onto every chunk")
+
+class InitIndexFromTranscript(InitOptions):
+    documents: List[Document] = Field(...,description="Documents/transcripts to chunk, embed and index")
+    bm25_index: Optional[bool] = Field(True,description="Whether or not to do a full-text-search (BM25) index")
+    chunk_tokens: int = Field(256,gt=0,description="Max (estimated) tokens per chunk")
+    overlap_tokens: int = Field(32,ge=0,description="Tokens of trailing sentences/turns repeated at the start of the next chunk")
+
+class SearchType(str,Enum):
+    VECTOR="vector"
+    FTS="fts"
+    HYBRID="hybrid"
+
+class FusionType(str,Enum):
+    RRF="rrf"
+    WEIGHTED="weighted"
+
+class SearchOptions(BaseModel):
+    data_loc: str = Field(...,description="The data location to cconnect to")
+    table_name: str = Field(...,description="The table containing the search indexes")
+    top_n: int = Field(10,gt=0,description="Hits to return")
+    search_type: SearchType = Field(SearchType.VECTOR,description="ANN vector search, BM25 full-text search (needs bm25_index) or both fused")
+    fusion: FusionType = Field(FusionType.RRF,description="How hybrid results are merged: reciprocal-rank or weighted normalized scores")
+    rrf_k: int = Field(60,description="RRF rank constant, larger values flatten the contribution of top ranks")
+    vector_weight: float = Field(0.5,ge=0,le=1,description="Weight of the vector score in weighted fusion (FTS gets 1-vector_weight)")
+    metric: Optional[Metric] = Field(None,description="Distance metric, defaults to the one the table's vector index was built with")
+    nprobes: Optional[int] = Field(None,description="IVF partitions to probe, higher is more accurate and slower")
+    refine_factor: Optional[int] = Field(None,description="Re-rank refine_factor*top_n ANN candidates on full vectors")
+    include_vector: bool = Field(False,description="Return each hit's embedding vector (large, off by default)")
+    rerank: bool = Field(False,description="Rerank the first rerank_candidates hits with a cross-encoder, then return top_n")
+    rerank_candidates: int = Field(50,gt=0,description="First-stage hits passed to the reranker")
+    rerank_budget_ms: Optional[float] = Field(None,gt=0,description="Reranking latency budget, first-stage order is kept when exceeded. Defaults to RERANK_BUDGET_MS")
+    where: Optional[str] = Field(None,description="SQL filter on metadata columns (e.g. \"tenant = 'a' AND year >= 2023\"), applied before the ANN search")
+
+class SearchIndexRequest(SearchOptions):
+    query: str
+
+class BatchQuery(BaseModel):
     query: str
-    top_n: int = 10
-    search_type: str
-    
+    top_n: Optional[int] = Field(None,gt=0,description="Overrides the batch's top_n")
+    search_type: Optional[SearchType] = Field(None,description="Overrides the batch's search_type")
+
+class SearchBatchRequest(SearchOptions):
+    queries: List[BatchQuery] = Field(...,description="Queries searched against the same table, the other fields apply to all of them")
+
+    def requests(self) -> List[SearchIndexRequest]:
+        options = self.model_dump(exclude={"queries"})
+        return [
+            SearchIndexRequest(**{
+                **options,
+                **query.model_dump(exclude_none=True)
+            })
+            for query in self.queries
+        ]
+
+class SearchResult(BaseModel):
+    # metadata columns are returned as extra fields
+    model_config = ConfigDict(extra="allow")
+    id: Optional[str] = Field(None,description="Document id (tables created before ids have none)")
+    text: str
+    vector: Optional[List[float]] = Field(None,description="Only present when include_vector is set")
+    distance: Optional[float] = Field(None,description="Vector distance (vector search)")
+    score: Optional[float] = Field(None,description="BM25 score (fts search)")
+    relevance_score: Optional[float] = Field(None,description="Fused score (hybrid search)")
+    rerank_score: Optional[float] = Field(None,description="Cross-encoder score (rerank), null if the budget ran out before it was scored")
+
 class SearchResponse(BaseModel):
-    results: List[TextEmbeddingSchema] = Field(...,description="The search results. List of {\"vector\":List[float],\"text\":str}")
+    results: List[SearchResult] = Field(...,description="The search results, best first")
+
+class SearchBatchResponse(BaseModel):
+    results: List[List[SearchResult]] = Field(...,description="Results per query, in request order")
 
 # Just Exceptions with descriptive names and messages...
 
@@ -66,4 +264,12 @@ class TableNotSetException(Exception):
 class TableNotFoundException(Exception):
     message = TABLE_NOT_FOUND_MESSAGE
     def __init__(self, table_name: str):
-        super().__init__(self.message.replace("$$TABLE$$",table_name))
\ No newline at end of file
+        super().__init__(self.message.replace("$$TABLE$$",table_name))
+
+class InvalidFilterException(Exception):
+    def __init__(self, where: str, error: str):
+        super().__init__(f"Invalid where filter `{where}`: {error}")
+
+class FullTextIndexMissingException(Exception):
+    def __init__(self, table_name: str, search_type: str):
+        super().__init__(f"Table {table_name} has no full-text (BM25) index, {search_type} search needs one: init it with bm25_index=true")
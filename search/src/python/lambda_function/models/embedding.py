@@ -1,14 +1,19 @@
-from pydantic import BaseModel
-from typing import List,Optional,Union,Any
+import numpy as np
+from pydantic import BaseModel,ConfigDict
+from typing import List,Optional,Union,Any,Literal
 
 class OpenAIEmbeddingRequest(BaseModel):
     input: Union[str,List[str]]
     model: str
+    encoding_format: Literal["float","base64"] = "float"
+    # text-embedding-3-* can shorten vectors server side, sent only when set
+    dimensions: Optional[int] = None
 
 class OpenAISentenceEmbedding(BaseModel):
     object: str
     index: int
-    embedding: List[float]
+    # base64 of little-endian float32 when encoding_format="base64"
+    embedding: Union[str,List[float]]
 
 class OpenAIUsageMetrics(BaseModel):
     prompt_tokens: int
@@ -21,5 +26,7 @@ class OpenAIEmbeddingResponse(BaseModel):
     usage: OpenAIUsageMetrics
 
 class Embeddings(BaseModel):
-    vectors: List[List[float]]
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    # float32, shape (len(texts), dims)
+    vectors: np.ndarray
     texts: List[str]
\ No newline at end of file
@@ -0,0 +1,96 @@
+import logging
+import numpy as np
+import pyarrow as pa
+from functools import lru_cache
+from os import environ as env
+from time import perf_counter
+from typing import List,Optional
+from .transport import AsyncHttpTransport
+from .timing import span,record_upstream
+from .models.db import SearchIndexRequest
+
+LOGGER = logging.getLogger("rag-search.service")
+
+# "rest": the embedding model Lambda's /rerank, "local": the same cross-encoder in-process
+RERANK_PROVIDER = env.get("RERANK_PROVIDER","rest")
+RERANK_API_ENDPOINT = env.get("RERANK_API_ENDPOINT")
+RERANK_API_KEY = env.get("RERANK_API_KEY")
+RERANK_MODEL_PATH = env.get("RERANK_MODEL_PATH")
+RERANK_BUDGET_MS = float(env.get("RERANK_BUDGET_MS","500"))
+# share of the budget the model gets, the rest covers the network round trip
+RERANK_MODEL_BUDGET_SHARE = float(env.get("RERANK_MODEL_BUDGET_SHARE","0.8"))
+
+RERANK_SCORE = "rerank_score"
+
+class Reranker:
+    """
+    Scores (query, passage) pairs with a cross-encoder. Returns None instead of
+    raising when the reranker is unavailable or the budget runs out, so search
+    degrades to first-stage order.
+    """
+    def __init__(
+        self,
+        provider: str = RERANK_PROVIDER,
+        api_endpoint: Optional[str] = RERANK_API_ENDPOINT,
+        api_key: Optional[str] = RERANK_API_KEY,
+        model_path: Optional[str] = RERANK_MODEL_PATH
+    ) -> None:
+        self.provider = provider
+        self.api_endpoint = api_endpoint
+        self.model_path = model_path
+        headers = {"Content-Type":"application/json"}
+        if api_key is not None:
+            headers["x-api-key"] = api_key
+        # no retries, a retry never fits the latency budget
+        self._transport = AsyncHttpTransport(headers,max_retries=0)
+
+    def score(self,query: str,passages: List[str],budget_ms: float) -> Optional[np.ndarray]:
+        start = perf_counter()
+        try:
+            if self.provider == "local":
+                scores = self._score_local(query,passages,budget_ms)
+            else:
+                scores = self._score_rest(query,passages,budget_ms)
+        except Exception as e:
+            LOGGER.warning(f"Reranking failed, keeping first-stage order: {type(e).__name__}: {e}")
+            return None
+        LOGGER.info(f"Reranked {len(passages)} passages in {(perf_counter()-start)*1000:.0f}ms")
+        return scores
+
+    def _score_local(self,query: str,passages: List[str],budget_ms: float) -> np.ndarray:
+        from .local_embedding import load_reranker_service
+        if self.model_path is None:
+            raise ValueError("RERANK_MODEL_PATH is not set")
+        scores,_,_,_ = load_reranker_service()(self.model_path).score(query,passages,budget_ms/1000)
+        return scores
+
+    def _score_rest(self,query: str,passages: List[str],budget_ms: float) -> np.ndarray:
+        if self.api_endpoint is None:
+            raise ValueError("RERANK_API_ENDPOINT is not set")
+        response = self._transport.post_sync(
+            self.api_endpoint,
+            {"query":query,"passages":passages,"budget_ms":budget_ms*RERANK_MODEL_BUDGET_SHARE},
+            timeout=budget_ms/1000
+        )
+        response.raise_for_status()
+        record_upstream("rerank",response.headers)
+        return np.array([np.nan if s is None else s for s in response.json()["scores"]],dtype=np.float32)
+
+@lru_cache(maxsize=None)
+def get_reranker() -> Reranker:
+    return Reranker()
+
+def rerank(req: SearchIndexRequest,candidates: pa.Table) -> pa.Table:
+    """Reorders first-stage candidates by cross-encoder score and keeps req.top_n of them."""
+    if candidates.num_rows == 0:
+        return candidates
+    budget_ms = req.rerank_budget_ms if req.rerank_budget_ms is not None else RERANK_BUDGET_MS
+    with span("rerank"):
+        scores = get_reranker().score(req.query,candidates["text"].to_pylist(),budget_ms)
+    if scores is None:
+        return candidates.slice(0,req.top_n)
+    # unscored passages (budget ran out) go after scored ones, in first-stage order
+    order = np.argsort(-np.nan_to_num(scores,nan=-np.inf),kind="stable")[:req.top_n]
+    return candidates\
+            .take(pa.array(order))\
+            .append_column(RERANK_SCORE,pa.array(scores[order],type=pa.float32(),from_pandas=True))
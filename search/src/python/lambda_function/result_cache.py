@@ -0,0 +1,149 @@
+import logging
+import os
+import pyarrow as pa
+from hashlib import blake2b
+from os import environ as env
+from pathlib import Path
+from threading import Lock,get_ident
+from typing import Dict,Optional,Tuple
+from weakref import WeakKeyDictionary
+from .cache import LRUCache
+from .models.db import SearchIndexRequest
+
+LOGGER = logging.getLogger("rag-search.service")
+
+# Search results keyed on the table's version and files, so writes and recreated tables invalidate them. Size 0 disables the cache
+RESULT_CACHE_SIZE = int(env.get("RESULT_CACHE_SIZE","1024"))
+RESULT_CACHE_MAX_BYTES = int(env.get("RESULT_CACHE_MAX_BYTES",str(64*1024**2)))
+# Set a dir (e.g. /tmp/result_cache) to keep results as Arrow files, bounded by RESULT_CACHE_DISK_BYTES
+RESULT_CACHE_DIR = env.get("RESULT_CACHE_DIR")
+RESULT_CACHE_DISK_BYTES = int(env.get("RESULT_CACHE_DISK_BYTES",str(256*1024**2)))
+
+def table_prefix(data_loc: str,table_name: str) -> str:
+    return blake2b(f"{data_loc}\x00{table_name}".encode(),digest_size=8).hexdigest()
+
+_STATES: "WeakKeyDictionary[object,Tuple[int,str]]" = WeakKeyDictionary()
+
+def table_state(table) -> str:
+    """
+    Digest of the table's current version: its number and the data and index files
+    it reads. Unlike the version number it also tells table incarnations apart: one
+    dropped and recreated (possibly by another instance) starts its versions over,
+    but its files have other UUIDs. The same version gives the same digest on any
+    handle or instance.
+    """
+    dataset = table.to_lance()
+    version = dataset.version
+    state = _STATES.get(dataset)
+    if state is None or state[0] != version:
+        # not the serialized manifest, lance writes its schema metadata map in hash order
+        files = [index["uuid"] for index in dataset.list_indices()]
+        for fragment in dataset.get_fragments():
+            files.extend(data_file.path() for data_file in fragment.metadata.data_files())
+        state = (version,blake2b("\x00".join([str(version),*files]).encode(),digest_size=16).hexdigest())
+        _STATES[dataset] = state
+    return state[1]
+
+def result_key(data_loc: str,table_name: str,state: str,req: SearchIndexRequest) -> str:
+    # every search option is part of the key, a new one can't silently share entries
+    params = req.model_dump_json(exclude={"data_loc","table_name"})
+    digest = blake2b(f"{state}\x00{params}".encode(),digest_size=16).hexdigest()
+    return f"{table_prefix(data_loc,table_name)}-{digest}"
+
+class ArrowFileStore:
+    """
+    Results as Arrow IPC files in ephemeral storage, read back memory-mapped.
+    Keys embed the table state, so stale files are never read, only aged out
+    (oldest first) once the directory outgrows max_bytes.
+    """
+    def __init__(self,path: Path,max_bytes: int) -> None:
+        path.mkdir(parents=True,exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.bytes = sum(file.stat().st_size for file in path.glob("*.arrow"))
+        self._lock = Lock()
+
+    def get(self,key: str) -> Optional[pa.Table]:
+        try:
+            # no `with`: the table's buffers keep pointing into the map
+            return pa.ipc.open_file(pa.memory_map(str(self.path/f"{key}.arrow"))).read_all()
+        except (FileNotFoundError,pa.ArrowInvalid):
+            return None
+
+    def put(self,key: str,table: pa.Table) -> None:
+        tmp = self.path/f"{key}.{os.getpid()}-{get_ident()}.tmp"
+        with pa.OSFile(str(tmp),"wb") as sink:
+            with pa.ipc.new_file(sink,table.schema) as writer:
+                writer.write_table(table)
+        size = tmp.stat().st_size
+        # rename is atomic, readers never see a partial file
+        tmp.replace(self.path/f"{key}.arrow")
+        with self._lock:
+            self.bytes += size
+            if self.bytes > self.max_bytes:
+                self._prune()
+
+    def _prune(self) -> None:
+        files = sorted(self.path.glob("*.arrow"),key=lambda file: file.stat().st_mtime)
+        self.bytes = sum(file.stat().st_size for file in files)
+        for file in files:
+            if self.bytes <= self.max_bytes*0.8:
+                break
+            size = file.stat().st_size
+            file.unlink(missing_ok=True)
+            self.bytes -= size
+
+    def invalidate(self,prefix: str) -> None:
+        with self._lock:
+            for file in self.path.glob(f"{prefix}-*.arrow"):
+                self.bytes -= file.stat().st_size
+                file.unlink(missing_ok=True)
+
+class ResultCache:
+    """In-memory LRU of result tables in front of an optional ArrowFileStore."""
+    def __init__(
+        self,
+        maxsize: int,
+        max_bytes: int,
+        cache_dir: Optional[str] = None,
+        disk_bytes: int = RESULT_CACHE_DISK_BYTES
+    ) -> None:
+        self.enabled = maxsize > 0
+        self._memory = LRUCache(maxsize,maxbytes=max_bytes,sizeof=lambda table: table.nbytes)
+        self._disk = ArrowFileStore(Path(cache_dir),disk_bytes) if cache_dir is not None and self.enabled else None
+
+    def get(self,key: str) -> Optional[pa.Table]:
+        table = self._memory.get(key)
+        if table is None and self._disk is not None:
+            table = self._disk.get(key)
+            if table is not None:
+                self._memory.put(key,table)
+        return table
+
+    def put(self,key: str,table: pa.Table) -> None:
+        self._memory.put(key,table)
+        if self._disk is not None:
+            try:
+                self._disk.put(key,table)
+            except OSError as e:
+                LOGGER.warning(f"Could not persist search result: {e}")
+
+    def invalidate(self,data_loc: str,table_name: str) -> None:
+        """
+        Drops a table's entries when it is dropped or recreated here. Their keys
+        can't match the new table anyway, this just frees the space early.
+        """
+        prefix = table_prefix(data_loc,table_name)
+        for key in self._memory.keys():
+            if key.startswith(prefix):
+                self._memory.pop(key)
+        if self._disk is not None:
+            self._disk.invalidate(prefix)
+
+    def clear(self) -> None:
+        self._memory.clear()
+
+    def stats(self) -> Dict[str,int]:
+        return {**self._memory.stats(),"bytes":self._memory.bytes}
+
+RESULT_CACHE = ResultCache(RESULT_CACHE_SIZE,RESULT_CACHE_MAX_BYTES,RESULT_CACHE_DIR)
@@ -1,17 +1,30 @@
+import base64
 import logging
-from typing import List
+from typing import Any,Dict,List,Optional,Tuple
 from os import environ as env
-from fastapi import FastAPI
+from fastapi import FastAPI,Request,Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import HTTPException
+from pydantic import ValidationError
 from mangum import Mangum
-from .db_client import LanceDB
-from .utils import full_traceback_str
+from .utils import full_traceback_str,dumps,table_rows
+from .timing import request_timings,emit_metrics,profiled,span
 from .models.db import (
-    TextEmbeddingSchema,
     InitIndexFromData,
+    InitIndexFromTranscript,
     SearchIndexRequest,
+    SearchBatchRequest,
+    SearchBatchResponse,
+    UpsertRequest,
+    UpsertResponse,
+    DeleteRequest,
+    DeleteResponse,
+    MaintenanceRequest,
+    MaintenanceResponse,
     TableNotSetException,
     TableNotFoundException,
+    InvalidFilterException,
+    FullTextIndexMissingException,
     TableInitStatus,
     InitResponse,
     SearchResponse
@@ -19,54 +32,229 @@ from .models.db import (
 
 DATA_S3_BUCKET = env.get("DATA_S3_BUCKET")
 
+# eager: load lancedb and the embedding client during init, lazy: on the first request that needs them
+STARTUP_MODE = env.get("STARTUP_MODE","eager")
+
+# POST /search Lambda events skip Mangum and the ASGI app, "false" routes them through FastAPI too
+DIRECT_SEARCH = env.get("DIRECT_SEARCH","true").lower() == "true"
+
 LOGGER = logging.getLogger("rag-search.service")
 LOG_LEVEL = env.get("LOG_LEVEL","INFO")
 LOGGER.setLevel(LOG_LEVEL)
 
+def lance_db(data_loc: str,table_name: Optional[str] = None):
+    from .db_client import LanceDB
+    return LanceDB(data_loc,table_name)
+
+def resolve_data_loc(data_loc: str) -> str:
+    LOGGER.debug(f"Initial path: {data_loc}")
+    if DATA_S3_BUCKET is not None and len(DATA_S3_BUCKET)>0:
+        data_loc = f"s3://{DATA_S3_BUCKET}/{data_loc}"
+        LOGGER.debug(f"Rewrote path: {data_loc}")
+    return data_loc
+
+if STARTUP_MODE == "eager":
+    from . import db_client
+
 app = FastAPI(
     title="rag-search",
     version="0.1.0"
 )
 
+@app.middleware("http")
+async def server_timing(request: Request,call_next):
+    with request_timings(profile="x-profile" in request.headers) as timings:
+        response = await call_next(request)
+    response.headers["Server-Timing"] = timings.server_timing()
+    emit_metrics(timings,request.url.path,response.status_code)
+    return response
+
 @app.post("/init_from_data")
+@profiled
 def init_table_from_data(init_req: InitIndexFromData) -> InitResponse:
     LOGGER.info("Init request started")
-    LOGGER.debug(f"Initial path: {init_req.data_loc}")
-    if DATA_S3_BUCKET is not None and len(DATA_S3_BUCKET)>0:
-        init_req.data_loc = f"s3://{DATA_S3_BUCKET}/{init_req.data_loc}"
-        LOGGER.debug(f"Rewrote path: {init_req.data_loc}")
-    db = LanceDB(init_req.data_loc)
+    init_req.data_loc = resolve_data_loc(init_req.data_loc)
+    db = lance_db(init_req.data_loc)
     try:
-        db.init_from_data(init_req)
+        stats = db.init_from_data(init_req)
         LOGGER.debug(f"Initialized table: {init_req.table_name}")
-        return InitResponse(status=TableInitStatus.SUCCESS)
+        return InitResponse(status=TableInitStatus.SUCCESS,stats=stats)
     except Exception as e:
         LOGGER.error(full_traceback_str(e))
         return InitResponse(status=TableInitStatus.FAIL)
     finally:
         LOGGER.info("Init request completed")
 
+@app.post("/init_from_transcript")
+@profiled
+def init_table_from_transcript(init_req: InitIndexFromTranscript) -> InitResponse:
+    LOGGER.info(f"Init from transcript request started: {len(init_req.documents)} documents")
+    init_req.data_loc = resolve_data_loc(init_req.data_loc)
+    db = lance_db(init_req.data_loc)
+    try:
+        stats = db.init_from_transcript(init_req)
+        LOGGER.debug(f"Initialized table: {init_req.table_name}")
+        return InitResponse(status=TableInitStatus.SUCCESS,stats=stats)
+    except Exception as e:
+        LOGGER.error(full_traceback_str(e))
+        return InitResponse(status=TableInitStatus.FAIL)
+    finally:
+        LOGGER.info("Init from transcript request completed")
+
 @app.post("/search")
+@profiled
 def search_table(search_req: SearchIndexRequest) -> SearchResponse:
     LOGGER.info("Search request received")
-    LOGGER.debug(f"Initial path: {search_req.data_loc}")
     try:
         LOGGER.info("Connecting to index...")
-        if DATA_S3_BUCKET is not None and len(DATA_S3_BUCKET)>0:
-            search_req.data_loc = f"s3://{DATA_S3_BUCKET}/{search_req.data_loc}"
-            LOGGER.debug(f"Rewrote path: {search_req.data_loc}")
-        db = LanceDB(search_req.data_loc,search_req.table_name)
+        search_req.data_loc = resolve_data_loc(search_req.data_loc)
+        db = lance_db(search_req.data_loc,search_req.table_name)
         LOGGER.info("Searching index...")
         results = db.search(search_req)
         LOGGER.info("Search complete!")
-        return SearchResponse(results=results)
+        # Rows come straight from Arrow, skip per-row pydantic validation on the way out
+        with span("serialize"):
+            content = dumps({"results":table_rows(results)})
+        return Response(content=content,media_type="application/json")
     except TableNotFoundException:
         raise HTTPException(status_code=404,detail=f"Table: {search_req.table_name} not found in DataSource: {search_req.data_loc}")
+    except (InvalidFilterException,FullTextIndexMissingException) as e:
+        raise HTTPException(status_code=400,detail=str(e))
     finally:
         LOGGER.info("Search request complete!")
 
+@app.post("/search_batch")
+@profiled
+def search_table_batch(search_req: SearchBatchRequest) -> SearchBatchResponse:
+    LOGGER.info(f"Batch search request received: {len(search_req.queries)} queries")
+    try:
+        search_req.data_loc = resolve_data_loc(search_req.data_loc)
+        db = lance_db(search_req.data_loc,search_req.table_name)
+        results = db.search_batch(search_req)
+        with span("serialize"):
+            content = dumps({"results":[table_rows(result) for result in results]})
+        return Response(content=content,media_type="application/json")
+    except TableNotFoundException:
+        raise HTTPException(status_code=404,detail=f"Table: {search_req.table_name} not found in DataSource: {search_req.data_loc}")
+    except (InvalidFilterException,FullTextIndexMissingException) as e:
+        raise HTTPException(status_code=400,detail=str(e))
+    finally:
+        LOGGER.info("Batch search request complete!")
+
+@app.post("/upsert")
+@profiled
+def upsert(upsert_req: UpsertRequest) -> UpsertResponse:
+    LOGGER.info("Upsert request started")
+    upsert_req.data_loc = resolve_data_loc(upsert_req.data_loc)
+    db = lance_db(upsert_req.data_loc,upsert_req.table_name)
+    try:
+        stats = db.upsert(upsert_req)
+        LOGGER.info(f"Upserted {stats.inserted} new, {stats.updated} changed, {stats.unchanged} unchanged")
+        return UpsertResponse(status=TableInitStatus.SUCCESS,stats=stats)
+    except TableNotFoundException:
+        raise HTTPException(status_code=404,detail=f"Table: {upsert_req.table_name} not found in DataSource: {upsert_req.data_loc}")
+    except Exception as e:
+        LOGGER.error(full_traceback_str(e))
+        return UpsertResponse(status=TableInitStatus.FAIL)
+    finally:
+        LOGGER.info("Upsert request completed")
+
+@app.post("/delete")
+@profiled
+def delete(delete_req: DeleteRequest) -> DeleteResponse:
+    LOGGER.info("Delete request started")
+    delete_req.data_loc = resolve_data_loc(delete_req.data_loc)
+    db = lance_db(delete_req.data_loc,delete_req.table_name)
+    try:
+        deleted = db.delete(delete_req.ids)
+        return DeleteResponse(status=TableInitStatus.SUCCESS,deleted=deleted)
+    except TableNotFoundException:
+        raise HTTPException(status_code=404,detail=f"Table: {delete_req.table_name} not found in DataSource: {delete_req.data_loc}")
+    except Exception as e:
+        LOGGER.error(full_traceback_str(e))
+        return DeleteResponse(status=TableInitStatus.FAIL)
+    finally:
+        LOGGER.info("Delete request completed")
+
+@app.post("/maintenance")
+@profiled
+def maintenance(maintenance_req: MaintenanceRequest) -> MaintenanceResponse:
+    LOGGER.info("Maintenance request started")
+    maintenance_req.data_loc = resolve_data_loc(maintenance_req.data_loc)
+    db = lance_db(maintenance_req.data_loc,maintenance_req.table_name)
+    try:
+        stats = db.maintain(maintenance_req)
+        LOGGER.info(
+            f"Maintained {maintenance_req.table_name}: {stats.before.fragments}->{stats.after.fragments} fragments, "
+            f"{stats.before.bytes}->{stats.after.bytes} bytes in {stats.seconds:.1f}s"
+        )
+        return MaintenanceResponse(status=TableInitStatus.SUCCESS,stats=stats)
+    except TableNotFoundException:
+        raise HTTPException(status_code=404,detail=f"Table: {maintenance_req.table_name} not found in DataSource: {maintenance_req.data_loc}")
+    except Exception as e:
+        LOGGER.error(full_traceback_str(e))
+        return MaintenanceResponse(status=TableInitStatus.FAIL)
+    finally:
+        LOGGER.info("Maintenance request completed")
+
 @app.get("/ping")
 def ping() -> str:
     return "ALIVE"
 
-handler = Mangum(app)
\ No newline at end of file
+def scheduled_maintenance(maintenance_req: MaintenanceRequest) -> MaintenanceResponse:
+    try:
+        return maintenance(maintenance_req)
+    except HTTPException as e:
+        LOGGER.error(e.detail)
+        return MaintenanceResponse(status=TableInitStatus.FAIL)
+
+api_handler = Mangum(app)
+
+def event_route(event: Dict[str,Any]) -> Tuple[Optional[str],Optional[str]]:
+    # API Gateway REST (v1) or HTTP API (v2) payloads
+    if "httpMethod" in event:
+        return event["httpMethod"],event.get("path")
+    http = event.get("requestContext",{}).get("http",{})
+    return http.get("method"),event.get("rawPath")
+
+def search_event(body: str) -> Tuple[int,bytes]:
+    """/search without the ASGI round trip, same responses as the FastAPI route."""
+    try:
+        search_req = SearchIndexRequest.model_validate_json(body)
+    except ValidationError as e:
+        # FastAPI's 422 body, locations prefixed with "body"
+        errors = [{**error,"loc":("body",*error["loc"])} for error in e.errors(include_url=False)]
+        return 422,dumps({"detail":jsonable_encoder(errors)})
+    try:
+        return 200,search_table(search_req).body
+    except HTTPException as e:
+        return e.status_code,dumps({"detail":e.detail})
+    except Exception as e:
+        LOGGER.error(full_traceback_str(e))
+        return 500,dumps({"detail":"Internal Server Error"})
+
+def direct_search(event: Dict[str,Any]) -> Dict[str,Any]:
+    headers = {name.lower():value for name,value in (event.get("headers") or {}).items()}
+    body = event.get("body") or ""
+    if event.get("isBase64Encoded"):
+        body = base64.b64decode(body)
+    with request_timings(profile="x-profile" in headers) as timings:
+        status_code,content = search_event(body)
+    emit_metrics(timings,"/search",status_code)
+    return {
+        "statusCode":status_code,
+        "headers":{"content-type":"application/json","server-timing":timings.server_timing()},
+        "body":content.decode(),
+        "isBase64Encoded":False
+    }
+
+def handler(event: Dict[str,Any],context: Any) -> Any:
+    # Scheduled (EventBridge) maintenance: {"maintenance":[{"data_loc":...,"table_name":...},...]}
+    if "maintenance" in event:
+        tables = event["maintenance"]
+        if isinstance(tables,dict):
+            tables = [tables]
+        return [scheduled_maintenance(MaintenanceRequest(**table)).model_dump() for table in tables]
+    if DIRECT_SEARCH and event_route(event) == ("POST","/search"):
+        return direct_search(event)
+    return api_handler(event,context)
\ No newline at end of file
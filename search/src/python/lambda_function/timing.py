@@ -0,0 +1,148 @@
+import cProfile
+import json
+import logging
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from os import environ as env
+from pathlib import Path
+from threading import Lock
+from time import perf_counter,time
+from typing import Any,Callable,Coroutine,Dict,Iterator,Mapping,Optional
+
+LOGGER = logging.getLogger("rag-search.service")
+
+# Embedded Metric Format log line per request, picked up by CloudWatch without an agent
+EMF_METRICS = env.get("EMF_METRICS","true").lower() == "true"
+METRICS_NAMESPACE = env.get("METRICS_NAMESPACE","rag-search")
+# When set, requests sent with an `x-profile` header dump a cProfile .prof file here
+PROFILE_DIR = env.get("PROFILE_DIR")
+
+_SERVER_TIMING_ENTRY = re.compile(r"^\s*([\w.-]+)\s*(?:;.*?\bdur=([\d.]+))?")
+
+class Timings:
+    """Span durations (ms) of one request, shared by every thread working on it."""
+    def __init__(self,profile: bool = False) -> None:
+        self.spans: Dict[str,float] = {}
+        self.profile = profile
+        self._lock = Lock()
+
+    def add(self,name: str,ms: float) -> None:
+        # repeated spans (e.g. one per embedding batch) accumulate
+        with self._lock:
+            self.spans[name] = self.spans.get(name,0.0)+ms
+
+    def server_timing(self) -> str:
+        return ",".join(f"{name};dur={ms:.1f}" for name,ms in self.spans.items())
+
+    def emf(self,route: str,status_code: int) -> Dict[str,Any]:
+        return {
+            "_aws":{
+                "Timestamp":int(time()*1000),
+                "CloudWatchMetrics":[{
+                    "Namespace":METRICS_NAMESPACE,
+                    "Dimensions":[["route"]],
+                    "Metrics":[{"Name":name,"Unit":"Milliseconds"} for name in self.spans]
+                }]
+            },
+            "route":route,
+            "status_code":status_code,
+            **self.spans
+        }
+
+_CURRENT: ContextVar[Optional[Timings]] = ContextVar("timings",default=None)
+
+def current() -> Optional[Timings]:
+    return _CURRENT.get()
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Times the block into the current request's timings, a no-op outside a request."""
+    timings = _CURRENT.get()
+    if timings is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name,(perf_counter()-start)*1000)
+
+def record(name: str,ms: float) -> None:
+    timings = _CURRENT.get()
+    if timings is not None:
+        timings.add(name,ms)
+
+def record_upstream(prefix: str,headers: Mapping[str,str]) -> None:
+    """Folds an upstream response's Server-Timing (model Lambda) or openai-processing-ms into the current timings."""
+    timings = _CURRENT.get()
+    if timings is None:
+        return
+    for entry in (headers.get("server-timing") or "").split(","):
+        match = _SERVER_TIMING_ENTRY.match(entry)
+        if match is not None and match.group(2) is not None:
+            timings.add(f"{prefix}.{match.group(1)}",float(match.group(2)))
+    processing_ms = headers.get("openai-processing-ms")
+    if processing_ms is not None:
+        timings.add(f"{prefix}.upstream",float(processing_ms))
+
+@contextmanager
+def request_timings(profile: bool = False) -> Iterator[Timings]:
+    timings = Timings(profile=profile and PROFILE_DIR is not None)
+    token = _CURRENT.set(timings)
+    start = perf_counter()
+    try:
+        yield timings
+    finally:
+        timings.add("total",(perf_counter()-start)*1000)
+        _CURRENT.reset(token)
+
+def emit_metrics(timings: Timings,route: str,status_code: int) -> None:
+    if EMF_METRICS:
+        # EMF has to be the raw JSON line on stdout, not wrapped by the log formatter
+        print(json.dumps(timings.emf(route,status_code),separators=(",",":")),flush=True)
+
+def bind(fn: Callable) -> Callable:
+    """Carries the caller's timings into a pool thread, contextvars don't cross executors."""
+    timings = _CURRENT.get()
+    if timings is None:
+        return fn
+    @wraps(fn)
+    def bound(*args,**kwargs):
+        token = _CURRENT.set(timings)
+        try:
+            return fn(*args,**kwargs)
+        finally:
+            _CURRENT.reset(token)
+    return bound
+
+def bind_coroutine(coro: Coroutine) -> Coroutine:
+    """Same as bind for a coroutine handed to the background event loop."""
+    timings = _CURRENT.get()
+    if timings is None:
+        return coro
+    async def bound():
+        _CURRENT.set(timings)
+        return await coro
+    return bound()
+
+def profiled(fn: Callable) -> Callable:
+    """
+    Profiles a route in the thread it runs in (cProfile only sees its own
+    thread) when the request asked for it, one .prof file per request.
+    """
+    @wraps(fn)
+    def wrapper(*args,**kwargs):
+        timings = _CURRENT.get()
+        if timings is None or not timings.profile:
+            return fn(*args,**kwargs)
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(fn,*args,**kwargs)
+        finally:
+            path = Path(PROFILE_DIR)/f"{fn.__name__}-{int(time()*1000)}.prof"
+            path.parent.mkdir(parents=True,exist_ok=True)
+            profiler.dump_stats(str(path))
+            LOGGER.info(f"Wrote request profile to {path}")
+    return wrapper
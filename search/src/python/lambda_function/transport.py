@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import random
+import re
+import httpx
+from threading import Thread,Lock
+from time import monotonic
+from typing import Any,Coroutine,Dict,Mapping,Optional
+from .timing import bind_coroutine
+
+LOGGER = logging.getLogger("rag-search.service")
+
+RETRY_STATUS_CODES = {408,409,429,500,502,503,504}
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_SCALE = {"ms":0.001,"s":1.0,"m":60.0,"h":3600.0}
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parses retry-after seconds or OpenAI style reset durations ("1s", "6m0s", "20ms")."""
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if len(parts) == 0:
+        return None
+    return sum(float(n)*_DURATION_SCALE[unit] for n,unit in parts)
+
+def backoff_delay(attempt: int,base: float,cap: float) -> float:
+    # "full jitter" exponential backoff
+    return random.uniform(0,min(cap,base*2**attempt))
+
+class RateLimiter:
+    """
+    Shared gate for every request going through one transport. Provider rate-limit
+    headers push back the time the next request may start, so concurrent batches
+    pause together before the provider starts answering 429.
+    """
+    def __init__(self,min_remaining: int = 1) -> None:
+        self.min_remaining = min_remaining
+        self._resume_at = 0.0
+
+    def pause(self,seconds: float) -> None:
+        self._resume_at = max(self._resume_at,monotonic()+seconds)
+
+    def update(self,headers: Mapping[str,str]) -> None:
+        retry_after = parse_duration(headers.get("retry-after"))
+        if retry_after is not None:
+            self.pause(retry_after)
+        for kind in ("requests","tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if remaining is not None and reset is not None and int(remaining) <= self.min_remaining:
+                self.pause(reset)
+
+    async def wait(self) -> None:
+        delay = self._resume_at-monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+class BackgroundLoop:
+    """An event loop on a daemon thread so sync callers (lancedb, FastAPI sync routes) can drive async IO."""
+    def __init__(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        Thread(target=self._loop.run_forever,name="transport-loop",daemon=True).start()
+
+    def run(self,coro: Coroutine) -> Any:
+        return asyncio.run_coroutine_threadsafe(bind_coroutine(coro),self._loop).result()
+
+    def submit(self,coro: Coroutine):
+        return asyncio.run_coroutine_threadsafe(bind_coroutine(coro),self._loop)
+
+_LOOP: Optional[BackgroundLoop] = None
+_LOOP_LOCK = Lock()
+
+def background_loop() -> BackgroundLoop:
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            _LOOP = BackgroundLoop()
+        return _LOOP
+
+class AsyncHttpTransport:
+    """
+    Pooled keep-alive httpx client with timeouts, jittered exponential retries and
+    rate-limit awareness. Retries 429/5xx/transport errors, honoring retry-after.
+    """
+    def __init__(
+        self,
+        headers: Dict[str,str],
+        max_connections: int = 16,
+        timeout: float = 30.0,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 20.0
+    ) -> None:
+        self.headers = headers
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.rate_limiter = RateLimiter()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    # Created lazily so the client binds to the loop it's used on
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(self.timeout,connect=min(self.timeout,5.0)),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60.0
+                )
+            )
+        return self._client
+
+    async def post(self,url: str,json: Any,timeout: Optional[float] = None) -> httpx.Response:
+        attempt = 0
+        while True:
+            await self.rate_limiter.wait()
+            try:
+                if timeout is not None:
+                    response = await self.client.post(url,json=json,timeout=timeout)
+                else:
+                    response = await self.client.post(url,json=json)
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                LOGGER.warning(f"Embedding request failed ({type(e).__name__}), retry {attempt+1}/{self.max_retries}")
+            else:
+                self.rate_limiter.update(response.headers)
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                LOGGER.warning(f"Embedding request returned {response.status_code}, retry {attempt+1}/{self.max_retries}")
+            await asyncio.sleep(backoff_delay(attempt,self.backoff_base,self.backoff_cap))
+            attempt += 1
+
+    def post_sync(self,url: str,json: Any,timeout: Optional[float] = None) -> httpx.Response:
+        return background_loop().run(self.post(url,json,timeout))
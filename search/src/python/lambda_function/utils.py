@@ -1,4 +1,31 @@
 import traceback
+import orjson
+from datetime import date
+from typing import Any,Dict,List
 
 def full_traceback_str(e: Exception) -> str:
-    return "".join(traceback.format_exception(type(e),e,e.__traceback__))
\ No newline at end of file
+    return "".join(traceback.format_exception(type(e),e,e.__traceback__))
+
+def json_default(value: Any) -> Any:
+    # Arrow timestamp/date columns come back as datetime objects
+    if isinstance(value,date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def dumps(value: Any) -> bytes:
+    # numpy arrays are encoded straight from their buffer, no python float per element
+    return orjson.dumps(value,default=json_default,option=orjson.OPT_SERIALIZE_NUMPY)
+
+def table_rows(table) -> List[Dict[str,Any]]:
+    """Rows of an Arrow result table, vector columns as float32 numpy rows for dumps()."""
+    import numpy as np
+    import pyarrow as pa
+    columns = {}
+    for name,column in zip(table.column_names,table.columns):
+        if pa.types.is_fixed_size_list(column.type) and column.null_count == 0:
+            vectors = column.combine_chunks()
+            values = vectors.flatten().to_numpy(zero_copy_only=False).astype(np.float32,copy=False)
+            columns[name] = list(values.reshape(len(vectors),column.type.list_size))
+        else:
+            columns[name] = column.to_pylist()
+    return [dict(zip(columns,row)) for row in zip(*columns.values())]
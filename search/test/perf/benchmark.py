@@ -0,0 +1,232 @@
+from argparse import ArgumentParser,SUPPRESS
+from datetime import datetime,timezone
+from pathlib import Path
+from subprocess import run
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from os import environ
+from typing import Dict,Iterator,List
+import json
+import platform
+import sys
+
+import numpy as np
+
+from cold_start import cold_starts
+from stub_embedding import start_stub,endpoint
+
+cur_dir:Path = Path(__file__).parent.absolute()
+
+SRC_DIR = cur_dir.parent.parent/"src"/"python"
+
+SEARCH_TYPES = ("vector","fts","hybrid")
+PERCENTILES = (50,95,99)
+# Metrics where a larger value is an improvement, everything else is a cost
+HIGHER_IS_BETTER = ("rows_per_second","qps")
+
+def vocabulary(size: int,seed: int) -> List[str]:
+    rng = np.random.default_rng(seed)
+    syllables = np.array(["ka","lo","mi","ren","tu","sa","vo","pel","dri","an","os","qua","ze","bi","nor","thi"])
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables,rng.integers(2,5))))
+    return sorted(words)
+
+def zipf_weights(size: int,exponent: float = 1.1) -> np.ndarray:
+    weights = 1/np.arange(1,size+1)**exponent
+    return weights/weights.sum()
+
+def corpus(rows: int,vocab: List[str],min_words: int,max_words: int,seed: int,chunk: int = 10000) -> Iterator[str]:
+    """Zipf-distributed synthetic documents, generated in chunks so 1M rows never sit in memory at once."""
+    rng = np.random.default_rng(seed)
+    words = np.array(vocab)
+    weights = zipf_weights(len(vocab))
+    for start in range(0,rows,chunk):
+        n = min(chunk,rows-start)
+        lengths = rng.integers(min_words,max_words+1,n)
+        tokens = words[rng.choice(len(vocab),lengths.sum(),p=weights)]
+        offsets = np.concatenate([[0],np.cumsum(lengths)])
+        for i in range(n):
+            yield " ".join(tokens[offsets[i]:offsets[i+1]])+"."
+
+def queries(n: int,vocab: List[str],seed: int) -> List[str]:
+    # skip the head of the distribution so BM25 terms are selective
+    rng = np.random.default_rng(seed)
+    tail = vocab[len(vocab)//50:]
+    return [" ".join(rng.choice(tail,rng.integers(2,6))) for _ in range(n)]
+
+def latency_stats(samples_ms: List[float]) -> Dict[str,float]:
+    samples = np.array(samples_ms)
+    stats = {f"p{p}_ms":float(np.percentile(samples,p)) for p in PERCENTILES}
+    stats["mean_ms"] = float(samples.mean())
+    stats["qps"] = float(len(samples)/(samples.sum()/1000))
+    return stats
+
+def peak_rss_mb() -> float:
+    import resource
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*scale/1024**2
+
+def worker(config: Dict) -> Dict:
+    """Runs in a fresh interpreter pointed at the stub, so RSS and imports only cover the search Lambda."""
+    sys.path.append(str(SRC_DIR))
+    from lambda_function.db_client import LanceDB
+    from lambda_function.models.db import InitIndexFromData,SearchIndexRequest,Text
+
+    vocab = vocabulary(config["vocab"],config["seed"])
+    docs = (Text(text=text) for text in corpus(config["rows"],vocab,config["min_words"],config["max_words"],config["seed"]))
+    db = LanceDB(config["data_loc"],config["table_name"])
+    start = perf_counter()
+    # model_construct keeps `data` a generator, so the corpus streams into ingest
+    stats = db.init_from_data(InitIndexFromData.model_construct(
+        data_loc=config["data_loc"],
+        table_name=config["table_name"],
+        bm25_index=True,
+        dimensions=config["dimensions"],
+        vector_type=config["vector_type"],
+        data=docs
+    ))
+    total_seconds = perf_counter()-start
+    report = {
+        "ingest":{
+            "rows":stats.rows,
+            "batches":stats.batches,
+            "seconds":stats.seconds,
+            "rows_per_second":stats.rows_per_second,
+            "index_seconds":total_seconds-stats.seconds,
+            "total_seconds":total_seconds
+        },
+        "peak_rss_mb":{"ingest":peak_rss_mb()},
+        "search":{}
+    }
+    query_texts = queries(config["warmup"]+config["queries"],vocab,config["seed"]+1)
+    for search_type in SEARCH_TYPES:
+        samples = []
+        for i,query in enumerate(query_texts):
+            req = SearchIndexRequest(
+                data_loc=config["data_loc"],
+                table_name=config["table_name"],
+                query=query,
+                top_n=config["top_n"],
+                search_type=search_type
+            )
+            query_start = perf_counter()
+            db.search(req)
+            if i >= config["warmup"]:
+                samples.append((perf_counter()-query_start)*1000)
+        report["search"][search_type] = latency_stats(samples)
+    report["peak_rss_mb"]["search"] = peak_rss_mb()
+    return report
+
+def git_commit() -> str:
+    proc = run(["git","rev-parse","--short","HEAD"],cwd=cur_dir,capture_output=True,text=True)
+    return proc.stdout.strip() if proc.returncode == 0 else None
+
+def flatten(report: Dict,prefix: str = "") -> Dict[str,float]:
+    values = {}
+    for key,value in report.items():
+        if isinstance(value,dict):
+            values.update(flatten(value,f"{prefix}{key}."))
+        elif isinstance(value,(int,float)) and not isinstance(value,bool):
+            values[f"{prefix}{key}"] = value
+    return values
+
+def compare(baseline: Dict,report: Dict) -> List[str]:
+    """One line per metric with the relative change, `!` marks a regression above 10%."""
+    before = flatten(baseline["results"])
+    after = flatten(report["results"])
+    lines = []
+    for key in sorted(before.keys() & after.keys()):
+        if before[key] == 0:
+            continue
+        change = (after[key]-before[key])/before[key]
+        worse = change < -0.1 if key.endswith(HIGHER_IS_BETTER) else change > 0.1
+        lines.append(f"{'!' if worse else ' '} {key:<40} {before[key]:>12.2f} {after[key]:>12.2f} {change:>+8.1%}")
+    return lines
+
+def parse_args() -> Dict[str,str]:
+    parser = ArgumentParser(
+            prog="Benchmark",
+            description="Offline ingest/search benchmark of the search Lambda against a stub embedding server"
+        )
+    parser.add_argument("-r","--rows",type=int,default=10000,help="Synthetic corpus size, 10k to 1M rows")
+    parser.add_argument("-q","--queries",type=int,default=200,help="Measured queries per search_type")
+    parser.add_argument("--warmup",type=int,default=20,help="Unmeasured queries per search_type")
+    parser.add_argument("-k","--top-n",type=int,default=10,help="top_n of each search")
+    parser.add_argument("--dims",type=int,default=1536,help="Embedding dimensions served by the stub")
+    parser.add_argument("--dimensions",type=int,default=None,help="Table `dimensions`, store truncated vectors")
+    parser.add_argument("--vector-type",type=str,default="float32",choices=["float32","float16"],help="Table vector storage type")
+    parser.add_argument("--vocab",type=int,default=20000,help="Vocabulary size of the corpus")
+    parser.add_argument("--min-words",type=int,default=20,help="Shortest document in words")
+    parser.add_argument("--max-words",type=int,default=120,help="Longest document in words")
+    parser.add_argument("--embedding-latency-ms",type=float,default=0.0,help="Simulated latency of each embedding request")
+    parser.add_argument("--seed",type=int,default=42,help="Corpus and query seed, keep it fixed to compare commits")
+    parser.add_argument("-n","--cold-start-runs",type=int,default=3,help="Fresh processes for the cold-import timing, 0 to skip")
+    parser.add_argument("-d","--data-loc",type=str,default=None,help="Where to write the table, a temporary directory by default")
+    parser.add_argument("-b","--baseline",type=str,default=None,help="Earlier JSON report to compare against")
+    parser.add_argument("-o","--output",type=str,default=None,help="Write the JSON report here instead of stdout")
+    parser.add_argument("--worker",type=str,default=None,help=SUPPRESS)
+    return parser.parse_args().__dict__
+
+def run_worker(config: Dict,env: Dict[str,str]) -> Dict:
+    proc = run(
+        [sys.executable,__file__,"--worker",json.dumps(config)],
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"Benchmark worker failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args["worker"] is not None:
+        print(json.dumps(worker(json.loads(args["worker"]))))
+        raise SystemExit(0)
+    server = start_stub(args["dims"],args["embedding_latency_ms"])
+    # the caller's environment still wins, e.g. to benchmark with EMBEDDING_CACHE_SIZE set
+    environ.update({
+        "EMBEDDING_API_ENDPOINT":environ.get("EMBEDDING_API_ENDPOINT",endpoint(server)),
+        "EMBEDDING_API_KEY":environ.get("EMBEDDING_API_KEY","benchmark"),
+        "EMBEDDING_CACHE_SIZE":environ.get("EMBEDDING_CACHE_SIZE","0"),
+        "RESULT_CACHE_SIZE":environ.get("RESULT_CACHE_SIZE","0"),
+        "MODEL_DIM":environ.get("MODEL_DIM",str(args["dims"])),
+        "LOG_LEVEL":environ.get("LOG_LEVEL","WARNING"),
+        "PYTHONPATH":str(SRC_DIR)
+    })
+    config = {
+        key:args[key]
+        for key in ("rows","queries","warmup","top_n","dims","dimensions","vector_type","vocab","min_words","max_words","seed")
+    }
+    with TemporaryDirectory() as tmp_dir:
+        results = run_worker(
+            {**config,"data_loc":args["data_loc"] or tmp_dir,"table_name":"benchmark"},
+            dict(environ)
+        )
+    if args["cold_start_runs"] > 0:
+        results["cold_import_ms"] = {
+            mode:cold_starts("lambda_function.service",mode,args["cold_start_runs"],None)["import_ms"]
+            for mode in ("eager","lazy")
+        }
+    server.shutdown()
+    report = {
+        "commit":git_commit(),
+        "timestamp":datetime.now(timezone.utc).isoformat(),
+        "python":platform.python_version(),
+        "platform":platform.platform(),
+        "config":{**config,"embedding_latency_ms":args["embedding_latency_ms"]},
+        "results":results
+    }
+    output = json.dumps(report,indent=2)
+    if args["output"] is not None:
+        Path(args["output"]).write_text(output)
+    else:
+        print(output)
+    if args["baseline"] is not None:
+        baseline = json.loads(Path(args["baseline"]).read_text())
+        if baseline["config"] != report["config"]:
+            print("Warning: baseline was run with a different config",file=sys.stderr)
+        print(f"  {'metric':<40} {baseline['commit'] or 'baseline':>12} {report['commit'] or 'current':>12}",file=sys.stderr)
+        print("\n".join(compare(baseline,report)),file=sys.stderr)
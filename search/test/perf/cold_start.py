@@ -0,0 +1,156 @@
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import median
+from subprocess import run
+from os import environ
+from typing import Dict,List,Optional
+import json
+import sys
+
+cur_dir:Path = Path(__file__).parent.absolute()
+
+SRC_DIR = cur_dir.parent.parent/"src"/"python"
+
+# Runs in a fresh interpreter: import the handler module, then push API Gateway events through Mangum
+PROBE = """
+import json,sys
+from time import perf_counter
+start = perf_counter()
+from {module} import handler
+imported = perf_counter()
+def event(path,method,body=None):
+    return {{
+        "resource":path,"path":path,"httpMethod":method,
+        "headers":{{"content-type":"application/json"}},"multiValueHeaders":{{}},
+        "queryStringParameters":None,"multiValueQueryStringParameters":None,
+        "requestContext":{{"resourcePath":path,"httpMethod":method,"path":path,"stage":"v1"}},
+        "body":body,"isBase64Encoded":False
+    }}
+timings = {{"import_ms":(imported-start)*1000}}
+handler(event("/ping","GET"),None)
+timings["first_ping_ms"] = (perf_counter()-imported)*1000
+search = {search}
+if search is not None:
+    search_start = perf_counter()
+    response = handler(event("/search","POST",json.dumps(search)),None)
+    assert response["statusCode"] == 200,response["body"]
+    timings["first_search_ms"] = (perf_counter()-search_start)*1000
+timings["total_ms"] = (perf_counter()-start)*1000
+timings["modules"] = len(sys.modules)
+print(json.dumps(timings))
+"""
+
+def probe_env(startup_mode: str) -> Dict[str,str]:
+    return {
+        **environ,
+        "PYTHONPATH":str(SRC_DIR),
+        "STARTUP_MODE":startup_mode,
+        "PYTHONDONTWRITEBYTECODE":"1"
+    }
+
+def importtime_report(module: str,top: int) -> List[Dict]:
+    """Top modules by cumulative import time from `python -X importtime`."""
+    proc = run(
+        [sys.executable,"-X","importtime","-c",f"import {module}"],
+        env=probe_env("eager"),
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us,cumulative_us,name = line[len("import time:"):].split("|")
+        rows.append({
+            "module":name.strip(),
+            "self_ms":int(self_us)/1000,
+            "cumulative_ms":int(cumulative_us)/1000
+        })
+    return sorted(rows,key=lambda row:row["cumulative_ms"],reverse=True)[:top]
+
+def cold_starts(module: str,startup_mode: str,runs: int,search: Optional[Dict]) -> Dict[str,float]:
+    samples = []
+    for _ in range(runs):
+        proc = run(
+            [sys.executable,"-c",PROBE.format(module=module,search=repr(search))],
+            env=probe_env(startup_mode),
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return {
+        key:median(sample[key] for sample in samples)
+        for key in samples[0]
+    }
+
+def parse_args() -> Dict[str,str]:
+    parser = ArgumentParser(
+            prog="ColdStart",
+            description="Import-time profile and cold-start timings of the search Lambda"
+        )
+    parser.add_argument(
+        "-m","--module",
+        type=str,
+        default="lambda_function.service",
+        help="The handler module to import"
+    )
+    parser.add_argument(
+        "-n","--runs",
+        type=int,
+        default=5,
+        help="Fresh processes per startup mode, the median is reported"
+    )
+    parser.add_argument(
+        "-t","--top",
+        type=int,
+        default=25,
+        help="Number of modules in the import-time report"
+    )
+    parser.add_argument(
+        "-d","--data-loc",
+        type=str,
+        default=None,
+        help="Also time the first /search against this LanceDB location"
+    )
+    parser.add_argument(
+        "--table-name",
+        type=str,
+        default=None,
+        help="Table for the first /search"
+    )
+    parser.add_argument(
+        "--max-import-ms",
+        type=float,
+        default=None,
+        help="Fail if the lazy-mode import takes longer than this"
+    )
+    parser.add_argument(
+        "-o","--output",
+        type=str,
+        default=None,
+        help="Write the JSON report here instead of stdout"
+    )
+    return parser.parse_args().__dict__
+
+if __name__ == "__main__":
+    args = parse_args()
+    search = None
+    if args["data_loc"] is not None:
+        search = {"data_loc":args["data_loc"],"table_name":args["table_name"],"query":"cold start","top_n":5}
+    report = {
+        "importtime":importtime_report(args["module"],args["top"]),
+        "cold_start":{
+            mode:cold_starts(args["module"],mode,args["runs"],search)
+            for mode in ("eager","lazy")
+        }
+    }
+    output = json.dumps(report,indent=2)
+    if args["output"] is not None:
+        Path(args["output"]).write_text(output)
+    else:
+        print(output)
+    lazy_import_ms = report["cold_start"]["lazy"]["import_ms"]
+    if args["max_import_ms"] is not None and lazy_import_ms > args["max_import_ms"]:
+        raise SystemExit(f"Cold-start regression: import {lazy_import_ms:.0f}ms > {args['max_import_ms']}ms")
@@ -0,0 +1,166 @@
+from argparse import ArgumentParser
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from timeit import Timer
+from os import environ
+from typing import Callable,Dict,List
+import importlib.util
+import json
+import sys
+
+import numpy as np
+import pyarrow as pa
+
+from stub_embedding import start_stub,endpoint
+
+cur_dir:Path = Path(__file__).parent.absolute()
+
+SRC_DIR = cur_dir.parent.parent/"src"/"python"
+ENCODER_SRC_DIR = cur_dir.parents[2]/"models"/"embedding"/"src"/"lambda"
+
+def per_call_us(fn: Callable,min_seconds: float = 0.2) -> float:
+    timer = Timer(fn)
+    number,_ = timer.autorange()
+    number = max(number,int(number*min_seconds/0.2))
+    return min(timer.repeat(repeat=3,number=number))/number*1e6
+
+def result_table(rows: int,dims: int) -> pa.Table:
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((rows,dims)).astype(np.float32)
+    return pa.table({
+        "id":[f"doc-{i}" for i in range(rows)],
+        "vector":pa.FixedSizeListArray.from_arrays(pa.array(vectors.reshape(-1)),dims),
+        "text":[f"synthetic passage number {i} "*8 for i in range(rows)],
+        "distance":rng.random(rows).astype(np.float32)
+    })
+
+def search_encoders() -> Dict[str,Callable[[pa.Table],bytes]]:
+    from lambda_function.models.db import SearchResponse
+    from lambda_function.utils import dumps,table_rows,json_default
+    return {
+        "pydantic":lambda table: SearchResponse(results=table.to_pylist()).model_dump_json().encode(),
+        "json":lambda table: json.dumps({"results":table.to_pylist()},separators=(",",":"),default=json_default).encode(),
+        "orjson":lambda table: dumps({"results":table_rows(table)})
+    }
+
+def search_report(sizes: List[int],dims: int) -> List[Dict]:
+    encoders = search_encoders()
+    report = []
+    for rows in sizes:
+        for with_vectors in (False,True):
+            table = result_table(rows,dims)
+            if not with_vectors:
+                table = table.drop_columns(["vector"])
+            row = {"rows":rows,"vectors":with_vectors,"bytes":len(encoders["orjson"](table))}
+            for name,encode in encoders.items():
+                row[f"{name}_us"] = per_call_us(lambda: encode(table))
+            report.append(row)
+    return report
+
+def load_embedding_lambda():
+    # by path, the search service already owns the `lambda_function` name
+    sys.path.append(str(ENCODER_SRC_DIR))
+    spec = importlib.util.spec_from_file_location("embedding_lambda",ENCODER_SRC_DIR/"lambda_function.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def embedding_report(batch_sizes: List[int],dims: int) -> List[Dict]:
+    embedding_lambda = load_embedding_lambda()
+    from api import Response
+    report = []
+    for batch in batch_sizes:
+        vecs = np.random.default_rng(0).standard_normal((batch,dims)).astype(np.float32)
+        res_data = {"crid":None,"sentence_embeddings":vecs,"n_tokens":batch*12}
+        report.append({
+            "batch":batch,
+            "pydantic_us":per_call_us(lambda: Response.model_validate({**res_data,"sentence_embeddings":vecs.tolist()}).model_dump_json(exclude_none=True)),
+            "orjson_us":per_call_us(lambda: embedding_lambda.response_body(res_data))
+        })
+    return report
+
+def api_gateway_event(path: str,body: Dict) -> Dict:
+    return {
+        "resource":path,"path":path,"httpMethod":"POST",
+        "headers":{"content-type":"application/json"},"multiValueHeaders":{},
+        "queryStringParameters":None,"multiValueQueryStringParameters":None,
+        "requestContext":{"resourcePath":path,"httpMethod":"POST","path":path,"stage":"v1"},
+        "body":json.dumps(body),"isBase64Encoded":False
+    }
+
+def handler_report(sizes: List[int],dims: int) -> List[Dict]:
+    """Mangum + FastAPI vs the direct /search handler, repeated queries so the result cache isolates the handler."""
+    from lambda_function.db_client import LanceDB
+    from lambda_function.models.db import InitIndexFromData,Text
+    from lambda_function.service import handler,api_handler
+    report = []
+    with TemporaryDirectory() as data_loc:
+        LanceDB(data_loc).init_from_data(InitIndexFromData(
+            data_loc=data_loc,
+            table_name="serialization",
+            bm25_index=True,
+            data=[Text(text=f"synthetic passage number {i} "*8) for i in range(max(sizes))]
+        ))
+        for rows in sizes:
+            for with_vectors in (False,True):
+                event = api_gateway_event("/search",{
+                    "data_loc":data_loc,
+                    "table_name":"serialization",
+                    "query":"synthetic passage",
+                    "search_type":"fts",
+                    "top_n":rows,
+                    "include_vector":with_vectors
+                })
+                assert handler(event,None)["statusCode"] == 200
+                report.append({
+                    "rows":rows,
+                    "vectors":with_vectors,
+                    "mangum_us":per_call_us(lambda: api_handler(event,None)),
+                    "direct_us":per_call_us(lambda: handler(event,None))
+                })
+    return report
+
+def print_table(title: str,rows: List[Dict]) -> None:
+    print(title,file=sys.stderr)
+    columns = list(rows[0])
+    print("  "+" ".join(f"{column:>12}" for column in columns),file=sys.stderr)
+    for row in rows:
+        print("  "+" ".join(f"{row[column]:>12.1f}" if isinstance(row[column],float) else f"{str(row[column]):>12}" for column in columns),file=sys.stderr)
+
+def parse_args() -> Dict[str,str]:
+    parser = ArgumentParser(
+            prog="Serialization",
+            description="Per-response cost of the search and embedding response encoders and of the /search Lambda handler paths"
+        )
+    parser.add_argument("-s","--sizes",type=int,nargs="+",default=[10,100,1000],help="Result rows per response")
+    parser.add_argument("-b","--batch-sizes",type=int,nargs="+",default=[1,32,256],help="Embeddings per model Lambda response")
+    parser.add_argument("--dims",type=int,default=1536,help="Vector dimensions")
+    parser.add_argument("--skip-embedding",action="store_true",help="Don't load the embedding Lambda module")
+    parser.add_argument("-o","--output",type=str,default=None,help="Write the JSON report here instead of stdout")
+    return parser.parse_args().__dict__
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = start_stub(args["dims"])
+    environ.update({
+        "EMBEDDING_API_ENDPOINT":endpoint(server),
+        "EMBEDDING_API_KEY":"benchmark",
+        "MODEL_DIM":str(args["dims"]),
+        "LOG_LEVEL":"WARNING",
+        "EMF_METRICS":"false"
+    })
+    sys.path.append(str(SRC_DIR))
+    report = {
+        "search_response":search_report(args["sizes"],args["dims"]),
+        "handler":handler_report(args["sizes"],args["dims"])
+    }
+    if not args["skip_embedding"]:
+        report["embedding_response"] = embedding_report(args["batch_sizes"],args["dims"])
+    server.shutdown()
+    for name,rows in report.items():
+        print_table(name,rows)
+    output = json.dumps(report,indent=2)
+    if args["output"] is not None:
+        Path(args["output"]).write_text(output)
+    else:
+        print(output)
@@ -0,0 +1,100 @@
+from argparse import ArgumentParser
+from functools import lru_cache
+from hashlib import blake2b
+from http.server import BaseHTTPRequestHandler,ThreadingHTTPServer
+from threading import Thread
+from time import sleep
+from typing import Dict
+import base64
+import json
+
+import numpy as np
+
+@lru_cache(maxsize=65536)
+def word_vector(word: str,dims: int) -> np.ndarray:
+    seed = int.from_bytes(blake2b(word.encode(),digest_size=8).digest(),"little")
+    return np.random.default_rng(seed).standard_normal(dims).astype(np.float32)
+
+def embed(text: str,dims: int) -> np.ndarray:
+    """
+    Deterministic bag-of-words vector: texts sharing words land close together,
+    so ANN and hybrid search behave like they would on real embeddings.
+    """
+    words = [word.strip(".,;:!?\"'()").lower() for word in text.split()]
+    vector = np.zeros(dims,dtype=np.float32)
+    for word in words:
+        if len(word) > 0:
+            vector += word_vector(word,dims)
+    norm = np.linalg.norm(vector)
+    return vector/norm if norm > 0 else vector
+
+class StubEmbeddingHandler(BaseHTTPRequestHandler):
+    """OpenAI /v1/embeddings stand-in, honours encoding_format and dimensions."""
+    dims: int = 1536
+    latency_ms: float = 0.0
+
+    def log_message(self,*args) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["content-length"])))
+        texts = [body["input"]] if isinstance(body["input"],str) else body["input"]
+        dims = body.get("dimensions") or self.dims
+        base64_format = body.get("encoding_format","float") == "base64"
+        data = []
+        for i,text in enumerate(texts):
+            vector = embed(text,dims)
+            data.append({
+                "object":"embedding",
+                "index":i,
+                "embedding":base64.b64encode(vector.tobytes()).decode() if base64_format else vector.tolist()
+            })
+        if self.latency_ms > 0:
+            sleep(self.latency_ms/1000)
+        tokens = sum(len(text)//4 for text in texts)
+        payload = json.dumps({
+            "object":"list",
+            "data":data,
+            "model":body.get("model"),
+            "usage":{"prompt_tokens":tokens,"total_tokens":tokens}
+        }).encode()
+        self.send_response(200)
+        self.send_header("content-type","application/json")
+        self.send_header("content-length",str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+def make_stub(dims: int,latency_ms: float = 0.0,port: int = 0) -> ThreadingHTTPServer:
+    handler = type("Handler",(StubEmbeddingHandler,),{"dims":dims,"latency_ms":latency_ms})
+    server = ThreadingHTTPServer(("127.0.0.1",port),handler)
+    server.daemon_threads = True
+    return server
+
+def start_stub(dims: int,latency_ms: float = 0.0,port: int = 0) -> ThreadingHTTPServer:
+    """Serves the stub on a background thread, port 0 picks a free port."""
+    server = make_stub(dims,latency_ms,port)
+    Thread(target=server.serve_forever,daemon=True).start()
+    return server
+
+def endpoint(server: ThreadingHTTPServer) -> str:
+    host,port = server.server_address[:2]
+    return f"http://{host}:{port}/v1/embeddings"
+
+def parse_args() -> Dict[str,str]:
+    parser = ArgumentParser(
+            prog="StubEmbedding",
+            description="Local stand-in for EMBEDDING_API_ENDPOINT returning deterministic vectors"
+        )
+    parser.add_argument("-p","--port",type=int,default=8765,help="Port to listen on")
+    parser.add_argument("-d","--dims",type=int,default=1536,help="Vector dimensions when the request has none")
+    parser.add_argument("-l","--latency-ms",type=float,default=0.0,help="Simulated provider latency per request")
+    return parser.parse_args().__dict__
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = make_stub(args["dims"],args["latency_ms"],args["port"])
+    print(f"Serving deterministic embeddings on {endpoint(server)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,58 @@
+from sys import path as PYTHONPATH
+from time import sleep
+from threading import Event
+from concurrent.futures import ThreadPoolExecutor
+
+from test_constants import SRC_DIR
+PYTHONPATH.append(str(SRC_DIR))
+
+from lambda_function.cache import LRUCache
+
+def test_lru_eviction():
+    cache = LRUCache(2)
+    cache.put("a",1)
+    cache.put("b",2)
+    cache.get("a")
+    cache.put("c",3)
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() == {"size":2,"hits":3,"misses":0}
+
+def test_ttl_expiry():
+    cache = LRUCache(2,ttl=0.01)
+    cache.put("a",1)
+    sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.misses == 1
+    assert len(cache) == 0
+
+def test_get_or_create():
+    cache = LRUCache(2)
+    calls = []
+    factory = lambda: calls.append(1) or len(calls)
+    assert cache.get_or_create("a",factory) == 1
+    assert cache.get_or_create("a",factory) == 1
+    assert len(calls) == 1
+    assert cache.pop("a") == 1
+    assert cache.get_or_create("a",factory) == 2
+
+def test_get_or_create_does_not_block_other_keys():
+    cache = LRUCache(4)
+    cache.put("cached",0)
+    started,release = Event(),Event()
+    calls = []
+    def slow_factory():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "slow"
+    with ThreadPoolExecutor(3) as pool:
+        slow = [pool.submit(cache.get_or_create,"slow",slow_factory) for _ in range(2)]
+        assert started.wait(5)
+        # a slow open of one key doesn't hold up lookups or creates of others
+        assert pool.submit(cache.get,"cached").result(1) == 0
+        assert cache.get_or_create("other",lambda: "other") == "other"
+        release.set()
+        assert [future.result(5) for future in slow] == ["slow","slow"]
+    assert len(calls) == 1
@@ -0,0 +1,44 @@
+from sys import path as PYTHONPATH
+
+from test_constants import SRC_DIR
+PYTHONPATH.append(str(SRC_DIR))
+
+from lambda_function.chunking import windows,speaker_turns,chunk_document
+from lambda_function.ingest import estimate_tokens
+from lambda_function.models.db import Document
+
+def test_windows_overlap():
+    units = [f"sentence {i:02d}." for i in range(10)]
+    # each unit is ~4 tokens
+    chunks = list(windows(units,12,4," "))
+    assert chunks[0] == "sentence 00. sentence 01. sentence 02."
+    assert chunks[1] == "sentence 02. sentence 03. sentence 04."
+    assert chunks[-1].endswith("sentence 09.")
+    assert all(estimate_tokens(chunk) <= 12 for chunk in chunks)
+
+def test_speaker_turns():
+    transcript = "\n".join([
+        "[00:00:01] Alice: Hi there.",
+        "Bob: Hello.",
+        "still Bob talking",
+        "[01:02] Alice: Bye."
+    ])
+    assert list(speaker_turns(transcript)) == [
+        ("Alice: ","Hi there."),
+        ("Bob: ","Hello. still Bob talking"),
+        ("Alice: ","Bye.")
+    ]
+
+def test_chunk_document_keeps_speakers_and_metadata():
+    doc = Document(
+        id="ep1",
+        format="transcript",
+        text="Alice: "+" ".join(f"Point number {i}." for i in range(20)),
+        metadata={"episode":"one"}
+    )
+    chunks = list(chunk_document(doc,chunk_tokens=32,overlap_tokens=8))
+    assert [chunk.id for chunk in chunks] == [f"ep1:{i}" for i in range(len(chunks))]
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert all(line.startswith("Alice: ") for line in chunk.text.split("\n"))
+        assert chunk.metadata == {"episode":"one"}
@@ -0,0 +1,37 @@
+from sys import path as PYTHONPATH
+
+import numpy as np
+from test_constants import SRC_DIR
+PYTHONPATH.append(str(SRC_DIR))
+
+from lambda_function.embedding_cache import EmbeddingCache
+
+def test_memory_tier():
+    cache = EmbeddingCache("model",3,2)
+    assert cache.get("what is  the hypotenuse?") is None
+    cache.put("what is the hypotenuse?",[0.1,0.2,0.3])
+    assert cache.get(" what is  the hypotenuse? ").tolist() == np.array([0.1,0.2,0.3],dtype=np.float32).tolist()
+    assert cache.key("hi") != EmbeddingCache("model",4,2).key("hi")
+    assert cache.stats() == {"size":1,"memory_hits":1,"disk_hits":0,"misses":1}
+
+def test_disk_tier(tmp_path):
+    cache = EmbeddingCache("org/model",3,1,cache_dir=str(tmp_path),disk_slots=8)
+    cache.put("a",[1.0,2.0,3.0])
+    cache.put("b",[4.0,5.0,6.0])
+    # "a" was evicted from memory, it comes back from the mmap store
+    assert cache.get("a").tolist() == [1.0,2.0,3.0]
+    assert cache.disk_hits == 1
+    reopened = EmbeddingCache("org/model",3,1,cache_dir=str(tmp_path),disk_slots=8)
+    assert reopened.get("b").tolist() == [4.0,5.0,6.0]
+    assert reopened.get("c") is None
+
+def test_reopened_tables_share_cache_and_transport(tmp_path):
+    import lancedb
+    from lambda_function.db_client import LanceDB,table_embedding_function
+    from lambda_function.models.db import InitIndexFromData,Text
+    data_loc = str(tmp_path)
+    LanceDB(data_loc).init_from_data(InitIndexFromData(data_loc=data_loc,table_name="t",bm25_index=False,data=[Text(text="shared")]))
+    first,second = [table_embedding_function(lancedb.connect(data_loc).open_table("t")) for _ in range(2)]
+    assert first is not second
+    assert first._cache is second._cache
+    assert first._transport is second._transport
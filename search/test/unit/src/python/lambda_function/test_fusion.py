@@ -0,0 +1,36 @@
+from sys import path as PYTHONPATH
+
+from test_constants import SRC_DIR
+PYTHONPATH.append(str(SRC_DIR))
+
+from lambda_function.fusion import reciprocal_rank_fusion,weighted_score_fusion
+
+VECTOR_ROWS = [
+    {"_rowid":1,"text":"a","_distance":0.1},
+    {"_rowid":2,"text":"b","_distance":0.5},
+    {"_rowid":3,"text":"c","_distance":0.9}
+]
+FTS_ROWS = [
+    {"_rowid":3,"text":"c","_score":4.0},
+    {"_rowid":2,"text":"b","_score":2.0}
+]
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([VECTOR_ROWS,FTS_ROWS],k=60)
+    assert [row["_rowid"] for row in fused] == [3,2,1]
+    assert fused[1]["_relevance_score"] == 1/62+1/62
+
+def test_weighted_score_fusion():
+    fused = weighted_score_fusion(VECTOR_ROWS,FTS_ROWS,vector_weight=1.0)
+    assert [row["_rowid"] for row in fused][0] == 1
+    fused = weighted_score_fusion(VECTOR_ROWS,FTS_ROWS,vector_weight=0.0)
+    assert [row["_rowid"] for row in fused][0] == 3
+    assert weighted_score_fusion([],FTS_ROWS)[0]["_rowid"] == 3
+
+def test_weighted_score_fusion_degenerate_ranges():
+    # a single hit (or hits tied on distance) gets full vector similarity, not zero
+    fused = weighted_score_fusion([{"_rowid":1,"text":"a","_distance":0.3}],[{"_rowid":2,"text":"b","_score":1.0}],vector_weight=0.9)
+    assert [(row["_rowid"],round(row["_relevance_score"],6)) for row in fused] == [(1,0.9),(2,0.1)]
+    tied = [{"_rowid":1,"text":"a","_distance":0.3},{"_rowid":2,"text":"b","_distance":0.3}]
+    fused = weighted_score_fusion(tied,[{"_rowid":3,"text":"c","_score":1.0}],vector_weight=0.9)
+    assert [(row["_rowid"],round(row["_relevance_score"],6)) for row in fused] == [(1,0.9),(2,0.9),(3,0.1)]
@@ -0,0 +1,24 @@
+from sys import path as PYTHONPATH
+from time import sleep
+
+from test_constants import SRC_DIR
+PYTHONPATH.append(str(SRC_DIR))
+
+from lambda_function.ingest import token_batches,embed_batches
+
+def test_token_batches():
+    texts = ["a"*40]*5
+    # each text is ~11 tokens
+    assert [len(b) for b in token_batches(texts,max_tokens=25,max_items=10)] == [2,2,1]
+    assert [len(b) for b in token_batches(texts,max_tokens=1000,max_items=3)] == [3,2]
+    # oversized texts still get their own batch
+    assert [len(b) for b in token_batches(["a"*400],max_tokens=10)] == [1]
+
+def test_embed_batches_keeps_order():
+    def embed(texts):
+        sleep(0.01*(5-len(texts[0])))
+        return [[float(len(t))] for t in texts]
+    batches = [["x"*i] for i in range(1,5)]
+    results = list(embed_batches(batches,embed,concurrency=3))
+    assert [texts for texts,_ in results] == batches
+    assert [vectors for _,vectors in results] == [[[1.0]],[[2.0]],[[3.0]],[[4.0]]]
@@ -0,0 +1,31 @@
+from sys import path as PYTHONPATH
+import pytest
+
+from test_constants import SRC_DIR
+PYTHONPATH.append(str(SRC_DIR))
+
+from lambda_function import local_embedding
+
+def test_local_provider_fails_clearly_when_not_set_up(tmp_path,monkeypatch):
+    with pytest.raises(ValueError,match="LOCAL_MODEL_PATH"):
+        local_embedding.check_local_provider(None,"torch")
+    monkeypatch.setattr(local_embedding,"BACKEND_PACKAGES",{"torch":["not_an_installed_runtime"]})
+    with pytest.raises(ValueError,match="not_an_installed_runtime installed"):
+        local_embedding.check_local_provider(str(tmp_path),"torch")
+    monkeypatch.setattr(local_embedding,"ENCODER_SRC_DIR",str(tmp_path))
+    with pytest.raises(ValueError,match="encoder_service module"):
+        local_embedding.check_local_provider(str(tmp_path),"torch")
+
+def test_installed_encoder_module_is_preferred(tmp_path,monkeypatch):
+    # the search image's local target installs the encoder as a module, there is no checkout to import from
+    (tmp_path/"installed_encoder.py").write_text("EncoderService = 'installed'\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(local_embedding,"ENCODER_MODULE","installed_encoder")
+    monkeypatch.setattr(local_embedding,"ENCODER_SRC_DIR",str(tmp_path/"missing"))
+    monkeypatch.setattr(local_embedding,"BACKEND_PACKAGES",{})
+    local_embedding.load_model_service.cache_clear()
+    try:
+        local_embedding.check_local_provider(str(tmp_path),"onnx")
+        assert local_embedding.load_encoder_service() == "installed"
+    finally:
+        local_embedding.load_model_service.cache_clear()
@@ -0,0 +1,60 @@
+from sys import path as PYTHONPATH
+
+from test_constants import SRC_DIR
+PYTHONPATH.append(str(SRC_DIR))
+
+from lambda_function import db_client
+from lambda_function.db_client import LanceDB
+from lambda_function.models.db import (
+    InitIndexFromData,
+    Metric,
+    UpsertRequest,
+    MaintenanceRequest,
+    SearchIndexRequest,
+    Text
+)
+
+def test_maintain(tmp_path):
+    data_loc = str(tmp_path)
+    db = LanceDB(data_loc)
+    db.init_from_data(InitIndexFromData(data_loc=data_loc,table_name="test",bm25_index=True,data=[Text(id="a",text="hi I am Harris")]))
+    for i in range(3):
+        db.upsert(UpsertRequest(data_loc=data_loc,table_name="test",data=[Text(id=str(i),text=f"zebra number {i}")]))
+    db.delete(["0"])
+
+    stats = db.maintain(MaintenanceRequest(data_loc=data_loc,table_name="test",retention_hours=0))
+    assert stats.before.fragments > stats.after.fragments == 1
+    assert stats.after.versions == 1
+    assert stats.after.rows == stats.before.rows == 3
+    assert stats.after.bytes < stats.before.bytes
+    results = db.search(SearchIndexRequest(data_loc=data_loc,table_name="test",query="zebra",search_type="fts"))
+    assert sorted(results["id"].to_pylist()) == ["1","2"]
+
+def test_vector_index_built_once_table_grows(tmp_path,monkeypatch):
+    monkeypatch.setattr(db_client,"VECTOR_INDEX_MIN_ROWS",300)
+    data_loc = str(tmp_path)
+    db = LanceDB(data_loc)
+    db.init_from_data(InitIndexFromData(
+        data_loc=data_loc,
+        table_name="test",
+        bm25_index=False,
+        metric="cosine",
+        num_partitions=2,
+        metadata_fields=[{"name":"tenant","index":"BITMAP"}],
+        data=[Text(id="a",text="hi I am Harris",metadata={"tenant":"a"})]
+    ))
+    table = db_client.get_table(data_loc,"test")
+    assert db_client.vector_index_config(table).metric == Metric.COSINE
+    assert [index["type"] for index in table.to_lance().list_indices()] == ["Bitmap"]
+
+    # the scalar index is optimized on every refresh, that must not stand in for the missing ANN index
+    db.upsert(UpsertRequest(data_loc=data_loc,table_name="test",data=[Text(id=str(i),text=f"zebra number {i}",metadata={"tenant":"ab"[i%2]}) for i in range(300)]))
+    indices = db_client.get_table(data_loc,"test").to_lance().list_indices()
+    assert sorted(index["type"] for index in indices) == ["Bitmap","IVF_PQ"]
+    results = db.search(SearchIndexRequest(data_loc=data_loc,table_name="test",query="zebra",top_n=300,where="tenant = 'b'"))
+    assert len(results) == 150
+    # the stored metric is the search default
+    results = db.search(SearchIndexRequest(data_loc=data_loc,table_name="test",query="zebra number 7",top_n=5))
+    cosine = db.search(SearchIndexRequest(data_loc=data_loc,table_name="test",query="zebra number 7",top_n=5,metric="cosine"))
+    assert results["distance"].to_pylist() == cosine["distance"].to_pylist()
+    assert db_client.vector_index_config(db_client.get_table(data_loc,"test")).metric == Metric.COSINE
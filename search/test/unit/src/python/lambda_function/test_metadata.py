@@ -0,0 +1,84 @@
+from sys import path as PYTHONPATH
+import pytest
+from fastapi.exceptions import HTTPException
+
+from test_constants import SRC_DIR
+PYTHONPATH.append(str(SRC_DIR))
+
+from lambda_function.db_client import LanceDB
+from lambda_function.models.db import (
+    InitIndexFromData,
+    SearchIndexRequest,
+    UpsertRequest,
+    Text
+)
+
+def test_prefiltered_search(tmp_path):
+    data_loc = str(tmp_path)
+    db = LanceDB(data_loc,"test")
+    db.init_from_data(InitIndexFromData(
+        data_loc=data_loc,
+        table_name="test",
+        bm25_index=True,
+        metadata_fields=[
+            {"name":"tenant","index":"BITMAP"},
+            {"name":"year","type":"int","index":"BTREE"},
+            {"name":"published","type":"timestamp"}
+        ],
+        data=[
+            Text(text=f"document number {i}",metadata={"tenant":"ab"[i%2],"year":2000+i,"published":f"2024-01-{1+i:02d}T00:00:00"})
+            for i in range(20)
+        ]
+    ))
+    indices = {index["name"]:index["type"] for index in db._table.to_lance().list_indices()}
+    assert indices["tenant_idx"] == "Bitmap"
+    assert indices["year_idx"] == "BTree"
+
+    where = "tenant = 'b' AND year >= 2010"
+    for search_type in ("vector","hybrid"):
+        results = db.search(SearchIndexRequest(data_loc=data_loc,table_name="test",query="document",top_n=20,search_type=search_type,where=where))
+        assert sorted(results["year"].to_pylist()) == list(range(2011,2020,2))
+        assert set(results["tenant"].to_pylist()) == {"b"}
+    results = db.search(SearchIndexRequest(data_loc=data_loc,table_name="test",query="document",where="published < timestamp '2024-01-03 00:00:00'"))
+    assert sorted(results["year"].to_pylist()) == [2000,2001]
+
+def test_upsert_metadata_only_change(tmp_path):
+    data_loc = str(tmp_path)
+    db = LanceDB(data_loc,"test")
+    metadata = {"tenant":"a","published":"2024-01-01T00:00:00"}
+    db.init_from_data(InitIndexFromData(
+        data_loc=data_loc,
+        table_name="test",
+        bm25_index=True,
+        metadata_fields=[{"name":"tenant","index":"BITMAP"},{"name":"published","type":"timestamp"}],
+        data=[Text(id=str(i),text=f"document number {i}",metadata=metadata) for i in range(3)]
+    ))
+    vectors = db._table.to_arrow().sort_by("id")["vector"].to_pylist()
+    stats = db.upsert(UpsertRequest(data_loc=data_loc,table_name="test",data=[
+        Text(id="0",text="document number 0",metadata=metadata),
+        Text(id="1",text="document number 1",metadata={**metadata,"tenant":"b"})
+    ]))
+    assert (stats.inserted,stats.updated,stats.metadata_updated,stats.unchanged) == (0,0,1,1)
+    assert stats.ingest.rows == 0
+    rows = db._table.to_arrow().sort_by("id")
+    assert rows["tenant"].to_pylist() == ["a","b","a"]
+    assert rows["vector"].to_pylist() == vectors
+    results = db.search(SearchIndexRequest(data_loc=data_loc,table_name="test",query="document",search_type="fts",where="tenant = 'b'"))
+    assert results["id"].to_pylist() == ["1"]
+
+def test_invalid_filter_is_a_client_error(tmp_path):
+    from lambda_function.service import search_table
+    data_loc = str(tmp_path)
+    LanceDB(data_loc).init_from_data(InitIndexFromData(
+        data_loc=data_loc,
+        table_name="test",
+        bm25_index=True,
+        metadata_fields=[{"name":"year","type":"int"}],
+        data=[Text(text=f"document number {i}",metadata={"year":2000+i}) for i in range(5)]
+    ))
+    for search_type in ("vector","fts","hybrid"):
+        for where in ("missing = 1","year >=","year >= 'soon'"):
+            with pytest.raises(HTTPException) as e:
+                search_table(SearchIndexRequest(data_loc=data_loc,table_name="test",query="document",search_type=search_type,where=where))
+            assert e.value.status_code == 400
+            assert e.value.detail.startswith(f"Invalid where filter `{where}`") and "/rust/" not in e.value.detail
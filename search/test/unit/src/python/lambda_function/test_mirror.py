@@ -0,0 +1,56 @@
+from sys import path as PYTHONPATH
+from pathlib import Path
+
+from test_constants import SRC_DIR
+PYTHONPATH.append(str(SRC_DIR))
+
+import lancedb
+from lambda_function.db_client import LanceDB
+from lambda_function.mirror import TableMirror,latest_manifest
+from lambda_function.models.db import InitIndexFromData,UpsertRequest,Text
+
+def init_table(data_loc: str,table_name: str) -> LanceDB:
+    db = LanceDB(data_loc,table_name)
+    db.init_from_data(InitIndexFromData(
+        data_loc=data_loc,
+        table_name=table_name,
+        bm25_index=True,
+        data=[Text(id="a",text="hi I am Harris"),Text(id="b",text="zebras have stripes")]
+    ))
+    return db
+
+def test_latest_manifest():
+    assert latest_manifest(["2.manifest","10.manifest","1.manifest"]) == "10.manifest"
+    assert latest_manifest(["18446744073709551613.manifest","18446744073709551614.manifest"]) == "18446744073709551613.manifest"
+    assert latest_manifest(["_latest.manifest"]) is None
+
+def test_mirror_syncs_on_version_change(tmp_path):
+    remote = str(tmp_path/"remote")
+    db = init_table(remote,"test")
+    mirror = TableMirror(root=str(tmp_path/"mirror"),max_bytes=1024**3,check_interval=0)
+
+    local_loc,changed = mirror.mirror(f"file://{remote}","test")
+    assert changed
+    assert lancedb.connect(local_loc).open_table("test").count_rows() == 2
+    assert mirror.mirror(f"file://{remote}","test") == (local_loc,False)
+
+    db.upsert(UpsertRequest(data_loc=remote,table_name="test",data=[Text(id="c",text="giraffes are tall")]))
+    local_loc,changed = mirror.mirror(f"file://{remote}","test")
+    assert changed
+    assert lancedb.connect(local_loc).open_table("test").count_rows() == 3
+    assert len(list((Path(local_loc)/"test.lance"/"_versions").iterdir())) == 1
+
+def test_mirror_size_cap_and_eviction(tmp_path):
+    remote = str(tmp_path/"remote")
+    init_table(remote,"one")
+    init_table(remote,"two")
+    mirror = TableMirror(root=str(tmp_path/"mirror"),max_bytes=1,check_interval=0)
+    assert mirror.mirror(f"file://{remote}","one") is None
+
+    mirror = TableMirror(root=str(tmp_path/"mirror"),max_bytes=1024**3,check_interval=0)
+    local_loc,_ = mirror.mirror(f"file://{remote}","one")
+    one_bytes = mirror._tables[(f"file://{remote}","one")].bytes
+    mirror.max_bytes = one_bytes+one_bytes//2
+    mirror.mirror(f"file://{remote}","two")
+    assert (f"file://{remote}","one") not in mirror._tables
+    assert not (Path(local_loc)/"one.lance").exists()
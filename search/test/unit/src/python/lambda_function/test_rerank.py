@@ -0,0 +1,35 @@
+from sys import path as PYTHONPATH
+
+from test_constants import SRC_DIR
+PYTHONPATH.append(str(SRC_DIR))
+
+import numpy as np
+import pyarrow as pa
+import lambda_function.rerank as rerank_module
+from lambda_function.rerank import rerank
+from lambda_function.models.db import SearchIndexRequest
+
+class FixedScores:
+    def __init__(self,scores):
+        self.scores = scores
+
+    def score(self,query,passages,budget_ms):
+        return self.scores
+
+def candidates() -> pa.Table:
+    return pa.table({"text":["a","b","c","d"],"distance":[0.1,0.2,0.3,0.4]})
+
+def request() -> SearchIndexRequest:
+    return SearchIndexRequest(data_loc="",table_name="",query="q",top_n=3,rerank=True)
+
+def test_rerank_orders_by_score(monkeypatch):
+    monkeypatch.setattr(rerank_module,"get_reranker",lambda: FixedScores(np.array([0.1,0.9,np.nan,0.5],dtype=np.float32)))
+    results = rerank(request(),candidates())
+    assert results["text"].to_pylist() == ["b","d","a"]
+    assert results["rerank_score"].to_pylist() == [np.float32(0.9),np.float32(0.5),np.float32(0.1)]
+
+def test_rerank_keeps_first_stage_order_without_scores(monkeypatch):
+    monkeypatch.setattr(rerank_module,"get_reranker",lambda: FixedScores(None))
+    results = rerank(request(),candidates())
+    assert results["text"].to_pylist() == ["a","b","c"]
+    assert "rerank_score" not in results.column_names
@@ -0,0 +1,55 @@
+from sys import path as PYTHONPATH
+
+from test_constants import SRC_DIR
+PYTHONPATH.append(str(SRC_DIR))
+
+import lancedb
+import pyarrow as pa
+from lambda_function.db_client import LanceDB,get_table
+from lambda_function.result_cache import RESULT_CACHE,ResultCache,result_key,table_state
+from lambda_function.models.db import InitIndexFromData,SearchIndexRequest,UpsertRequest,Text
+
+def test_results_follow_table_version(tmp_path):
+    data_loc = str(tmp_path)
+    LanceDB(data_loc).init_from_data(InitIndexFromData(
+        data_loc=data_loc,
+        table_name="cached",
+        bm25_index=True,
+        data=[Text(id=str(i),text=f"cached answer {i}") for i in range(5)]
+    ))
+    db = LanceDB(data_loc,"cached")
+    req = SearchIndexRequest(data_loc=data_loc,table_name="cached",query="answer",top_n=10,search_type="fts")
+    first = db.search(req)
+    old = get_table(data_loc,"cached")
+    old_version,old_state = old.version,table_state(old)
+    assert db.search(req) is first
+    assert db.search(req.model_copy(update={"top_n":2})) is not first
+    db.upsert(UpsertRequest(data_loc=data_loc,table_name="cached",data=[Text(id="new",text="fresh answer")]))
+    assert "fresh answer" in db.search(req)["text"].to_pylist()
+
+    db.drop_table("cached")
+    LanceDB(data_loc).init_from_data(InitIndexFromData(
+        data_loc=data_loc,
+        table_name="cached",
+        bm25_index=True,
+        data=[Text(id=str(i),text=f"recreated answer {i}") for i in range(5)]
+    ))
+    assert all(text.startswith("recreated") for text in LanceDB(data_loc,"cached").search(req)["text"].to_pylist())
+    # same version number, but instances that never saw the drop still can't hit the old results
+    new = get_table(data_loc,"cached")
+    assert new.version == old_version and table_state(new) != old_state
+    # while other instances (their own handles) share its entries
+    reopened = [lancedb.connect(data_loc).open_table("cached") for _ in range(8)]
+    assert {table_state(table) for table in reopened} == {table_state(new)}
+
+def test_disk_tier(tmp_path):
+    req = SearchIndexRequest(data_loc="loc",table_name="t",query="q")
+    key = result_key("loc","t","state-3",req)
+    table = pa.table({"text":["a","b"],"score":[1.0,0.5]})
+    ResultCache(8,1024**2,str(tmp_path)).put(key,table)
+    # a new execution environment's memory tier is empty, /tmp still has the result
+    cache = ResultCache(8,1024**2,str(tmp_path))
+    assert cache.get(key).equals(table)
+    assert cache.get(result_key("loc","t","state-4",req)) is None
+    cache.invalidate("loc","t")
+    assert ResultCache(8,1024**2,str(tmp_path)).get(key) is None
@@ -0,0 +1,70 @@
+from sys import path as PYTHONPATH
+import json
+import pytest
+from pydantic import ValidationError
+
+from test_constants import SRC_DIR
+PYTHONPATH.append(str(SRC_DIR))
+
+from lambda_function.db_client import LanceDB
+from lambda_function.models.db import (
+    InitIndexFromData,
+    SearchBatchRequest,
+    Text
+)
+
+def test_search_batch_matches_single_searches(tmp_path):
+    data_loc = str(tmp_path)
+    db = LanceDB(data_loc,"test")
+    db.init_from_data(InitIndexFromData(
+        data_loc=data_loc,
+        table_name="test",
+        bm25_index=True,
+        data=[Text(text=f"document number {i}") for i in range(20)]
+    ))
+    batch_req = SearchBatchRequest(
+        data_loc=data_loc,
+        table_name="test",
+        top_n=3,
+        search_type="hybrid",
+        queries=[
+            {"query":"document number 4"},
+            {"query":"document number 7","search_type":"fts","top_n":1},
+            {"query":"document number 9","search_type":"vector"}
+        ]
+    )
+    requests = batch_req.requests()
+    assert [(r.search_type.value,r.top_n) for r in requests] == [("hybrid",3),("fts",1),("vector",3)]
+    results = db.search_batch(batch_req)
+    assert [len(result) for result in results] == [3,1,3]
+    for req,result in zip(requests,results):
+        assert result.to_pylist() == db.search(req).to_pylist()
+
+def test_non_positive_top_n_is_rejected():
+    from lambda_function.service import search_event
+    for top_n in (0,-1):
+        status_code,content = search_event(json.dumps({"data_loc":"loc","table_name":"t","query":"q","top_n":top_n}))
+        assert status_code == 422
+        assert json.loads(content)["detail"][0]["loc"] == ["body","top_n"]
+        with pytest.raises(ValidationError):
+            SearchBatchRequest(data_loc="loc",table_name="t",queries=[{"query":"q","top_n":top_n}])
+
+def test_full_text_search_without_bm25_index_is_a_client_error(tmp_path):
+    from fastapi.exceptions import HTTPException
+    from lambda_function.service import search_table,search_table_batch
+    from lambda_function.models.db import SearchIndexRequest
+    data_loc = str(tmp_path)
+    LanceDB(data_loc).init_from_data(InitIndexFromData(
+        data_loc=data_loc,
+        table_name="test",
+        bm25_index=False,
+        data=[Text(text=f"document number {i}") for i in range(5)]
+    ))
+    for search_type in ("fts","hybrid"):
+        with pytest.raises(HTTPException) as e:
+            search_table(SearchIndexRequest(data_loc=data_loc,table_name="test",query="document",search_type=search_type))
+        assert e.value.status_code == 400 and "bm25_index" in e.value.detail
+        with pytest.raises(HTTPException) as e:
+            search_table_batch(SearchBatchRequest(data_loc=data_loc,table_name="test",queries=[{"query":"document","search_type":search_type}]))
+        assert e.value.status_code == 400
+    assert len(search_table(SearchIndexRequest(data_loc=data_loc,table_name="test",query="document",search_type="vector")).body) > 0
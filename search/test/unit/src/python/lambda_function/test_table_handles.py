@@ -0,0 +1,50 @@
+from sys import path as PYTHONPATH
+import pytest
+
+from test_constants import SRC_DIR
+PYTHONPATH.append(str(SRC_DIR))
+
+from lambda_function.db_client import LanceDB,_TABLES
+from lambda_function.result_cache import RESULT_CACHE
+from lambda_function.models.db import InitIndexFromData,SearchIndexRequest,Text
+
+def init_table(data_loc: str,prefix: str) -> None:
+    LanceDB(data_loc).init_from_data(InitIndexFromData(
+        data_loc=data_loc,
+        table_name="handles",
+        bm25_index=True,
+        data=[Text(id=str(i),text=f"{prefix} answer {i}") for i in range(5)]
+    ))
+
+def test_search_reopens_table_recreated_elsewhere(tmp_path):
+    data_loc = str(tmp_path)
+    init_table(data_loc,"original")
+    req = SearchIndexRequest(data_loc=data_loc,table_name="handles",query="answer",top_n=10,search_type="fts")
+    LanceDB(data_loc,"handles").search(req)
+    stale = _TABLES.get((data_loc,"handles"))
+    LanceDB(data_loc).drop_table("handles")
+    init_table(data_loc,"recreated")
+    # this instance never saw the recreate, its handle is at the same version number
+    _TABLES.put((data_loc,"handles"),stale)
+    RESULT_CACHE.clear()
+    assert stale.version == _TABLES.get((data_loc,"handles")).version
+    texts = LanceDB(data_loc,"handles").search(req)["text"].to_pylist()
+    assert len(texts) == 5 and all(text.startswith("recreated") for text in texts)
+    assert _TABLES.get((data_loc,"handles")) is not stale
+
+def test_query_errors_do_not_reopen_the_table(tmp_path,monkeypatch):
+    data_loc = str(tmp_path)
+    init_table(data_loc,"original")
+    db = LanceDB(data_loc,"handles")
+    db.search(SearchIndexRequest(data_loc=data_loc,table_name="handles",query="answer"))
+    warm = _TABLES.get((data_loc,"handles"))
+    searches = []
+    def failing_search(table,req,vector=None):
+        searches.append(table)
+        raise ValueError("Invalid user input: query error")
+    monkeypatch.setattr(db,"_search",failing_search)
+    RESULT_CACHE.clear()
+    with pytest.raises(ValueError):
+        db.search(SearchIndexRequest(data_loc=data_loc,table_name="handles",query="answer"))
+    assert searches == [warm]
+    assert _TABLES.get((data_loc,"handles")) is warm
@@ -0,0 +1,35 @@
+from sys import path as PYTHONPATH
+from concurrent.futures import ThreadPoolExecutor
+
+from test_constants import SRC_DIR
+PYTHONPATH.append(str(SRC_DIR))
+
+from lambda_function.timing import request_timings,span,bind,record_upstream,current
+
+def leg(name: str) -> bool:
+    with span(name):
+        return current() is not None
+
+def test_spans_cross_threads_and_upstream_timings():
+    with request_timings() as timings:
+        with span("embed"):
+            record_upstream("embed",{"server-timing":"tokenize;dur=1.5, model;desc=\"gpu\";dur=12","openai-processing-ms":"20"})
+        with ThreadPoolExecutor(2) as pool:
+            assert all(pool.map(bind(leg),["vector","fts"]))
+            assert not any(pool.map(leg,["unbound"]))
+    assert timings.spans["embed.tokenize"] == 1.5
+    assert timings.spans["embed.model"] == 12.0
+    assert timings.spans["embed.upstream"] == 20.0
+    assert set(timings.spans) == {"embed.tokenize","embed.model","embed.upstream","embed","vector","fts","total"}
+    assert current() is None
+    assert timings.server_timing().startswith("embed.tokenize;dur=1.5,embed.model;dur=12.0")
+
+def test_emf_document():
+    with request_timings() as timings:
+        with span("vector"):
+            pass
+    emf = timings.emf("/search",200)
+    metrics = emf["_aws"]["CloudWatchMetrics"][0]
+    assert metrics["Dimensions"] == [["route"]]
+    assert [metric["Name"] for metric in metrics["Metrics"]] == ["vector","total"]
+    assert emf["route"] == "/search" and emf["vector"] >= 0
@@ -0,0 +1,40 @@
+from sys import path as PYTHONPATH
+
+import httpx
+from test_constants import SRC_DIR
+PYTHONPATH.append(str(SRC_DIR))
+
+from lambda_function.transport import AsyncHttpTransport,RateLimiter,parse_duration
+
+def test_parse_duration():
+    assert parse_duration("2") == 2.0
+    assert parse_duration("6m0s") == 360.0
+    assert parse_duration("1.5s") == 1.5
+    assert parse_duration("20ms") == 0.02
+    assert parse_duration(None) is None
+    assert parse_duration("soon") is None
+
+def test_rate_limiter_pauses_on_low_remaining():
+    limiter = RateLimiter()
+    limiter.update({"x-ratelimit-remaining-requests":"10","x-ratelimit-reset-requests":"5s"})
+    assert limiter._resume_at == 0.0
+    limiter.update({"x-ratelimit-remaining-tokens":"0","x-ratelimit-reset-tokens":"20ms"})
+    assert limiter._resume_at > 0.0
+
+def test_retries_throttled_requests():
+    calls = []
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(429,headers={"retry-after":"0.01"})
+        return httpx.Response(200,json={"ok":True})
+    transport = AsyncHttpTransport({},max_retries=3,backoff_base=0.001)
+    transport._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    response = transport.post_sync("http://embeddings",{"input":"hi"})
+    assert response.status_code == 200
+    assert len(calls) == 3
+
+def test_gives_up_after_max_retries():
+    transport = AsyncHttpTransport({},max_retries=1,backoff_base=0.001)
+    transport._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(503)))
+    assert transport.post_sync("http://embeddings",{}).status_code == 503
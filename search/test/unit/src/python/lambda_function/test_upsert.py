@@ -0,0 +1,66 @@
+from sys import path as PYTHONPATH
+
+from test_constants import SRC_DIR
+PYTHONPATH.append(str(SRC_DIR))
+
+from lambda_function.db_client import LanceDB
+from lambda_function.ingest import document_id
+from lambda_function.models.db import (
+    InitIndexFromData,
+    UpsertRequest,
+    SearchIndexRequest,
+    Text
+)
+
+def test_upsert_and_delete(tmp_path):
+    data_loc = str(tmp_path)
+    db = LanceDB(data_loc)
+    db.init_from_data(InitIndexFromData(
+        data_loc=data_loc,
+        table_name="test",
+        bm25_index=True,
+        data=[Text(id="a",text="hi I am Harris"),Text(text="the hypotenuse is the longest side")]
+    ))
+    stats = db.upsert(UpsertRequest(
+        data_loc=data_loc,
+        table_name="test",
+        data=[
+            Text(id="a",text="hi I am Harris"),
+            Text(id="b",text="zebras have stripes"),
+            Text(text="the hypotenuse is the longest side")
+        ]
+    ))
+    assert (stats.inserted,stats.updated,stats.unchanged) == (1,0,2)
+    assert stats.ingest.rows == 1
+
+    stats = db.upsert(UpsertRequest(data_loc=data_loc,table_name="test",data=[Text(id="a",text="giraffes are tall")]))
+    assert (stats.inserted,stats.updated,stats.unchanged) == (0,1,0)
+    results = db.search(SearchIndexRequest(data_loc=data_loc,table_name="test",query="giraffes",search_type="fts"))
+    assert results["id"].to_pylist() == ["a"]
+
+    assert db.delete(["a",document_id("the hypotenuse is the longest side"),"missing"]) == 2
+    results = db.search(SearchIndexRequest(data_loc=data_loc,table_name="test",query="stripes"))
+    assert results["id"].to_pylist() == ["b"]
+
+def test_init_keeps_ids_unique(tmp_path):
+    data_loc = str(tmp_path)
+    db = LanceDB(data_loc,"test")
+    stats = db.init_from_data(InitIndexFromData(
+        data_loc=data_loc,
+        table_name="test",
+        bm25_index=True,
+        data=[
+            Text(id="a",text="first version of a"),
+            Text(text="repeated text"),
+            Text(id="a",text="second version of a"),
+            Text(text="repeated text")
+        ]
+    ))
+    assert stats.rows == 2
+    rows = {row["id"]:row["text"] for row in db._table.to_arrow().select(["id","text"]).to_pylist()}
+    # last write wins, as in upsert
+    assert rows == {"a":"second version of a",document_id("repeated text"):"repeated text"}
+
+    stats = db.upsert(UpsertRequest(data_loc=data_loc,table_name="test",data=[Text(id="a",text="third version of a")]))
+    assert (stats.inserted,stats.updated) == (0,1)
+    assert db._table.count_rows("id = 'a'") == 1
@@ -1,13 +1,28 @@
 from sys import path as PYTHONPATH
+from datetime import date
 from typing import List
 
+import orjson
+import pyarrow as pa
+
 from test_constants import SRC_DIR
 PYTHONPATH.append(str(SRC_DIR))
 
-from lambda_function.utils import full_traceback_str
+from lambda_function.utils import full_traceback_str,dumps,table_rows
 
 def test_full_traceback_str():
     try:
         raise Exception("This is a fake error")
     except Exception as e:
-        tbs = full_traceback_str(e)
\ No newline at end of file
+        tbs = full_traceback_str(e)
+
+def test_table_rows_dumps():
+    table = pa.table({
+        "vector":pa.FixedSizeListArray.from_arrays(pa.array([0.5,1.0,-2.0,0.25],type=pa.float16()),2),
+        "text":["a","b"],
+        "created":[date(2024,1,2),None]
+    })
+    assert orjson.loads(dumps({"results":table_rows(table)})) == {"results":[
+        {"vector":[0.5,1.0],"text":"a","created":"2024-01-02"},
+        {"vector":[-2.0,0.25],"text":"b","created":None}
+    ]}
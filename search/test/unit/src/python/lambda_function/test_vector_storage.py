@@ -0,0 +1,41 @@
+from sys import path as PYTHONPATH
+
+from test_constants import SRC_DIR
+PYTHONPATH.append(str(SRC_DIR))
+
+import numpy as np
+import pyarrow as pa
+from lambda_function.db_client import LanceDB
+from lambda_function.embedding_client import EmbeddingClient,EMBEDDING_API_ENDPOINT,MODEL_DIM
+from lambda_function.models.db import InitIndexFromData,SearchIndexRequest,Text
+
+def test_provider_dims_must_match_the_table():
+    # vectors come back already reduced to `dimensions`, one of another width is an upstream error
+    client = EmbeddingClient(api_endpoint=EMBEDDING_API_ENDPOINT,api_key="x",model="stub",dims=MODEL_DIM,dimensions=8)
+    result,status_code = client.encode_sentences_rest(["zebras have stripes"])
+    assert status_code == 200 and result.vectors.shape == (1,8)
+    client = EmbeddingClient(api_endpoint=EMBEDDING_API_ENDPOINT,api_key="x",model="stub",dims=MODEL_DIM+1)
+    result,status_code = client.encode_sentences_rest(["zebras have stripes"])
+    assert status_code == 502 and f"expected {MODEL_DIM+1}" in result.errors[0]
+
+def test_float16_reduced_dimensions(tmp_path):
+    data_loc = str(tmp_path)
+    db = LanceDB(data_loc)
+    db.init_from_data(InitIndexFromData(
+        data_loc=data_loc,
+        table_name="compact",
+        bm25_index=False,
+        dimensions=64,
+        vector_type="float16",
+        data=[Text(text=f"note number {i}") for i in range(10)]
+    ))
+    assert db._table.schema.field("vector").type == pa.list_(pa.float16(),64)
+    results = LanceDB(data_loc,"compact").search(SearchIndexRequest(
+        data_loc=data_loc,
+        table_name="compact",
+        query="note number 7",
+        top_n=3,
+        include_vector=True
+    ))
+    assert results["text"][0].as_py() == "note number 7"
+    assert len(results["vector"][0]) == 64